@@ -1,10 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+from types import SimpleNamespace
 
 from app.db.session import get_db
 from app.crud import crud_alert
+from app.core.alert_engine import get_alert_engine
+from app.core.alert_state import firing_alerts
+from app.core.anomaly import AnomalySpec, anomaly_states
+from app.core.backtest import backtest_rule, compile_draft_rule
+from app.core.config import settings
+from app.core.expression import ExpressionError, compile_expression, rate_states
+from app.core.inhibition import inhibition_index
+from app.core.maintenance import CompiledMaintenanceWindow, maintenance_calendar
+from app.core.pending_state import pending_states
+from app.core.rule_sync import rule_changes
+from app.core.series import SeriesBatch
+from app.core.notifier import notification_dispatcher
+from app.core.scheduler import get_scheduler
+from app.core.sharding import shard_coordinator
+from app.core.silence_index import compile_matchers, silence_index
+from app.core.vector_eval import OPERATOR_CODES
+from app.core.window import WindowSpec
+from app.db.collector import stream_collected_metrics
 from app.schemas.alert import (
     AlertRule, AlertRuleCreate, AlertRuleUpdate, AlertRuleListResponse,
     Alert, AlertCreate, AlertUpdate, AlertListResponse, AlertWithRule,
@@ -13,20 +32,46 @@ from app.schemas.alert import (
     NotificationChannel, NotificationChannelCreate, NotificationChannelUpdate,
     NotificationChannelListResponse,
     AlertAction, AlertActionCreate, AlertActionUpdate, AlertActionListResponse,
-    AlertSilence, AlertSilenceCreate, AlertRuleStatus, AlertRuleType, AlertSeverity,
+    AlertSilence, AlertSilenceCreate, FleetSamples, RuleBacktestRequest, RuleBacktestResult,
+    InhibitionRule, InhibitionRuleCreate, InhibitionRuleUpdate, InhibitionRuleListResponse,
+    MaintenanceWindow, MaintenanceWindowCreate, MaintenanceWindowUpdate,
+    MaintenanceWindowListResponse,
+    AlertRuleStatus, AlertRuleType, AlertSeverity,
     AlertStatus, NotificationChannelType
 )
 
 router = APIRouter()
 
 
+def validate_rule_condition(rule_type: str, condition: Optional[Dict[str, Any]]) -> None:
+    """保存前校验自定义规则表达式、指标规则的窗口函数与异常检测参数，非法时返回400"""
+    if rule_type == AlertRuleType.CUSTOM.value:
+        try:
+            compile_expression((condition or {}).get("expression"))
+        except ExpressionError as e:
+            raise HTTPException(status_code=400, detail=f"自定义规则表达式无效: {e}")
+    elif rule_type == AlertRuleType.METRIC.value:
+        try:
+            WindowSpec.from_condition(condition or {})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"窗口函数配置无效: {e}")
+    elif rule_type == AlertRuleType.ANOMALY.value:
+        try:
+            AnomalySpec.from_condition(condition or {})
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"异常检测配置无效: {e}")
+
+
 # Alert Rule Endpoints
 @router.post("/rules", response_model=AlertRule, status_code=201)
 def create_alert_rule(alert_rule: AlertRuleCreate, db: Session = Depends(get_db)):
     db_alert_rule = crud_alert.get_alert_rule_by_name(db, name=alert_rule.name)
     if db_alert_rule:
         raise HTTPException(status_code=400, detail="告警规则名称已存在")
-    return crud_alert.create_alert_rule(db=db, alert_rule=alert_rule)
+    validate_rule_condition(alert_rule.rule_type.value, alert_rule.condition)
+    db_alert_rule = crud_alert.create_alert_rule(db=db, alert_rule=alert_rule)
+    rule_changes.notify()
+    return db_alert_rule
 
 
 @router.get("/rules", response_model=AlertRuleListResponse)
@@ -61,11 +106,25 @@ def update_alert_rule(
     alert_rule: AlertRuleUpdate = ...,
     db: Session = Depends(get_db)
 ):
+    if alert_rule.condition is not None or alert_rule.rule_type is not None:
+        db_alert_rule = crud_alert.get_alert_rule(db, alert_rule_id=alert_rule_id)
+        if db_alert_rule is None:
+            raise HTTPException(status_code=404, detail="告警规则不存在")
+        # 按更新后的规则类型与条件校验
+        rule_type = alert_rule.rule_type or db_alert_rule.rule_type
+        condition = alert_rule.condition if alert_rule.condition is not None else db_alert_rule.condition
+        validate_rule_condition(rule_type.value, condition)
     db_alert_rule = crud_alert.update_alert_rule(
         db, alert_rule_id=alert_rule_id, alert_rule=alert_rule
     )
     if db_alert_rule is None:
         raise HTTPException(status_code=404, detail="告警规则不存在")
+    rule_changes.notify()
+    if alert_rule.rule_type is not None:
+        # 规则类型变化后原有的评估状态不再适用
+        pending_states.discard_rule(alert_rule_id)
+        rate_states.discard_rule(alert_rule_id)
+        anomaly_states.discard_rule(alert_rule_id)
     return db_alert_rule
 
 
@@ -74,13 +133,111 @@ def delete_alert_rule(alert_rule_id: int = Path(..., gt=0), db: Session = Depend
     db_alert_rule = crud_alert.delete_alert_rule(db, alert_rule_id=alert_rule_id)
     if db_alert_rule is None:
         raise HTTPException(status_code=404, detail="告警规则不存在")
+    rule_changes.notify()
+    pending_states.discard_rule(alert_rule_id)
+    rate_states.discard_rule(alert_rule_id)
+    anomaly_states.discard_rule(alert_rule_id)
     return db_alert_rule
 
 
+@router.post("/rules/backtest", response_model=RuleBacktestResult)
+def backtest_alert_rule(request: RuleBacktestRequest):
+    if request.end_time <= request.start_time:
+        raise HTTPException(status_code=400, detail="结束时间必须晚于开始时间")
+    draft = request.rule
+    if draft.rule_type != AlertRuleType.METRIC:
+        raise HTTPException(status_code=400, detail="仅支持指标规则回测")
+    validate_rule_condition(draft.rule_type.value, draft.condition)
+    
+    rule = compile_draft_rule(draft.model_dump(mode="json"))
+    if not rule.metric_name:
+        raise HTTPException(status_code=400, detail="指标规则缺少 metric_name")
+    if rule.comparison_operator not in OPERATOR_CODES:
+        raise HTTPException(status_code=400, detail="比较运算符无效")
+    
+    chunks = stream_collected_metrics(
+        [rule.metric_name], request.start_time, request.end_time,
+        batch_size=settings.ALERT_BACKTEST_BATCH_SIZE,
+        ci_id=rule.ci_id
+    )
+    return backtest_rule(rule, chunks, request.max_events)
+
+
+# Evaluation Endpoints
+def _scheduler_running() -> bool:
+    scheduler = get_scheduler()
+    return scheduler is not None and scheduler.stats()["running"]
+
+
+@router.post("/samples/metric", response_model=Dict[str, Any])
+def ingest_metric_samples(
+    metric_data: Dict[str, float],
+    ci_id: Optional[int] = Query(None, description="样本所属CI，不同CI的样本按不同序列评估"),
+    db: Session = Depends(get_db)
+):
+    engine = get_alert_engine(db, batch_mode=True)
+    labels = {"ci_id": ci_id} if ci_id is not None else None
+    if _scheduler_running():
+        # 调度器按各规则的评估间隔读取最新样本，窗口与异常检测在接入时处理
+        batch = SeriesBatch.from_metric_data(metric_data, labels)
+        return engine.ingest_samples(batch, publish=settings.ALERT_SHARDING_ENABLED)
+    if labels is not None:
+        return engine.evaluate_all_rules("metric", SeriesBatch.from_metric_data(metric_data, labels))
+    return engine.evaluate_all_rules("metric", metric_data)
+
+
+@router.post("/samples/series", response_model=Dict[str, Any])
+def ingest_series_samples(samples: List[Dict[str, Any]], db: Session = Depends(get_db)):
+    engine = get_alert_engine(db, batch_mode=True)
+    if _scheduler_running():
+        return engine.ingest_samples(SeriesBatch(samples), publish=settings.ALERT_SHARDING_ENABLED)
+    return engine.evaluate_all_rules("metric", samples)
+
+
+@router.post("/samples/fleet", response_model=Dict[str, Any])
+def ingest_fleet_samples(samples: FleetSamples, db: Session = Depends(get_db)):
+    if len(samples.values) != len(samples.ci_ids):
+        raise HTTPException(status_code=400, detail="样本矩阵行数与CI数量不一致")
+    if any(len(row) != len(samples.metric_names) for row in samples.values):
+        raise HTTPException(status_code=400, detail="样本矩阵列数与指标数量不一致")
+    if samples.labels is not None and len(samples.labels) != len(samples.ci_ids):
+        raise HTTPException(status_code=400, detail="标签数量与CI数量不一致")
+    return get_alert_engine(db, batch_mode=True).ingest_fleet(
+        samples.ci_ids, samples.metric_names, samples.values, samples.labels
+    )
+
+
+@router.get("/scheduler/stats", response_model=Dict[str, Any])
+def read_scheduler_stats():
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return {"running": False}
+    return scheduler.stats()
+
+
+@router.get("/notifications/stats", response_model=Dict[str, Any])
+def read_notification_stats():
+    return notification_dispatcher.stats()
+
+
+@router.get("/anomaly/stats", response_model=Dict[str, Any])
+def read_anomaly_stats():
+    return anomaly_states.stats()
+
+
+@router.get("/scheduler/shards", response_model=Dict[str, Any])
+def read_shard_stats():
+    if not settings.ALERT_SHARDING_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **shard_coordinator.stats()}
+
+
 # Alert Endpoints
 @router.post("/alerts", response_model=Alert, status_code=201)
 def create_alert(alert: AlertCreate, db: Session = Depends(get_db)):
-    return crud_alert.create_alert(db=db, alert=alert)
+    db_alert = crud_alert.create_alert(db=db, alert=alert)
+    firing_alerts.track(db_alert)
+    return db_alert
 
 
 @router.get("/alerts", response_model=AlertListResponse)
@@ -124,6 +281,7 @@ def update_alert(
     )
     if db_alert is None:
         raise HTTPException(status_code=404, detail="告警不存在")
+    firing_alerts.track(db_alert)
     return db_alert
 
 
@@ -138,6 +296,7 @@ def resolve_alert(
     )
     if db_alert is None:
         raise HTTPException(status_code=404, detail="告警不存在")
+    firing_alerts.discard(db_alert.id)
     return db_alert
 
 
@@ -317,7 +476,16 @@ def create_alert_silence(
     silence: AlertSilenceCreate,
     db: Session = Depends(get_db)
 ):
-    return crud_alert.create_alert_silence(db=db, alert_silence=silence)
+    if not silence.alert_id and not silence.alert_rule_id and not silence.matchers:
+        raise HTTPException(status_code=400, detail="静默需指定告警、告警规则或标签匹配条件")
+    if silence.matchers:
+        try:
+            compile_matchers(matcher.dict() for matcher in silence.matchers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"静默匹配条件无效: {e}")
+    db_silence = crud_alert.create_alert_silence(db=db, alert_silence=silence)
+    silence_index.add(db_silence)
+    return db_silence
 
 
 @router.get("/silences", response_model=List[AlertSilence])
@@ -352,4 +520,152 @@ def deactivate_alert_silence(
     db_silence = crud_alert.deactivate_alert_silence(db, silence_id=silence_id)
     if db_silence is None:
         raise HTTPException(status_code=404, detail="告警静默不存在")
+    silence_index.remove(db_silence.id)
     return db_silence
+
+
+# Inhibition Rule Endpoints
+@router.post("/inhibition-rules", response_model=InhibitionRule, status_code=201)
+def create_inhibition_rule(
+    inhibition_rule: InhibitionRuleCreate,
+    db: Session = Depends(get_db)
+):
+    db_rule = crud_alert.get_inhibition_rule_by_name(db, name=inhibition_rule.name)
+    if db_rule:
+        raise HTTPException(status_code=400, detail="抑制规则名称已存在")
+    db_rule = crud_alert.create_inhibition_rule(db=db, inhibition_rule=inhibition_rule)
+    inhibition_index.invalidate()
+    return db_rule
+
+
+@router.get("/inhibition-rules", response_model=InhibitionRuleListResponse)
+def read_inhibition_rules(
+    is_enabled: Optional[bool] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    rules = crud_alert.get_inhibition_rules(db, is_enabled=is_enabled, skip=skip, limit=limit)
+    total = crud_alert.count_inhibition_rules(db, is_enabled=is_enabled)
+    return InhibitionRuleListResponse(total=total, items=rules)
+
+
+@router.get("/inhibition-rules/{inhibition_rule_id}", response_model=InhibitionRule)
+def read_inhibition_rule(
+    inhibition_rule_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    db_rule = crud_alert.get_inhibition_rule(db, inhibition_rule_id=inhibition_rule_id)
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="抑制规则不存在")
+    return db_rule
+
+
+@router.put("/inhibition-rules/{inhibition_rule_id}", response_model=InhibitionRule)
+def update_inhibition_rule(
+    inhibition_rule_id: int = Path(..., gt=0),
+    inhibition_rule: InhibitionRuleUpdate = ...,
+    db: Session = Depends(get_db)
+):
+    db_rule = crud_alert.update_inhibition_rule(
+        db, inhibition_rule_id=inhibition_rule_id, inhibition_rule=inhibition_rule
+    )
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="抑制规则不存在")
+    inhibition_index.invalidate()
+    return db_rule
+
+
+@router.delete("/inhibition-rules/{inhibition_rule_id}", response_model=InhibitionRule)
+def delete_inhibition_rule(
+    inhibition_rule_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    db_rule = crud_alert.delete_inhibition_rule(db, inhibition_rule_id=inhibition_rule_id)
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="抑制规则不存在")
+    inhibition_index.invalidate()
+    return db_rule
+
+
+# Maintenance Window Endpoints
+def validate_maintenance_window(values: Dict[str, Any]) -> None:
+    """保存前编译维护窗口的周期规则、时区与标签条件，非法时返回400"""
+    try:
+        CompiledMaintenanceWindow(SimpleNamespace(id=None, **values))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"维护窗口配置无效: {e}")
+
+
+@router.post("/maintenance-windows", response_model=MaintenanceWindow, status_code=201)
+def create_maintenance_window(
+    maintenance_window: MaintenanceWindowCreate,
+    db: Session = Depends(get_db)
+):
+    db_window = crud_alert.get_maintenance_window_by_name(db, name=maintenance_window.name)
+    if db_window:
+        raise HTTPException(status_code=400, detail="维护窗口名称已存在")
+    validate_maintenance_window(maintenance_window.dict())
+    db_window = crud_alert.create_maintenance_window(db=db, maintenance_window=maintenance_window)
+    maintenance_calendar.invalidate()
+    return db_window
+
+
+@router.get("/maintenance-windows", response_model=MaintenanceWindowListResponse)
+def read_maintenance_windows(
+    is_enabled: Optional[bool] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    windows = crud_alert.get_maintenance_windows(db, is_enabled=is_enabled, skip=skip, limit=limit)
+    total = crud_alert.count_maintenance_windows(db, is_enabled=is_enabled)
+    return MaintenanceWindowListResponse(total=total, items=windows)
+
+
+@router.get("/maintenance-windows/calendar", response_model=Dict[str, Any])
+def read_maintenance_calendar():
+    return maintenance_calendar.stats()
+
+
+@router.get("/maintenance-windows/{maintenance_window_id}", response_model=MaintenanceWindow)
+def read_maintenance_window(
+    maintenance_window_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    db_window = crud_alert.get_maintenance_window(db, maintenance_window_id=maintenance_window_id)
+    if db_window is None:
+        raise HTTPException(status_code=404, detail="维护窗口不存在")
+    return db_window
+
+
+@router.put("/maintenance-windows/{maintenance_window_id}", response_model=MaintenanceWindow)
+def update_maintenance_window(
+    maintenance_window_id: int = Path(..., gt=0),
+    maintenance_window: MaintenanceWindowUpdate = ...,
+    db: Session = Depends(get_db)
+):
+    db_window = crud_alert.get_maintenance_window(db, maintenance_window_id=maintenance_window_id)
+    if db_window is None:
+        raise HTTPException(status_code=404, detail="维护窗口不存在")
+    validate_maintenance_window({
+        **MaintenanceWindow.model_validate(db_window).dict(exclude={"id"}),
+        **maintenance_window.dict(exclude_unset=True)
+    })
+    db_window = crud_alert.update_maintenance_window(
+        db, maintenance_window_id=maintenance_window_id, maintenance_window=maintenance_window
+    )
+    maintenance_calendar.invalidate()
+    return db_window
+
+
+@router.delete("/maintenance-windows/{maintenance_window_id}", response_model=MaintenanceWindow)
+def delete_maintenance_window(
+    maintenance_window_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    db_window = crud_alert.delete_maintenance_window(db, maintenance_window_id=maintenance_window_id)
+    if db_window is None:
+        raise HTTPException(status_code=404, detail="维护窗口不存在")
+    maintenance_calendar.invalidate()
+    return db_window
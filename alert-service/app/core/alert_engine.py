@@ -1,23 +1,102 @@
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import time
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
 
 from app.models.alert import (
     AlertRule, AlertRuleStatus, AlertRuleType, AlertSeverity,
-    Alert, AlertStatus, AlertSilence
+    Alert, AlertStatus, AlertAction
 )
 from app.crud import crud_alert
+from app.core.config import settings
+from app.core.alert_state import firing_alerts
+from app.core.anomaly import anomaly_states
+from app.core.eval_pool import evaluation_pool
+from app.core.pending_state import RuleState, pending_states
+from app.core.expression import (
+    ExpressionError, InsufficientDataError, MissingMetricError, compile_expression, rate_states
+)
+from app.core.inhibition import alert_labels, inhibition_index
+from app.core.log_matcher import LogRuleMatcher
+from app.core.maintenance import maintenance_calendar
+from app.core.notifier import notification_dispatcher
+from app.core.rule_index import OPERATORS, CompiledRule, rule_index
+from app.core.rule_sync import rule_changes
+from app.core.sample_store import latest_samples
+from app.core.sharding import shard_coordinator
+from app.core.series import (
+    SeriesBatch, SeriesResult, alert_fingerprint, match_labels, series_fingerprint
+)
+from app.core.trace_aggregator import TraceAggregate
+from app.core.vector_eval import get_threshold_matrix
+from app.core.window import window_samples
+from app.core.silence_index import as_utc_naive, silence_index
+from app.db.cmdb import get_ci_ids_by_type
+from app.db.partitioning import drop_partition, ensure_partitions, is_partitioned, list_partitions
 
 logger = logging.getLogger(__name__)
 
 
+class FleetLabels:
+    """样本矩阵各行的序列标签与指纹，按需计算并缓存"""
+    
+    def __init__(self, ci_ids: List[int], labels: Optional[List[Optional[Dict[str, Any]]]] = None):
+        self.ci_ids = ci_ids
+        self.labels = labels
+        self._labels: Dict[int, Dict[str, Any]] = {}
+        self._rows: Optional[Dict[str, int]] = None
+    
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        labels = self._labels.get(row)
+        if labels is None:
+            labels = dict(self.labels[row] or {}) if self.labels else {}
+            labels.setdefault("ci_id", self.ci_ids[row])
+            self._labels[row] = labels
+        return labels
+    
+    def matches(self, rule: CompiledRule, row: int) -> bool:
+        """该行是否属于规则的 ci_id 并满足其标签选择器"""
+        if rule.ci_id is not None and rule.ci_id != self.ci_ids[row]:
+            return False
+        return match_labels(rule.condition.get("labels"), self[row])
+    
+    def fingerprints(self) -> List[str]:
+        return list(self._index())
+    
+    def row_of(self, fingerprint: str) -> Optional[int]:
+        return self._index().get(fingerprint)
+    
+    def series_batch(self, metric_names: List[str], values: np.ndarray) -> SeriesBatch:
+        """把样本矩阵转换为多序列样本，缺失值（NaN）不产生样本"""
+        by_metric: Dict[str, List[tuple]] = {}
+        rows = self._index()
+        for column, metric_name in enumerate(metric_names):
+            present = ~np.isnan(values[:, column])
+            series = [
+                (fingerprint, self[row], float(values[row, column]))
+                for fingerprint, row in rows.items() if present[row]
+            ]
+            if series:
+                by_metric[metric_name] = series
+        return SeriesBatch.from_series(by_metric)
+    
+    def _index(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {series_fingerprint(self[row]): row for row in range(len(self.ci_ids))}
+        return self._rows
+
+
 class AlertEngine:
     """告警引擎核心类，负责告警规则评估、告警触发与管理"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, batch_mode: bool = False):
         self.db = db
+        # 批量模式下一个评估周期内的新告警与解决操作先暂存，周期结束时一次写入
+        self.batch_mode = batch_mode
+        self._pending_alerts: List[Dict[str, Any]] = []
+        self._pending_resolutions: List[int] = []
     
     def evaluate_metric_rule(
         self, rule: AlertRule, metric_data: Dict[str, float]
@@ -36,42 +115,312 @@ class AlertEngine:
             if not metric_name:
                 return False, {"error": "Missing metric_name in condition"}
             
-            metric_value = metric_data.get(metric_name)
-            if metric_value is None:
-                return False, {"error": f"Metric {metric_name} not found"}
+            window = getattr(rule, "window", None)
+            if window is not None:
+                # 窗口函数的值由序列窗口计算，而不是取瞬时值
+                metric_value = window_samples.query(metric_name, "", window)
+                if metric_value is None:
+                    return False, {"error": f"Not enough samples for {window.function}({metric_name})"}
+            else:
+                metric_value = metric_data.get(metric_name)
+                if metric_value is None:
+                    return False, {"error": f"Metric {metric_name} not found"}
             
-            # 评估阈值条件
+            # 评估阈值条件（编译后的规则已预先解析运算符）
             threshold = rule.threshold
             operator = rule.comparison_operator
             
-            is_triggered = False
-            if operator == ">":
-                is_triggered = metric_value > threshold
-            elif operator == ">=":
-                is_triggered = metric_value >= threshold
-            elif operator == "<":
-                is_triggered = metric_value < threshold
-            elif operator == "<=":
-                is_triggered = metric_value <= threshold
-            elif operator == "==":
-                is_triggered = metric_value == threshold
-            elif operator == "!=":
-                is_triggered = metric_value != threshold
-            else:
+            compare = getattr(rule, "compare", None) or OPERATORS.get(operator)
+            if compare is None:
                 return False, {"error": f"Invalid operator: {operator}"}
+            is_triggered = compare(metric_value, threshold)
             
-            return is_triggered, {
+            details = {
                 "metric_name": metric_name,
                 "metric_value": metric_value,
                 "threshold": threshold,
                 "operator": operator,
                 "is_triggered": is_triggered
             }
+            if window is not None:
+                details["function"] = window.function
+                details["window"] = window.window
+            return is_triggered, details
             
         except Exception as e:
             logger.error(f"Failed to evaluate metric rule {rule.id}: {e}")
             return False, {"error": str(e)}
     
+    def evaluate_series_rules(
+        self, rules: List[CompiledRule], series: SeriesBatch
+    ) -> Dict[int, List[SeriesResult]]:
+        """按标签选择器评估多序列指标规则，每条规则对匹配的全部序列一次评估完成
+        
+        Args:
+            rules: 指标告警规则，condition["labels"] 为可选的标签选择器
+            series: 按指标分组的多序列样本
+            
+        Returns:
+            {规则ID: 各匹配序列的评估结果}
+        """
+        results = {}
+        now = time.time()
+        for rule in rules:
+            compare = rule.compare
+            threshold = rule.threshold
+            selectors = rule.condition.get("labels")
+            window = rule.window
+            
+            rule_results = []
+            for fingerprint, labels, value in series.series(rule.metric_name):
+                if not match_labels(selectors, labels):
+                    continue
+                if window is not None:
+                    value = window_samples.query(rule.metric_name, fingerprint, window, now)
+                    if value is None:
+                        continue
+                is_triggered = compare(value, threshold)
+                details = {
+                    "metric_name": rule.metric_name,
+                    "metric_value": value,
+                    "threshold": threshold,
+                    "operator": rule.comparison_operator,
+                    "is_triggered": is_triggered
+                }
+                if window is not None:
+                    details["function"] = window.function
+                    details["window"] = window.window
+                rule_results.append(SeriesResult(fingerprint, labels, is_triggered, details))
+            results[rule.id] = rule_results
+        return results
+    
+    def evaluate_anomaly_rules(
+        self, rules: List[CompiledRule], series: SeriesBatch
+    ) -> Dict[int, List[SeriesResult]]:
+        """用一批样本更新异常检测规则的在线估计器并对每个序列评分
+        
+        每条规则对其匹配的全部序列做一次向量化更新，不保存也不查询历史样本；
+        评分为 |z|，按规则的运算符与阈值比较，预热期内的序列不触发。
+        
+        Args:
+            rules: 异常检测规则
+            series: 按指标分组的多序列样本
+            
+        Returns:
+            {规则ID: 各匹配序列的评估结果}
+        """
+        results = {}
+        for rule in rules:
+            selectors = rule.condition.get("labels")
+            matched = {}
+            for fingerprint, labels, value in series.series(rule.metric_name):
+                if match_labels(selectors, labels):
+                    # 同一批次内重复的序列只保留最后一个样本
+                    matched[fingerprint] = (labels, value)
+            if not matched:
+                continue
+            
+            fingerprints = list(matched)
+            values = [value for _, value in matched.values()]
+            detector = anomaly_states.detector(rule.id, rule.anomaly)
+            
+            rule_results = []
+            for position, expected, score in detector.update(fingerprints, values):
+                fingerprint = fingerprints[position]
+                labels, value = matched[fingerprint]
+                score = abs(score)
+                is_triggered = not np.isnan(score) and rule.compare(score, rule.threshold)
+                rule_results.append(SeriesResult(fingerprint, labels, is_triggered, {
+                    "metric_name": rule.metric_name,
+                    "metric_value": value,
+                    "expected": expected,
+                    "score": None if np.isnan(score) else score,
+                    "method": rule.anomaly.method,
+                    "threshold": rule.threshold,
+                    "operator": rule.comparison_operator,
+                    "is_triggered": is_triggered
+                }))
+            results[rule.id] = rule_results
+        return results
+    
+    def evaluate_custom_series_rules(
+        self, rules: List[CompiledRule], series: SeriesBatch
+    ) -> Dict[int, List[SeriesResult]]:
+        """逐序列评估自定义规则，表达式只使用同一序列的指标值
+        
+        Args:
+            rules: 自定义告警规则
+            series: 按指标分组的多序列样本
+            
+        Returns:
+            {规则ID: 各序列的评估结果}
+        """
+        metric_names = {
+            name for rule in rules if rule.expression for name in rule.expression.referenced_metrics
+        }
+        by_series = series.values_by_series(metric_names)
+        
+        results = {}
+        for rule in rules:
+            rule_results = []
+            for fingerprint, (labels, values) in by_series.items():
+                if rule.expression is None or rule.expression.referenced_metrics.isdisjoint(values):
+                    continue
+                is_triggered, details = self.evaluate_custom_rule(rule, values, fingerprint)
+                rule_results.append(SeriesResult(fingerprint, labels, is_triggered, details))
+            results[rule.id] = rule_results
+        return results
+    
+    def evaluate_metric_fleet(
+        self, ci_ids: List[int], metric_names: List[str], values: np.ndarray,
+        labels: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[Dict[str, Any]]:
+        """向量化评估一批CI的指标样本
+        
+        阈值比较对整个样本矩阵一次完成，越限的 (规则, CI) 组合再按规则的
+        ci_id 与标签选择器过滤；每行的序列标签为 labels 中对应的标签加上 ci_id。
+        
+        Args:
+            ci_ids: CI ID 列表，与 values 的行对应
+            metric_names: 指标名列表，与 values 的列对应
+            values: 样本矩阵 (N, K)，缺失值为 NaN
+            labels: 各行的序列标签，与 values 的行对应
+            
+        Returns:
+            越限的 (规则, CI) 组合详情列表
+        """
+        self.ensure_rule_index()
+        snapshot = rule_index.snapshot
+        values = np.asarray(values, dtype=np.float64)
+        
+        if evaluation_pool.enabled and values.shape[0] >= evaluation_pool.min_rows:
+            # 大批量样本按行切分给多个进程评估，规则集每个版本只发送一次
+            evaluation_pool.ensure(snapshot.generation, [
+                rule for rule in snapshot.rules_by_type(AlertRuleType.METRIC)
+                if rule.window is None
+            ])
+            rules, rule_idx, row_idx = evaluation_pool.evaluate(metric_names, values)
+            positions = {name: pos for pos, name in enumerate(metric_names)}
+            columns = [positions[rules[r].metric_name] for r in rule_idx.tolist()]
+        else:
+            # 窗口规则依赖序列历史，不参与瞬时值矩阵评估
+            matrix = get_threshold_matrix(
+                snapshot.generation,
+                [rule for rule in snapshot.rules_for_metrics(metric_names) if rule.window is None],
+                metric_names
+            )
+            rules = matrix.rules
+            rule_idx, row_idx = matrix.evaluate(values)
+            columns = matrix.columns[rule_idx].tolist()
+        
+        row_labels = FleetLabels(ci_ids, labels)
+        breaches = []
+        for r, row, column in zip(rule_idx.tolist(), row_idx.tolist(), columns):
+            rule = rules[r]
+            if not row_labels.matches(rule, row):
+                continue
+            breaches.append({
+                "alert_rule_id": rule.id,
+                "ci_id": ci_ids[row],
+                "labels": row_labels[row],
+                "metric_name": rule.metric_name,
+                "metric_value": float(values[row, column]),
+                "threshold": rule.threshold,
+                "operator": rule.comparison_operator
+            })
+        return breaches
+    
+    def ingest_fleet(
+        self, ci_ids: List[int], metric_names: List[str], values: np.ndarray,
+        labels: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """接入一批CI的样本矩阵，向量化评估阈值规则并创建/解决相应告警
+        
+        越限的组合按序列触发；未越限的组合只对已有 pending 状态或触发中告警
+        的序列生成观测，其余序列没有状态需要推进，不再逐个处理。
+        
+        Args:
+            ci_ids: CI ID 列表，与 values 的行对应
+            metric_names: 指标名列表，与 values 的列对应
+            values: 样本矩阵 (N, K)，缺失值为 NaN 或 None
+            labels: 各行的序列标签，与 values 的行对应
+            
+        Returns:
+            评估结果统计
+        """
+        try:
+            self.ensure_firing_state()
+            pending_states.restore()
+            values = np.asarray(values, dtype=np.float64).reshape(len(ci_ids), len(metric_names))
+            breaches = self.evaluate_metric_fleet(ci_ids, metric_names, values, labels)
+            snapshot = rule_index.snapshot
+            row_labels = FleetLabels(ci_ids, labels)
+            rules = self.owned_rules(
+                rule for rule in snapshot.rules_for_metrics(metric_names) if rule.window is None
+            )
+            if settings.ALERT_SHARDING_ENABLED:
+                # 其他副本持有的规则由其调度器从共享样本评估
+                batch = row_labels.series_batch(metric_names, values)
+                now = time.time()
+                latest_samples.update(batch, now)
+                latest_samples.publish(batch, now)
+            
+            owned_ids = {rule.id for rule in rules}
+            results: Dict[int, List[SeriesResult]] = {}
+            breached = set()
+            for breach in breaches:
+                if breach["alert_rule_id"] not in owned_ids:
+                    continue
+                fingerprint = series_fingerprint(breach["labels"])
+                breached.add((breach["alert_rule_id"], fingerprint))
+                results.setdefault(breach["alert_rule_id"], []).append(SeriesResult(
+                    fingerprint, breach["labels"], True, {
+                        "metric_name": breach["metric_name"],
+                        "metric_value": breach["metric_value"],
+                        "threshold": breach["threshold"],
+                        "operator": breach["operator"],
+                        "is_triggered": True
+                    }
+                ))
+            
+            positions = {name: pos for pos, name in enumerate(metric_names)}
+            for rule in rules:
+                candidates = set(pending_states.fingerprints(rule.id))
+                if firing_alerts.has_firing(rule.id):
+                    candidates.update(
+                        fingerprint for fingerprint in row_labels.fingerprints()
+                        if firing_alerts.has_firing(rule.id, alert_fingerprint(rule.id, fingerprint))
+                    )
+                column = values[:, positions[rule.metric_name]]
+                for fingerprint in candidates:
+                    row = row_labels.row_of(fingerprint)
+                    if (
+                        row is None or (rule.id, fingerprint) in breached
+                        or np.isnan(column[row]) or not row_labels.matches(rule, row)
+                    ):
+                        continue
+                    value = float(column[row])
+                    results.setdefault(rule.id, []).append(SeriesResult(
+                        fingerprint, row_labels[row], False, {
+                            "metric_name": rule.metric_name,
+                            "metric_value": value,
+                            "threshold": rule.threshold,
+                            "operator": rule.comparison_operator,
+                            "is_triggered": False
+                        }
+                    ))
+            
+            return self.process_rules(
+                [rule for rule in rules if rule.id in results], "metric", None, results
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest fleet samples: {e}")
+            return {
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+    
     def evaluate_log_rule(
         self, rule: AlertRule, log_data: List[Dict[str, Any]]
     ) -> Tuple[bool, Dict[str, Any]]:
@@ -133,6 +482,40 @@ class AlertEngine:
             logger.error(f"Failed to evaluate log rule {rule.id}: {e}")
             return False, {"error": str(e)}
     
+    def evaluate_log_rules(
+        self, rules: List[CompiledRule], log_data: List[Dict[str, Any]],
+        matcher: Optional[LogRuleMatcher] = None
+    ) -> Dict[int, Tuple[bool, Dict[str, Any]]]:
+        """使用联合匹配器一次扫描日志批次，评估全部日志告警规则
+        
+        Args:
+            rules: 日志告警规则
+            log_data: 日志数据列表
+            matcher: 与 rules 同一快照的联合匹配器，默认使用当前快照
+            
+        Returns:
+            {规则ID: (是否触发告警, 触发详情)}
+        """
+        counts = (matcher or rule_index.log_matcher).count(log_data)
+        
+        results = {}
+        for rule in rules:
+            matching_count = counts.get(rule.id)
+            if matching_count is None:
+                results[rule.id] = (False, {"error": "Missing pattern or level in condition"})
+                continue
+            
+            is_triggered = matching_count >= rule.threshold
+            results[rule.id] = (is_triggered, {
+                "matching_count": matching_count,
+                "threshold": rule.threshold,
+                "is_triggered": is_triggered,
+                "pattern": rule.condition.get("pattern"),
+                "level": rule.condition.get("level"),
+                "source": rule.condition.get("source")
+            })
+        return results
+    
     def evaluate_trace_rule(
         self, rule: AlertRule, trace_data: List[Dict[str, Any]]
     ) -> Tuple[bool, Dict[str, Any]]:
@@ -192,6 +575,46 @@ class AlertEngine:
             logger.error(f"Failed to evaluate trace rule {rule.id}: {e}")
             return False, {"error": str(e)}
     
+    def evaluate_trace_rules(
+        self, rules: List[CompiledRule], trace_data: List[Dict[str, Any]]
+    ) -> Dict[int, Tuple[bool, Dict[str, Any]]]:
+        """一次聚合链路批次，再由计数器评估全部链路告警规则
+        
+        Args:
+            rules: 链路告警规则
+            trace_data: 链路数据列表
+            
+        Returns:
+            {规则ID: (是否触发告警, 触发详情)}
+        """
+        aggregate = TraceAggregate(
+            trace_data, (rule.condition.get("duration_threshold") for rule in rules)
+        )
+        
+        results = {}
+        for rule in rules:
+            error_rate_threshold = rule.threshold
+            operation_name = rule.condition.get("operation_name")
+            if not operation_name:
+                results[rule.id] = (False, {"error": "Missing operation_name in condition"})
+                continue
+            
+            total_traces, error_traces, slow_traces = aggregate.counters(
+                operation_name, rule.condition.get("duration_threshold")
+            )
+            error_rate = (error_traces / total_traces) * 100 if total_traces > 0 else 0
+            is_triggered = total_traces > 0 and error_rate >= error_rate_threshold
+            
+            results[rule.id] = (is_triggered, {
+                "total_traces": total_traces,
+                "error_traces": error_traces,
+                "slow_traces": slow_traces,
+                "error_rate": error_rate,
+                "threshold": error_rate_threshold,
+                "is_triggered": is_triggered
+            })
+        return results
+    
     def evaluate_rule(
         self, rule: AlertRule, data: Any
     ) -> Tuple[bool, Dict[str, Any]]:
@@ -216,68 +639,287 @@ class AlertEngine:
         elif rule.rule_type == AlertRuleType.CUSTOM:
             # 自定义规则评估
             return self.evaluate_custom_rule(rule, data)
+        elif rule.rule_type == AlertRuleType.ANOMALY:
+            # 异常检测规则的状态只能随样本批次推进，见 evaluate_anomaly_rules
+            return False, {"error": "Anomaly rules are evaluated per sample batch"}
         else:
             return False, {"error": f"Unknown rule type: {rule.rule_type}"}
     
     def evaluate_custom_rule(
-        self, rule: AlertRule, data: Any
+        self, rule: AlertRule, data: Any, fingerprint: str = ""
     ) -> Tuple[bool, Dict[str, Any]]:
         """评估自定义告警规则
         
+        condition["expression"] 在规则保存时已校验，编译结果随规则索引缓存；
+        表达式结果为布尔值时直接作为是否触发，为数值时与阈值比较。
+        缺少指标或 rate() 样本不足时返回 error，调用方视为本轮没有观测。
+        
         Args:
             rule: 告警规则对象
-            data: 待评估的数据
+            data: 指标名 -> 值
+            fingerprint: 样本所属序列的指纹，rate() 按序列保存上一次观测
             
         Returns:
             Tuple[是否触发告警, 触发详情]
         """
         try:
-            # 自定义规则逻辑可以根据需要扩展
-            logger.warning(f"Custom rule evaluation not implemented yet for rule {rule.id}")
-            return False, {"error": "Custom rule evaluation not implemented"}
+            expression = getattr(rule, "expression", None)
+            if expression is None:
+                expression = compile_expression(rule.condition.get("expression"))
+            
+            try:
+                value = expression.evaluate(data, rate_states.get(rule.id, fingerprint))
+            except MissingMetricError as e:
+                return False, {"error": f"Metric {e} not found in data"}
+            except InsufficientDataError as e:
+                return False, {"error": f"Not enough samples for rate({e})"}
+            
+            if isinstance(value, bool):
+                is_triggered = value
+            else:
+                compare = getattr(rule, "compare", None) or OPERATORS.get(rule.comparison_operator)
+                if compare is None:
+                    return False, {"error": f"Invalid operator: {rule.comparison_operator}"}
+                is_triggered = compare(value, rule.threshold)
+            
+            return is_triggered, {
+                "expression": expression.source,
+                "value": value,
+                "threshold": rule.threshold,
+                "operator": rule.comparison_operator,
+                "is_triggered": is_triggered
+            }
+        except ExpressionError as e:
+            return False, {"error": f"Invalid expression: {e}"}
         except Exception as e:
             logger.error(f"Failed to evaluate custom rule {rule.id}: {e}")
             return False, {"error": str(e)}
     
-    def is_silenced(self, alert_rule_id: Optional[int] = None, alert_id: Optional[int] = None) -> bool:
+    def is_silenced(
+        self, alert_rule_id: Optional[int] = None, alert_id: Optional[int] = None,
+        labels: Optional[Dict[str, str]] = None
+    ) -> bool:
         """检查告警或规则是否被静默
         
         Args:
             alert_rule_id: 告警规则ID
             alert_id: 告警ID
+            labels: alert_labels() 构建的匹配标签，给出时同时检查标签静默
             
         Returns:
             是否被静默
         """
-        if not alert_rule_id and not alert_id:
+        if not alert_rule_id and not alert_id and labels is None:
             return False
         
-        # 获取当前时间
-        now = datetime.utcnow()
+        self.ensure_silence_index()
+        return silence_index.is_silenced(
+            alert_rule_id=alert_rule_id, alert_id=alert_id, labels=labels
+        )
+    
+    def is_inhibited(self, values: Dict[str, Any]) -> bool:
+        """检查新告警是否被触发中的源告警抑制
         
-        # 构建查询条件
-        conditions = [
-            AlertSilence.is_active == True,
-            AlertSilence.ends_at > now
-        ]
+        Args:
+            values: build_alert_values() 构建的告警字段值
+            
+        Returns:
+            是否被抑制
+        """
+        self.ensure_inhibition_index()
+        return inhibition_index.is_inhibited(
+            values["fingerprint"],
+            alert_labels(values["alert_rule_id"], values["severity"], values.get("labels"))
+        )
+    
+    def ensure_inhibition_index(self) -> None:
+        """抑制索引未加载或到达刷新间隔时从数据库重新加载"""
+        if inhibition_index.is_stale:
+            inhibition_index.load(
+                crud_alert.iter_enabled_inhibition_rules(self.db),
+                (
+                    (alert_id, fingerprint or "", alert_labels(alert_rule_id, severity, labels))
+                    for alert_id, alert_rule_id, severity, labels, fingerprint
+                    in crud_alert.iter_firing_alert_labels(self.db)
+                )
+            )
+    
+    def is_in_maintenance(
+        self, rule: AlertRule, ci_id: Optional[int] = None,
+        labels: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """检查告警是否处于周期维护窗口内
         
-        if alert_rule_id:
-            conditions.append(AlertSilence.alert_rule_id == alert_rule_id)
+        Args:
+            rule: 告警规则对象
+            ci_id: 告警关联的CI ID，未给出时依次取规则与标签上的 ci_id
+            labels: alert_labels() 构建的匹配标签
+            
+        Returns:
+            是否处于维护窗口内
+        """
+        self.ensure_maintenance_calendar()
+        if ci_id is None:
+            ci_id = rule.ci_id
+        if ci_id is None and labels and str(labels.get("ci_id", "")).isdigit():
+            ci_id = int(labels["ci_id"])
+        return maintenance_calendar.is_in_maintenance(ci_id=ci_id, labels=labels)
+    
+    def ensure_maintenance_calendar(self) -> None:
+        """维护窗口日历未加载、到达刷新间隔或展开范围即将用完时重新展开"""
+        if maintenance_calendar.is_stale:
+            windows = list(crud_alert.iter_enabled_maintenance_windows(self.db))
+            ci_type_ids = {
+                ci_type_id for window in windows for ci_type_id in (window.ci_type_ids or ())
+            }
+            maintenance_calendar.load(windows, get_ci_ids_by_type(self.db, ci_type_ids))
+    
+    def ensure_silence_index(self) -> None:
+        """静默索引未加载或到达刷新间隔时从数据库重新加载"""
+        if silence_index.is_stale:
+            silence_index.load(crud_alert.iter_active_alert_silences(self.db))
+    
+    def build_alert_values(
+        self, rule: AlertRule, severity: AlertSeverity,
+        source: str, source_id: Optional[str] = None,
+        labels: Optional[Dict[str, Any]] = None,
+        annotations: Optional[Dict[str, Any]] = None,
+        ci_id: Optional[int] = None,
+        fingerprint: str = ""
+    ) -> Dict[str, Any]:
+        """构建新告警的字段值"""
+        # 构建告警标题和消息
+        title = f"[{severity.value.upper()}] {rule.name}"
+        message = f"告警规则 {rule.name} 被触发"
+        
+        return {
+            "alert_rule_id": rule.id,
+            "title": title,
+            "message": message,
+            "source": source,
+            "source_id": source_id,
+            "labels": labels,
+            "annotations": annotations,
+            "ci_id": ci_id,
+            "severity": severity,
+            "fingerprint": fingerprint or alert_fingerprint(rule.id)
+        }
+    
+    def build_notification(self, alert_id: int, values: Dict[str, Any]) -> Dict[str, Any]:
+        """由新告警的字段值构建通知内容（只含可序列化的字段）"""
+        return {
+            "alert_id": alert_id,
+            "alert_rule_id": values["alert_rule_id"],
+            "title": values["title"],
+            "message": values["message"],
+            "severity": values["severity"].value,
+            "source": values["source"],
+            "labels": values.get("labels"),
+            "annotations": values.get("annotations"),
+            "ci_id": values.get("ci_id"),
+            "fingerprint": values["fingerprint"],
+            "firing_at": datetime.utcnow().isoformat()
+        }
+    
+    def queue_alert(
+        self, rule: AlertRule, severity: AlertSeverity,
+        source: str, source_id: Optional[str] = None,
+        labels: Optional[Dict[str, Any]] = None,
+        annotations: Optional[Dict[str, Any]] = None,
+        ci_id: Optional[int] = None,
+        fingerprint: str = ""
+    ) -> bool:
+        """批量模式下暂存待创建的告警，由 flush() 统一写入
+        
+        Returns:
+            是否已加入待写入队列（被静默或处于维护窗口时为False）
+        """
+        silence_labels = alert_labels(rule.id, severity, labels)
+        if self.is_silenced(alert_rule_id=rule.id, labels=silence_labels):
+            logger.info(f"Alert for rule {rule.id} is silenced, skipping")
+            return False
+        if self.is_in_maintenance(rule, ci_id, silence_labels):
+            logger.info(f"Alert for rule {rule.id} is in a maintenance window, skipping")
+            return False
+        
+        self._pending_alerts.append(self.build_alert_values(
+            rule, severity, source, source_id, labels, annotations, ci_id, fingerprint
+        ))
+        return True
+    
+    def queue_resolution(self, alert_id: int) -> None:
+        """批量模式下暂存待解决的告警，由 flush() 统一写入"""
+        self._pending_resolutions.append(alert_id)
+    
+    def flush(self, resolved_by: Optional[str] = None) -> List[Tuple[int, int, Optional[str]]]:
+        """在一个事务中写入暂存的新告警与解决操作
         
-        if alert_id:
-            conditions.append(AlertSilence.alert_id == alert_id)
+        Args:
+            resolved_by: 解决人
+            
+        Returns:
+            本次新建告警的 (alert_id, alert_rule_id, fingerprint) 列表
+        """
+        new_alerts, self._pending_alerts = self._pending_alerts, []
+        resolutions, self._pending_resolutions = self._pending_resolutions, []
+        if not new_alerts and not resolutions:
+            return []
         
-        # 执行查询
-        silence = self.db.query(AlertSilence).filter(and_(*conditions)).first()
+        labels_by_fingerprint = {}
+        if new_alerts:
+            # 同批次内的源告警同样会抑制批内的其他告警
+            self.ensure_inhibition_index()
+            labels_by_fingerprint = {
+                values["fingerprint"]: alert_labels(
+                    values["alert_rule_id"], values["severity"], values.get("labels")
+                )
+                for values in new_alerts
+            }
+            inhibited = inhibition_index.split_inhibited([
+                (values["fingerprint"], labels_by_fingerprint[values["fingerprint"]])
+                for values in new_alerts
+            ])
+            if any(inhibited):
+                logger.info(f"{sum(inhibited)} new alerts inhibited")
+                new_alerts = [
+                    values for values, is_inhibited in zip(new_alerts, inhibited) if not is_inhibited
+                ]
         
-        return silence is not None
+        written = crud_alert.bulk_write_alerts(
+            self.db, new_alerts, resolutions, resolved_by
+        )
+        values_by_fingerprint = {values["fingerprint"]: values for values in new_alerts}
+        notifications = []
+        created = []
+        for alert_id, alert_rule_id, fingerprint, inserted in written:
+            # 只通知本次新建的告警；指纹已有触发中告警（可能由其他副本创建）时
+            # 数据库只刷新了 last_seen_at，不再重复通知
+            if inserted:
+                created.append((alert_id, alert_rule_id, fingerprint))
+                values = values_by_fingerprint.get(fingerprint)
+                if values is not None:
+                    notifications.append(self.build_notification(alert_id, values))
+            firing_alerts.add(alert_rule_id, alert_id, fingerprint or "")
+            if fingerprint in labels_by_fingerprint:
+                inhibition_index.add_source(alert_id, fingerprint, labels_by_fingerprint[fingerprint])
+        notification_dispatcher.notify(notifications)
+        for alert_id in resolutions:
+            firing_alerts.discard(alert_id)
+            inhibition_index.remove_source(alert_id)
+        
+        logger.info(
+            f"Flushed {len(created)} new alerts, {len(written) - len(created)} already firing "
+            f"and {len(resolutions)} resolutions"
+        )
+        return created
     
     def trigger_alert(
         self, rule: AlertRule, severity: AlertSeverity,
         source: str, source_id: Optional[str] = None,
         labels: Optional[Dict[str, Any]] = None,
         annotations: Optional[Dict[str, Any]] = None,
-        ci_id: Optional[int] = None
+        ci_id: Optional[int] = None,
+        fingerprint: str = ""
     ) -> Optional[Alert]:
         """触发告警
         
@@ -289,34 +931,41 @@ class AlertEngine:
             labels: 告警标签
             annotations: 告警注释
             ci_id: 关联的CI ID
+            fingerprint: 告警指纹，同一指纹只保留一条触发中告警
             
         Returns:
-            创建的告警对象
+            创建（或指纹已存在）的告警对象
         """
         try:
             # 检查是否被静默
-            if self.is_silenced(alert_rule_id=rule.id):
+            silence_labels = alert_labels(rule.id, severity, labels)
+            if self.is_silenced(alert_rule_id=rule.id, labels=silence_labels):
                 logger.info(f"Alert for rule {rule.id} is silenced, skipping")
                 return None
             
-            # 构建告警标题和消息
-            title = f"[{severity.value.upper()}] {rule.name}"
-            message = f"告警规则 {rule.name} 被触发"
+            # 检查是否处于维护窗口内
+            if self.is_in_maintenance(rule, ci_id, silence_labels):
+                logger.info(f"Alert for rule {rule.id} is in a maintenance window, skipping")
+                return None
             
             # 创建告警
-            alert_create = {
-                "alert_rule_id": rule.id,
-                "title": title,
-                "message": message,
-                "source": source,
-                "source_id": source_id,
-                "labels": labels,
-                "annotations": annotations,
-                "ci_id": ci_id,
-                "severity": severity
-            }
+            alert_create = self.build_alert_values(
+                rule, severity, source, source_id, labels, annotations, ci_id, fingerprint
+            )
+            
+            # 检查是否被触发中的源告警抑制
+            if self.is_inhibited(alert_create):
+                logger.info(f"Alert for rule {rule.id} is inhibited, skipping")
+                return None
             
-            alert = crud_alert.create_alert(self.db, alert_create)
+            alert, inserted = crud_alert.upsert_alert(self.db, alert_create)
+            if inserted:
+                notification_dispatcher.notify([self.build_notification(alert.id, alert_create)])
+            firing_alerts.add(rule.id, alert.id, alert.fingerprint or "")
+            inhibition_index.add_source(
+                alert.id, alert.fingerprint or "",
+                alert_labels(rule.id, severity, labels)
+            )
             logger.info(f"Alert triggered: {alert.id} for rule {rule.id}")
             
             return alert
@@ -340,6 +989,8 @@ class AlertEngine:
         try:
             alert = crud_alert.resolve_alert(self.db, alert_id, resolved_by)
             if alert:
+                firing_alerts.discard(alert.id)
+                inhibition_index.remove_source(alert.id)
                 logger.info(f"Alert resolved: {alert.id}")
             return alert
         except Exception as e:
@@ -363,22 +1014,186 @@ class AlertEngine:
             status=AlertStatus.FIRING
         )
     
+    def ensure_rule_index(self) -> int:
+        """规则索引失效时从数据库流式重建
+        
+        Returns:
+            本次扫描的规则数量（索引有效时为0）
+        """
+        if not rule_index.is_stale:
+            return 0
+        
+        # 先读版本号再读规则，之后的变更一定会再次触发重建
+        source_version = rule_changes.current_version()
+        rules = crud_alert.iter_alert_rules(
+            self.db,
+            status=AlertRuleStatus.ACTIVE,
+            batch_size=settings.ALERT_RULE_BATCH_SIZE
+        )
+        scanned_rules = 0
+        
+        def counted():
+            nonlocal scanned_rules
+            for rule in rules:
+                scanned_rules += 1
+                yield rule
+        
+        rule_index.build(counted(), source_version)
+        window_samples.configure(rule_index.snapshot.window_retention)
+        logger.info(f"Scanned {scanned_rules} active rules")
+        return scanned_rules
+    
+    def record_window_samples(self, data: Any) -> int:
+        """把指标样本写入窗口规则引用的序列窗口
+        
+        Args:
+            data: {"metric_name": value} 或 SeriesBatch
+            
+        Returns:
+            记录的样本数
+        """
+        if isinstance(data, SeriesBatch):
+            samples = (
+                (metric_name, fingerprint, value)
+                for metric_name in data.metric_names if window_samples.wants(metric_name)
+                for fingerprint, _, value in data.series(metric_name)
+            )
+        else:
+            samples = (
+                (metric_name, "", value) for metric_name, value in data.items()
+                if value is not None
+            )
+        return window_samples.record(samples)
+    
+    @staticmethod
+    def owned_rules(rules: Iterable[CompiledRule]) -> List[CompiledRule]:
+        """启用分片时只保留本副本持有分片内的规则"""
+        rules = list(rules)
+        if not settings.ALERT_SHARDING_ENABLED:
+            return rules
+        owned = set(shard_coordinator.filter_owned(rule.id for rule in rules))
+        return [rule for rule in rules if rule.id in owned]
+    
+    def ensure_firing_state(self) -> None:
+        """触发状态表未加载或到达对账间隔时从数据库重新加载"""
+        if firing_alerts.is_stale:
+            firing_alerts.load(crud_alert.get_firing_alert_ids(self.db))
+    
+    def process_rules(
+        self, rules: List[CompiledRule], data_source: str, data: Any,
+        results: Optional[Dict[int, Any]] = None
+    ) -> Dict[str, Any]:
+        """评估给定规则并创建/解决相应告警
+        
+        Args:
+            rules: 待评估的规则
+            data_source: 数据来源（metric/log/trace）
+            data: 待评估的数据
+            results: 已批量算出的评估结果，提供时不再逐条评估；
+                值为 (是否触发, 详情) 或多序列规则的 SeriesResult 列表
+            
+        Returns:
+            评估结果统计
+        """
+        evaluated_rules = 0
+        triggered_rules = 0
+        triggered_alerts = 0
+        
+        # 评估每个规则
+        for rule in rules:
+            try:
+                if results is not None and rule.id in results:
+                    outcome = results[rule.id]
+                else:
+                    outcome = self.evaluate_rule(rule, data)
+                evaluated_rules += 1
+                
+                # 单序列规则的结果视为指纹为空的一个序列，告警标签沿用评估详情
+                if isinstance(outcome, tuple):
+                    outcome = [SeriesResult("", None, *outcome)]
+                
+                rule_triggered = False
+                for result in outcome:
+                    if "error" in result.details:
+                        # 评估出错（样本缺失或过期、数据不足等）视为本轮没有观测，
+                        # 不推进 pending 状态，也不解决触发中的告警
+                        continue
+                    fingerprint = alert_fingerprint(rule.id, result.fingerprint)
+                    # 条件需持续满足 duration 秒后才进入 firing
+                    state = pending_states.observe(
+                        rule.id, result.is_triggered, rule.duration, result.fingerprint
+                    )
+                    
+                    if result.is_triggered:
+                        rule_triggered = True
+                        
+                        # 检查该序列是否已有触发告警
+                        if state == RuleState.FIRING and not firing_alerts.has_firing(rule.id, fingerprint):
+                            # 创建新告警，无标签的序列沿用评估详情作为告警标签
+                            if not result.labels:
+                                labels, annotations = result.details, None
+                            else:
+                                labels, annotations = result.labels, result.details
+                            ci_id = str((result.labels or {}).get("ci_id", ""))
+                            alert_values = dict(
+                                rule=rule,
+                                severity=rule.severity,
+                                source=data_source,
+                                labels=labels,
+                                annotations=annotations,
+                                ci_id=int(ci_id) if ci_id.isdigit() else None,
+                                fingerprint=fingerprint
+                            )
+                            if self.batch_mode:
+                                self.queue_alert(**alert_values)
+                            else:
+                                alert = self.trigger_alert(**alert_values)
+                                if alert:
+                                    triggered_alerts += 1
+                            
+                    else:
+                        # 解决该序列的触发告警
+                        for alert_id in firing_alerts.get(rule.id, fingerprint):
+                            if self.batch_mode:
+                                self.queue_resolution(alert_id)
+                            else:
+                                self.resolve_alert(alert_id)
+                
+                if rule_triggered:
+                    triggered_rules += 1
+                        
+            except Exception as e:
+                logger.error(f"Failed to process rule {rule.id}: {e}")
+        
+        if self.batch_mode:
+            triggered_alerts += len(self.flush())
+        pending_states.checkpoint()
+        
+        return {
+            "total_rules": len(rules),
+            "evaluated_rules": evaluated_rules,
+            "triggered_rules": triggered_rules,
+            "triggered_alerts": triggered_alerts,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
     def evaluate_all_rules(self, data_source: str, data: Any) -> Dict[str, Any]:
         """评估所有活动告警规则
         
         Args:
             data_source: 数据来源（metric/log/trace）
-            data: 待评估的数据
+            data: 待评估的数据；指标数据可以是 {"metric_name": value}，
+                也可以是 [{"metric_name", "labels", "value"}] 形式的多序列样本
             
         Returns:
             评估结果统计
         """
         try:
-            # 获取所有活动规则
-            rules = crud_alert.get_alert_rules(
-                self.db, 
-                status=AlertRuleStatus.ACTIVE
-            )
+            scanned_rules = self.ensure_rule_index()
+            self.ensure_firing_state()
+            pending_states.restore()
+            # 整个批次使用同一版本的规则
+            snapshot = rule_index.snapshot
             
             # 过滤与数据源匹配的规则
             rule_type = None
@@ -388,65 +1203,172 @@ class AlertEngine:
                 rule_type = AlertRuleType.LOG
             elif data_source == "trace":
                 rule_type = AlertRuleType.TRACE
+            elif data_source == "custom":
+                rule_type = AlertRuleType.CUSTOM
             
-            if rule_type:
-                rules = [r for r in rules if r.rule_type == rule_type]
+            results = None
+            anomaly_batch = None
+            if rule_type == AlertRuleType.METRIC and isinstance(data, (list, SeriesBatch)):
+                # 多序列样本：每条规则对其匹配的全部序列一次评估
+                data = anomaly_batch = data if isinstance(data, SeriesBatch) else SeriesBatch(data)
+                self.record_window_samples(data)
+                rules = self.owned_rules(snapshot.rules_for_metrics(data.metric_names))
+                results = self.evaluate_series_rules(rules, data)
+                # 自定义规则逐序列求值，不同主机的指标不会混在同一次求值中
+                custom_rules = self.owned_rules(snapshot.custom_rules_for_metrics(data.metric_names))
+                results.update(self.evaluate_custom_series_rules(custom_rules, data))
+                rules.extend(custom_rules)
+            elif rule_type == AlertRuleType.METRIC and isinstance(data, dict):
+                self.record_window_samples(data)
+                # 只评估数据中出现的指标对应的规则（含引用这些指标的自定义规则）
+                rules = self.owned_rules(snapshot.rules_for_metrics(data.keys()))
+                rules.extend(self.owned_rules(snapshot.custom_rules_for_metrics(data.keys())))
+                anomaly_batch = SeriesBatch(
+                    {"metric_name": metric_name, "value": value}
+                    for metric_name, value in data.items()
+                )
+            else:
+                # 日志与链路数据不经共享样本转发，由接收数据的副本评估全部规则
+                rules = snapshot.rules_by_type(rule_type)
             
-            # 统计信息
-            total_rules = len(rules)
-            evaluated_rules = 0
-            triggered_rules = 0
-            triggered_alerts = 0
+            if anomaly_batch is not None and settings.ALERT_SHARDING_ENABLED:
+                # 其他副本持有的规则由其调度器从共享样本评估
+                now = time.time()
+                latest_samples.update(anomaly_batch, now)
+                latest_samples.publish(anomaly_batch, now)
             
-            # 评估每个规则
-            for rule in rules:
-                try:
-                    is_triggered, details = self.evaluate_rule(rule, data)
-                    evaluated_rules += 1
-                    
-                    if is_triggered:
-                        triggered_rules += 1
-                        
-                        # 检查是否已有相同规则的触发告警
-                        firing_alerts = self.get_firing_alerts_by_rule(rule.id)
-                        if not firing_alerts:
-                            # 创建新告警
-                            alert = self.trigger_alert(
-                                rule=rule,
-                                severity=rule.severity,
-                                source=data_source,
-                                labels=details
-                            )
-                            if alert:
-                                triggered_alerts += 1
-                            
-                    else:
-                        # 解决该规则的所有触发告警
-                        firing_alerts = self.get_firing_alerts_by_rule(rule.id)
-                        for alert in firing_alerts:
-                            self.resolve_alert(alert.id)
-                            
-                except Exception as e:
-                    logger.error(f"Failed to process rule {rule.id}: {e}")
+            # 异常检测规则随每批样本更新估计器
+            if anomaly_batch is not None:
+                anomaly_rules = self.owned_rules(
+                    snapshot.anomaly_rules_for_metrics(anomaly_batch.metric_names)
+                )
+                if anomaly_rules:
+                    results = dict(results or {})
+                    results.update(self.evaluate_anomaly_rules(anomaly_rules, anomaly_batch))
+                    rules.extend(anomaly_rules)
+            
+            # 日志与链路规则一次扫描批量评估
+            if rule_type == AlertRuleType.LOG:
+                results = self.evaluate_log_rules(rules, data, snapshot.log_matcher)
+            elif rule_type == AlertRuleType.TRACE:
+                results = self.evaluate_trace_rules(rules, data)
             
+            stats = self.process_rules(rules, data_source, data, results)
+            # 指标数据同时驱动指标、自定义与异常检测规则，总数按实际参与评估的类型统计
+            if rule_type == AlertRuleType.METRIC:
+                stats["total_rules"] = sum(
+                    snapshot.count(served_type) for served_type in
+                    (AlertRuleType.METRIC, AlertRuleType.CUSTOM, AlertRuleType.ANOMALY)
+                )
+            else:
+                stats["total_rules"] = snapshot.count(rule_type)
+            stats["scanned_rules"] = scanned_rules
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Failed to evaluate all rules: {e}")
             return {
-                "total_rules": total_rules,
-                "evaluated_rules": evaluated_rules,
-                "triggered_rules": triggered_rules,
-                "triggered_alerts": triggered_alerts,
+                "error": str(e),
                 "timestamp": datetime.utcnow().isoformat()
             }
+    
+    def ingest_samples(self, batch: SeriesBatch, publish: bool = False) -> Dict[str, Any]:
+        """调度器运行时接入一批样本：保存最新值、记录窗口并评估异常检测规则
+        
+        阈值与自定义规则由调度器按评估间隔读取最新样本评估；异常检测的
+        估计器需要随每个样本推进，因此在接入时评估。
+        
+        Args:
+            batch: 多序列样本
+            publish: 是否同时写入副本间共享的样本哈希
+            
+        Returns:
+            接入结果统计
+        """
+        # 本地与共享样本使用同一时间戳，刷新时不会把自己发布的样本再合并一次
+        now = time.time()
+        accepted = latest_samples.update(batch, now)
+        if publish:
+            latest_samples.publish(batch, now)
+        
+        stats: Dict[str, Any] = {"accepted": accepted}
+        stats.update(self.advance_samples(batch))
+        return stats
+    
+    def advance_samples(self, batch: SeriesBatch) -> Dict[str, Any]:
+        """用新到达的样本记录序列窗口，并评估本副本持有的异常检测规则
+        
+        本副本接入的样本与从共享哈希合并进来的其他副本样本都经过这里，
+        每个样本只推进一次异常检测估计器。
+        
+        Args:
+            batch: 新到达的多序列样本
             
+        Returns:
+            异常检测规则的评估结果统计
+        """
+        self.record_window_samples(batch)
+        try:
+            self.ensure_rule_index()
+            anomaly_rules = self.owned_rules(
+                rule_index.snapshot.anomaly_rules_for_metrics(batch.metric_names)
+            )
+            if not anomaly_rules:
+                return {}
+            self.ensure_firing_state()
+            pending_states.restore()
+            results = self.evaluate_anomaly_rules(anomaly_rules, batch)
+            return self.process_rules(anomaly_rules, "metric", batch, results)
         except Exception as e:
-            logger.error(f"Failed to evaluate all rules: {e}")
+            logger.error(f"Failed to evaluate anomaly rules on ingest: {e}")
+            return {"error": str(e)}
+    
+    def evaluate_scheduled_rules(
+        self, rule_ids: List[int], data: Optional[SeriesBatch] = None
+    ) -> Dict[str, Any]:
+        """评估调度器下发的一批到期指标与自定义规则
+        
+        每条规则对最新样本中的每个序列分别评估；没有未过期样本的序列不产生
+        观测，已触发的告警保持不变。
+        
+        Args:
+            rule_ids: 到期的告警规则ID
+            data: 多序列样本，默认使用最新样本
+            
+        Returns:
+            评估结果统计
+        """
+        try:
+            self.ensure_firing_state()
+            pending_states.restore()
+            
+            snapshot = rule_index.snapshot
+            rules = [rule for rule in map(snapshot.get, rule_ids) if rule is not None]
+            metric_rules = [rule for rule in rules if rule.rule_type == AlertRuleType.METRIC]
+            custom_rules = [rule for rule in rules if rule.rule_type == AlertRuleType.CUSTOM]
+            if data is None:
+                metric_names = set()
+                for rule in metric_rules + custom_rules:
+                    metric_names.update(rule.referenced_metrics)
+                data = latest_samples.batch(metric_names)
+            
+            results = self.evaluate_series_rules(metric_rules, data)
+            results.update(self.evaluate_custom_series_rules(custom_rules, data))
+            return self.process_rules(metric_rules + custom_rules, "metric", data, results)
+            
+        except Exception as e:
+            logger.error(f"Failed to evaluate scheduled rules: {e}")
             return {
                 "error": str(e),
                 "timestamp": datetime.utcnow().isoformat()
             }
     
-    def cleanup_old_alerts(self, retention_days: int = 90) -> Dict[str, int]:
+    def cleanup_old_alerts(self, retention_days: int = 90) -> Dict[str, Any]:
         """清理旧告警数据
         
+        分区表上整月过期且不含触发中告警的分区直接分离并删除，
+        其余过期数据（或非分区表上的全部过期数据）分批在数据库端删除。
+        
         Args:
             retention_days: 保留天数
             
@@ -456,25 +1378,36 @@ class AlertEngine:
         try:
             cutoff_time = datetime.utcnow() - timedelta(days=retention_days)
             
-            # 获取要删除的告警
-            old_alerts = self.db.query(Alert).filter(
-                Alert.created_at < cutoff_time,
-                Alert.status != AlertStatus.FIRING
-            ).all()
-            
+            dropped_partitions = []
             deleted_count = 0
-            for alert in old_alerts:
-                try:
-                    self.db.delete(alert)
-                    deleted_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to delete alert {alert.id}: {e}")
-                    continue
+            if is_partitioned(self.db, Alert.__tablename__):
+                ensure_partitions(self.db, settings.ALERT_PARTITION_PREMAKE_MONTHS)
+                
+                # 处理记录晚于所属告警的 firing_at，早于最早触发中告警的分区可以整体删除
+                oldest_firing = crud_alert.get_oldest_firing_time(self.db)
+                actions_cutoff = cutoff_time
+                if oldest_firing is not None:
+                    actions_cutoff = min(cutoff_time, as_utc_naive(oldest_firing))
+                for name, _, end in list_partitions(self.db, AlertAction.__tablename__):
+                    if end <= actions_cutoff:
+                        drop_partition(self.db, AlertAction.__tablename__, name)
+                        dropped_partitions.append(name)
+                
+                for name, start, end in list_partitions(self.db, Alert.__tablename__):
+                    if end > cutoff_time:
+                        break
+                    if crud_alert.has_firing_alerts_between(self.db, start, end):
+                        continue
+                    deleted_count += drop_partition(self.db, Alert.__tablename__, name)
+                    dropped_partitions.append(name)
             
-            self.db.commit()
+            deleted_count += crud_alert.delete_alerts_before(
+                self.db, cutoff_time, settings.ALERT_RETENTION_DELETE_BATCH_SIZE
+            )
             
             return {
                 "deleted_alerts": deleted_count,
+                "dropped_partitions": dropped_partitions,
                 "cutoff_time": cutoff_time.isoformat(),
                 "retention_days": retention_days
             }
@@ -487,13 +1420,14 @@ class AlertEngine:
             }
 
 
-def get_alert_engine(db: Session) -> AlertEngine:
+def get_alert_engine(db: Session, batch_mode: bool = False) -> AlertEngine:
     """获取告警引擎实例
     
     Args:
         db: 数据库会话
+        batch_mode: 是否启用批量写入模式
         
     Returns:
         告警引擎实例
     """
-    return AlertEngine(db)
+    return AlertEngine(db, batch_mode=batch_mode)
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.alert import Alert, AlertStatus
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_of_alert(alert: Alert) -> str:
+    """读取告警的去重指纹，历史告警可能没有指纹"""
+    return alert.fingerprint or ""
+
+
+class FiringAlertCache:
+    """规则 -> 序列指纹 -> 正在触发的告警ID 的进程内状态表
+
+    启动时通过一次分组查询加载，触发与解决告警时同步更新，
+    并按 reconcile_interval 定期与数据库对账，以吸收其他副本或
+    手工操作带来的变化。稳态评估不再读取 alerts 表。
+    """
+
+    def __init__(self, reconcile_interval: int = 300):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._by_rule: Dict[int, Dict[str, Set[int]]] = {}
+        self._key_of: Dict[int, Tuple[int, str]] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_stale(self) -> bool:
+        """从未加载或超过对账间隔时需要从数据库重新加载"""
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at >= self.reconcile_interval
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def load(self, firing: Iterable[Tuple[int, int, str]]) -> int:
+        """用数据库中的触发告警整体替换状态表
+
+        Args:
+            firing: (alert_rule_id, alert_id, fingerprint) 序列
+
+        Returns:
+            加载的触发告警数量
+        """
+        by_rule: Dict[int, Dict[str, Set[int]]] = {}
+        key_of: Dict[int, Tuple[int, str]] = {}
+        for alert_rule_id, alert_id, fingerprint in firing:
+            fingerprint = fingerprint or ""
+            by_rule.setdefault(alert_rule_id, {}).setdefault(fingerprint, set()).add(alert_id)
+            key_of[alert_id] = (alert_rule_id, fingerprint)
+
+        with self._lock:
+            drift = len(key_of.keys() ^ self._key_of.keys())
+            self._by_rule = by_rule
+            self._key_of = key_of
+            self._loaded_at = time.monotonic()
+
+        if drift:
+            logger.info(f"Firing alert cache reconciled, {drift} alerts differed from database")
+        return len(key_of)
+
+    def get(self, alert_rule_id: int, fingerprint: Optional[str] = None) -> List[int]:
+        """返回规则下（或规则下某个序列）正在触发的告警ID"""
+        with self._lock:
+            series = self._by_rule.get(alert_rule_id)
+            if not series:
+                return []
+            if fingerprint is not None:
+                return list(series.get(fingerprint, ()))
+            return [alert_id for alert_ids in series.values() for alert_id in alert_ids]
+
+    def has_firing(self, alert_rule_id: int, fingerprint: Optional[str] = None) -> bool:
+        series = self._by_rule.get(alert_rule_id)
+        if not series:
+            return False
+        if fingerprint is not None:
+            return bool(series.get(fingerprint))
+        return True
+
+    def add(self, alert_rule_id: int, alert_id: int, fingerprint: str = "") -> None:
+        with self._lock:
+            self._by_rule.setdefault(alert_rule_id, {}).setdefault(fingerprint, set()).add(alert_id)
+            self._key_of[alert_id] = (alert_rule_id, fingerprint)
+
+    def discard(self, alert_id: int) -> None:
+        """告警不再处于触发状态时移除"""
+        with self._lock:
+            key = self._key_of.pop(alert_id, None)
+            if key is None:
+                return
+            alert_rule_id, fingerprint = key
+            series = self._by_rule.get(alert_rule_id, {})
+            alert_ids = series.get(fingerprint)
+            if alert_ids is not None:
+                alert_ids.discard(alert_id)
+                if not alert_ids:
+                    del series[fingerprint]
+            if not series:
+                self._by_rule.pop(alert_rule_id, None)
+
+    def track(self, alert: Alert) -> None:
+        """根据告警当前状态同步状态表（供告警接口在手工变更后调用）"""
+        if alert.status == AlertStatus.FIRING:
+            self.add(alert.alert_rule_id, alert.id, fingerprint_of_alert(alert))
+        else:
+            self.discard(alert.id)
+
+    def __len__(self) -> int:
+        return len(self._key_of)
+
+
+# 进程级触发状态表，由所有 AlertEngine 实例共享
+firing_alerts = FiringAlertCache(reconcile_interval=settings.ALERT_STATE_RECONCILE_INTERVAL)
@@ -0,0 +1,361 @@
+import abc
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 规则 condition["method"] 支持的在线估计方法
+ANOMALY_METHODS = ("ewma", "holt_winters")
+
+# z 分数所用标准差的下限为 max(|水平|, 1) 的该比例；恒定序列的方差为 0，
+# 不设下限时微小波动就会得到 inf/NaN 分数并误报
+RELATIVE_STD_FLOOR = 1e-3
+
+
+def _zscore(diff: np.ndarray, var: np.ndarray, level: np.ndarray) -> np.ndarray:
+    """按方差下限计算 z 分数，结果始终有限"""
+    floor = RELATIVE_STD_FLOOR * np.maximum(np.abs(level), 1.0)
+    return diff / np.sqrt(np.maximum(var, floor * floor))
+
+
+class AnomalySpec:
+    """异常检测规则的估计器参数"""
+
+    __slots__ = ("method", "alpha", "beta", "gamma", "season_length", "warmup")
+
+    def __init__(
+        self,
+        method: str = "ewma",
+        alpha: float = 0.1,
+        beta: float = 0.01,
+        gamma: float = 0.1,
+        season_length: int = 0,
+        warmup: Optional[int] = None
+    ):
+        self.method = method
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+        # 预热期内只更新估计器，不产生评分
+        if warmup is None:
+            warmup = 2 * season_length if method == "holt_winters" else 10
+        self.warmup = warmup
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        return (self.method, self.alpha, self.beta, self.gamma, self.season_length, self.warmup)
+
+    @classmethod
+    def from_condition(cls, condition: Dict[str, Any]) -> "AnomalySpec":
+        """从规则条件解析估计器参数
+
+        Raises:
+            ValueError: 参数非法
+        """
+        method = condition.get("method", "ewma")
+        if method not in ANOMALY_METHODS:
+            raise ValueError(f"Unknown anomaly method: {method}")
+        spec = cls(
+            method=method,
+            alpha=float(condition.get("alpha", 0.1)),
+            beta=float(condition.get("beta", 0.01)),
+            gamma=float(condition.get("gamma", 0.1)),
+            season_length=int(condition.get("season_length", 0)),
+            warmup=condition.get("warmup")
+        )
+        for name in ("alpha", "beta", "gamma"):
+            if not 0 < getattr(spec, name) < 1:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if method == "holt_winters" and spec.season_length < 2:
+            raise ValueError("holt_winters requires season_length >= 2")
+        if int(spec.warmup) < 1:
+            raise ValueError("warmup must be positive")
+        spec.warmup = int(spec.warmup)
+        return spec
+
+
+class _Estimator(abc.ABC):
+    """按行保存多个序列状态的估计器基类，数组容量按需倍增"""
+
+    def __init__(self, spec: AnomalySpec, capacity: int = 1024):
+        self.spec = spec
+        self.capacity = 0
+        self.count = np.zeros(0, dtype=np.int64)
+        self._grow(capacity)
+
+    def _resize(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        resized[:array.shape[0]] = array
+        return resized
+
+    def _grow(self, capacity: int) -> None:
+        self.count = self._resize(self.count, capacity)
+        self.capacity = capacity
+
+    def reset(self, rows: np.ndarray) -> None:
+        """清空行状态，供回收的行分配给新序列"""
+        self.count[rows] = 0
+
+    def ensure_capacity(self, rows: int) -> None:
+        if rows > self.capacity:
+            capacity = self.capacity
+            while capacity < rows:
+                capacity *= 2
+            self._grow(capacity)
+
+    @abc.abstractmethod
+    def update(self, rows: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """用一批样本更新对应行的状态
+
+        Args:
+            rows: 序列行号，不可重复
+            values: 样本值
+
+        Returns:
+            (更新前的预测值, z 分数)，预热期内的 z 分数为 NaN
+        """
+
+
+class EwmaEstimator(_Estimator):
+    """指数加权均值与方差（EWMA / EWMVar），每个序列两个浮点数状态"""
+
+    def _grow(self, capacity: int) -> None:
+        if self.capacity == 0:
+            self.mean = np.zeros(0)
+            self.var = np.zeros(0)
+        self.mean = self._resize(self.mean, capacity)
+        self.var = self._resize(self.var, capacity)
+        super()._grow(capacity)
+
+    def reset(self, rows: np.ndarray) -> None:
+        self.mean[rows] = 0
+        self.var[rows] = 0
+        super().reset(rows)
+
+    def update(self, rows: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        alpha = self.spec.alpha
+        count = self.count[rows]
+        first = count == 0
+        mean = np.where(first, values, self.mean[rows])
+        var = self.var[rows]
+
+        diff = values - mean
+        score = _zscore(diff, var, mean)
+        score[count < self.spec.warmup] = np.nan
+
+        increment = alpha * diff
+        self.mean[rows] = mean + increment
+        self.var[rows] = (1 - alpha) * (var + diff * increment)
+        self.count[rows] = count + 1
+        return mean, score
+
+
+class HoltWintersEstimator(_Estimator):
+    """加法季节 Holt-Winters，残差方差用 EWMVar 估计
+
+    每个序列保存水平、趋势、残差方差与 season_length 个季节分量，
+    每个样本推进一个季节位置。
+    """
+
+    def _grow(self, capacity: int) -> None:
+        if self.capacity == 0:
+            self.level = np.zeros(0)
+            self.trend = np.zeros(0)
+            self.err_var = np.zeros(0)
+            self.seasonal = np.zeros((0, self.spec.season_length))
+        self.level = self._resize(self.level, capacity)
+        self.trend = self._resize(self.trend, capacity)
+        self.err_var = self._resize(self.err_var, capacity)
+        self.seasonal = self._resize(self.seasonal, capacity)
+        super()._grow(capacity)
+
+    def reset(self, rows: np.ndarray) -> None:
+        self.level[rows] = 0
+        self.trend[rows] = 0
+        self.err_var[rows] = 0
+        self.seasonal[rows] = 0
+        super().reset(rows)
+
+    def update(self, rows: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        spec = self.spec
+        count = self.count[rows]
+        first = count == 0
+        phase = count % spec.season_length
+
+        level = np.where(first, values, self.level[rows])
+        trend = self.trend[rows]
+        seasonal = self.seasonal[rows, phase]
+        err_var = self.err_var[rows]
+
+        forecast = level + trend + seasonal
+        error = values - forecast
+        score = _zscore(error, err_var, level)
+        score[count < spec.warmup] = np.nan
+
+        new_level = spec.alpha * (values - seasonal) + (1 - spec.alpha) * (level + trend)
+        self.trend[rows] = spec.beta * (new_level - level) + (1 - spec.beta) * trend
+        self.seasonal[rows, phase] = spec.gamma * (values - new_level) + (1 - spec.gamma) * seasonal
+        self.level[rows] = new_level
+        self.err_var[rows] = (1 - spec.alpha) * (err_var + spec.alpha * error * error)
+        self.count[rows] = count + 1
+        return forecast, score
+
+
+class AnomalyDetector:
+    """单条异常检测规则在全部序列上的在线状态
+
+    每个序列占估计器的一行。序列数达到 max_series 时，超过 idle_ttl 秒
+    未更新的序列（例如已下线的主机）被回收，其行清空后分配给新序列；
+    仍无空闲行时新序列被忽略并计入 overflow。
+    """
+
+    def __init__(self, spec: AnomalySpec, max_series: int, idle_ttl: int = 3600):
+        self.spec = spec
+        self.max_series = max_series
+        self.idle_ttl = idle_ttl
+        self._rows: Dict[str, int] = {}
+        # 行号 -> 序列指纹（空闲行为 None）与最近更新时间
+        self._fingerprints: List[Optional[str]] = []
+        self._last_seen = np.zeros(0)
+        self._free: List[int] = []
+        self._estimator = (
+            HoltWintersEstimator(spec) if spec.method == "holt_winters" else EwmaEstimator(spec)
+        )
+        self._lock = threading.Lock()
+        self._overflow_logged = False
+        self.evicted = 0
+        self.overflow = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _allocate(self, fingerprint: str) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._fingerprints[row] = fingerprint
+        else:
+            row = len(self._fingerprints)
+            self._fingerprints.append(fingerprint)
+        self._rows[fingerprint] = row
+        return row
+
+    def _evict_idle(self, now: float) -> int:
+        """回收超过 idle_ttl 秒未更新的序列行"""
+        used = len(self._fingerprints)
+        idle = np.flatnonzero(self._last_seen[:used] < now - self.idle_ttl)
+        idle = [row for row in idle.tolist() if self._fingerprints[row] is not None]
+        if not idle:
+            return 0
+        for row in idle:
+            del self._rows[self._fingerprints[row]]
+            self._fingerprints[row] = None
+        self._estimator.reset(np.asarray(idle, dtype=np.intp))
+        self._free.extend(idle)
+        self.evicted += len(idle)
+        self._overflow_logged = False
+        logger.info(f"Anomaly detector evicted {len(idle)} series idle for {self.idle_ttl}s")
+        return len(idle)
+
+    def update(
+        self, fingerprints: Sequence[str], values: Sequence[float], now: Optional[float] = None
+    ) -> List[Tuple[int, float, float]]:
+        """批量更新一批序列并计算 z 分数
+
+        Args:
+            fingerprints: 序列指纹，不可重复
+            values: 对应的样本值
+            now: 当前时间戳（秒）
+
+        Returns:
+            [(输入下标, 预测值, z 分数)]，超出序列上限的新序列不在其中
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._rows
+            positions = []
+            row_ids = []
+            evicted = False
+            for position, fingerprint in enumerate(fingerprints):
+                row = rows.get(fingerprint)
+                if row is None:
+                    if len(rows) >= self.max_series and not evicted:
+                        # 每批至多扫描一次空闲序列
+                        self._evict_idle(now)
+                        evicted = True
+                    if len(rows) >= self.max_series:
+                        self.overflow += 1
+                        if not self._overflow_logged:
+                            logger.warning(
+                                f"Anomaly detector reached {self.max_series} series, new series ignored"
+                            )
+                            self._overflow_logged = True
+                        continue
+                    row = self._allocate(fingerprint)
+                positions.append(position)
+                row_ids.append(row)
+            if not row_ids:
+                return []
+
+            used = len(self._fingerprints)
+            self._estimator.ensure_capacity(used)
+            if used > len(self._last_seen):
+                last_seen = np.zeros(self._estimator.capacity)
+                last_seen[:len(self._last_seen)] = self._last_seen
+                self._last_seen = last_seen
+            row_array = np.asarray(row_ids, dtype=np.intp)
+            self._last_seen[row_array] = now
+            value_array = np.asarray(values, dtype=np.float64)[positions]
+            expected, score = self._estimator.update(row_array, value_array)
+
+        return list(zip(positions, expected.tolist(), score.tolist()))
+
+
+class AnomalyStore:
+    """按规则保存异常检测状态，规则参数变化时重置该规则的状态"""
+
+    def __init__(self, max_series: int = 200000, idle_ttl: int = 3600):
+        self.max_series = max_series
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._detectors: Dict[int, AnomalyDetector] = {}
+
+    def detector(self, alert_rule_id: int, spec: AnomalySpec) -> AnomalyDetector:
+        with self._lock:
+            detector = self._detectors.get(alert_rule_id)
+            if detector is None or detector.spec.key != spec.key:
+                detector = self._detectors[alert_rule_id] = AnomalyDetector(
+                    spec, self.max_series, self.idle_ttl
+                )
+            return detector
+
+    def discard_rule(self, alert_rule_id: int) -> None:
+        with self._lock:
+            self._detectors.pop(alert_rule_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(detector) for detector in self._detectors.values())
+
+    def stats(self) -> Dict[str, Any]:
+        detectors = list(self._detectors.values())
+        return {
+            "rules": len(detectors),
+            "series": sum(len(detector) for detector in detectors),
+            "max_series": self.max_series,
+            "evicted": sum(detector.evicted for detector in detectors),
+            "overflow": sum(detector.overflow for detector in detectors),
+        }
+
+
+# 进程级异常检测状态，由所有 AlertEngine 实例共享
+anomaly_states = AnomalyStore(
+    max_series=settings.ALERT_ANOMALY_MAX_SERIES,
+    idle_ttl=settings.ALERT_ANOMALY_IDLE_TTL
+)
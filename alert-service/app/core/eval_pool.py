@@ -0,0 +1,266 @@
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.vector_eval import OPERATOR_CODES, evaluate_threshold_arrays
+
+logger = logging.getLogger(__name__)
+
+
+# 工作进程内当前挂载的规则块：共享内存名 -> (共享内存, 指标编号, 规则指标, 阈值, 运算符编码)
+_worker_rules: Dict[str, Tuple[Any, Dict[str, int], np.ndarray, np.ndarray, np.ndarray]] = {}
+
+
+def _rule_layout(n_rules: int) -> Tuple[int, int, int]:
+    """规则块内各数组的偏移：规则指标 (intp)、阈值 (float64)、运算符编码 (int8)、指标名 (JSON)"""
+    thresholds_at = n_rules * np.dtype(np.intp).itemsize
+    op_codes_at = thresholds_at + n_rules * np.dtype(np.float64).itemsize
+    names_at = op_codes_at + n_rules
+    return thresholds_at, op_codes_at, names_at
+
+
+def _attach_rules(
+    rules_name: str, n_rules: int, names_size: int
+) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray]:
+    """挂载规则块，每个工作进程每个规则版本只解析一次"""
+    cached = _worker_rules.get(rules_name)
+    if cached is None:
+        # 新版本规则到达，释放旧版本的挂载
+        for shm, *_ in _worker_rules.values():
+            shm.close()
+        _worker_rules.clear()
+        shm = shared_memory.SharedMemory(name=rules_name)
+        thresholds_at, op_codes_at, names_at = _rule_layout(n_rules)
+        metric_names = json.loads(bytes(shm.buf[names_at:names_at + names_size]))
+        cached = _worker_rules[rules_name] = (
+            shm,
+            {name: pos for pos, name in enumerate(metric_names)},
+            np.ndarray(n_rules, dtype=np.intp, buffer=shm.buf),
+            np.ndarray(n_rules, dtype=np.float64, buffer=shm.buf, offset=thresholds_at),
+            np.ndarray(n_rules, dtype=np.int8, buffer=shm.buf, offset=op_codes_at),
+        )
+    return cached[1:]
+
+
+def _evaluate_block(
+    rules_name: str,
+    n_rules: int,
+    names_size: int,
+    shm_name: str,
+    shape: Tuple[int, int],
+    batch_metric_names: List[str],
+    row_start: int,
+    row_end: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """在工作进程中评估共享内存样本矩阵的一段行
+
+    Returns:
+        (规则下标, 行下标)，规则下标对应规则块中的规则顺序
+    """
+    metric_positions, metrics, thresholds, op_codes = _attach_rules(rules_name, n_rules, names_size)
+    # 批次指标列 -> 规则引用的全局指标编号，批次中没有的指标规则被跳过
+    batch_columns = np.full(len(metric_positions), -1, dtype=np.intp)
+    for column, metric_name in enumerate(batch_metric_names):
+        position = metric_positions.get(metric_name)
+        if position is not None:
+            batch_columns[position] = column
+    columns = batch_columns[metrics]
+    rule_idx = np.flatnonzero(columns >= 0)
+    if not rule_idx.size:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        hit_rules, hit_rows = evaluate_threshold_arrays(
+            values[row_start:row_end],
+            columns[rule_idx], thresholds[rule_idx], op_codes[rule_idx]
+        )
+        # 返回前复制结果并释放对共享内存的引用
+        result = rule_idx[hit_rules], hit_rows + row_start
+        del values
+    finally:
+        shm.close()
+    return result
+
+
+class _RuleBlock:
+    """一个规则版本的编译结果及其共享内存块
+
+    正在使用该版本的评估持有引用，版本被替换且引用归零后才释放共享内存。
+    """
+
+    __slots__ = ("generation", "rules", "shm", "n_rules", "names_size", "refs", "retired")
+
+    def __init__(self, generation: int, rules: Sequence[Any]):
+        self.generation = generation
+        self.rules = [
+            rule for rule in rules
+            if rule.metric_name and rule.comparison_operator in OPERATOR_CODES
+        ]
+        metric_names = sorted({rule.metric_name for rule in self.rules})
+        positions = {name: pos for pos, name in enumerate(metric_names)}
+        names = json.dumps(metric_names).encode("utf-8")
+        self.n_rules = len(self.rules)
+        self.names_size = len(names)
+        thresholds_at, op_codes_at, names_at = _rule_layout(self.n_rules)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(names_at + self.names_size, 1))
+        buf = self.shm.buf
+        np.ndarray(self.n_rules, dtype=np.intp, buffer=buf)[:] = [
+            positions[rule.metric_name] for rule in self.rules
+        ]
+        np.ndarray(self.n_rules, dtype=np.float64, buffer=buf, offset=thresholds_at)[:] = [
+            rule.threshold for rule in self.rules
+        ]
+        np.ndarray(self.n_rules, dtype=np.int8, buffer=buf, offset=op_codes_at)[:] = [
+            OPERATOR_CODES[rule.comparison_operator] for rule in self.rules
+        ]
+        buf[names_at:names_at + self.names_size] = names
+        self.refs = 0
+        self.retired = False
+
+    def release(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+class EvaluationPool:
+    """多进程阈值评估池
+
+    进程池只创建一次。规则集的编译结果（指标编号、阈值、运算符编码数组）
+    按规则索引版本写入一块共享内存，工作进程在首次遇到新版本时挂载一次，
+    规则变化不需要重建进程池。旧版本的共享内存在仍在使用它的评估结束后
+    才释放。每次评估把样本矩阵写入另一块共享内存，按行切分给各工作进程，
+    工作进程只返回越限的 (规则, 行) 下标。
+    """
+
+    def __init__(self, max_workers: int = 0, min_rows: int = 10000):
+        self.max_workers = max_workers
+        self.min_rows = min_rows
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._block: Optional[_RuleBlock] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 1
+
+    @property
+    def rules(self) -> List[Any]:
+        block = self._block
+        return block.rules if block is not None else []
+
+    def ensure(self, generation: int, rules: Sequence[Any]) -> None:
+        """启动进程池，并在规则索引版本变化时重新编译规则"""
+        with self._lock:
+            if self._block is not None and self._block.generation == generation:
+                return
+            if self._executor is None:
+                # spawn 避免在持有调度与 Redis 线程的进程中 fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            old, self._block = self._block, _RuleBlock(generation, rules)
+            if old is not None:
+                old.retired = True
+                if old.refs:
+                    old = None
+        if old is not None:
+            old.release()
+        logger.info(
+            f"Evaluation pool compiled {len(self.rules)} rules for generation {generation} "
+            f"on {self.max_workers} processes"
+        )
+
+    def evaluate(
+        self, metric_names: Sequence[str], values: np.ndarray
+    ) -> Tuple[List[Any], np.ndarray, np.ndarray]:
+        """在进程池中评估样本矩阵
+
+        Args:
+            metric_names: 指标名列表，与 values 的列对应
+            values: 样本矩阵 (N, K)，缺失值为 NaN
+
+        Returns:
+            (本次使用的规则列表, 规则下标, 行下标)
+        """
+        with self._lock:
+            executor, block = self._executor, self._block
+            if executor is None or block is None:
+                raise RuntimeError("Evaluation pool is not initialized")
+            block.refs += 1
+        try:
+            return self._evaluate(executor, block, metric_names, values)
+        finally:
+            with self._lock:
+                block.refs -= 1
+                retire = block.retired and not block.refs
+            if retire:
+                block.release()
+
+    def _evaluate(
+        self,
+        executor: ProcessPoolExecutor,
+        block: _RuleBlock,
+        metric_names: Sequence[str],
+        values: np.ndarray
+    ) -> Tuple[List[Any], np.ndarray, np.ndarray]:
+        rules = block.rules
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if not values.size:
+            empty = np.empty(0, dtype=np.intp)
+            return rules, empty, empty
+        shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+        try:
+            np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+            rows = values.shape[0]
+            step = -(-rows // self.max_workers)
+            futures = [
+                executor.submit(
+                    _evaluate_block, block.shm.name, block.n_rules, block.names_size,
+                    shm.name, values.shape, list(metric_names),
+                    start, min(start + step, rows)
+                )
+                for start in range(0, rows, step)
+            ]
+            parts = [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+
+        rule_hits = [hit_rules for hit_rules, _ in parts if hit_rules.size]
+        if not rule_hits:
+            empty = np.empty(0, dtype=np.intp)
+            return rules, empty, empty
+        row_hits = [hit_rows for hit_rules, hit_rows in parts if hit_rules.size]
+        return rules, np.concatenate(rule_hits), np.concatenate(row_hits)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            block, self._block = self._block, None
+            if block is not None:
+                block.retired = True
+                if block.refs:
+                    block = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if block is not None:
+            block.release()
+
+
+# 进程级评估池，由所有 AlertEngine 实例共享（ALERT_EVAL_PROCESSES <= 1 时不启用）
+evaluation_pool = EvaluationPool(
+    max_workers=settings.ALERT_EVAL_PROCESSES,
+    min_rows=settings.ALERT_EVAL_POOL_MIN_ROWS
+)
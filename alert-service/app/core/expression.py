@@ -0,0 +1,277 @@
+import ast
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+# 表达式长度与语法树节点数上限，防止构造超大规则
+MAX_EXPRESSION_LENGTH = 2000
+MAX_EXPRESSION_NODES = 500
+
+
+class ExpressionError(ValueError):
+    """表达式语法错误或使用了不允许的构造"""
+
+
+class MissingMetricError(LookupError):
+    """表达式引用的指标在数据中不存在"""
+
+
+class InsufficientDataError(LookupError):
+    """rate() 需要至少两次观测"""
+
+
+def _avg(*values: float) -> float:
+    return sum(values) / len(values)
+
+
+# 表达式可调用的函数；rate 与 metric 在编译时单独处理
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "avg": _avg,
+    "min": min,
+    "max": max,
+    "sum": lambda *values: sum(values),
+    "abs": abs,
+}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub, ast.Not)
+_COMPARE_OPERATORS = (ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """node.cpu.usage 形式的属性链解析为指标名"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class _Compiler(ast.NodeTransformer):
+    """校验表达式并改写为只调用注入函数的语法树
+
+    指标引用改写为 _metric("name")，rate(x) 改写为 _rate("name")，
+    函数调用改写为 _fn_<name>(...)；其余节点必须在白名单内。
+    """
+
+    def __init__(self):
+        self.metrics = set()
+        self.rate_metrics = set()
+
+    def _metric_call(self, target: str, name: str) -> ast.Call:
+        return ast.Call(
+            func=ast.Name(id=target, ctx=ast.Load()),
+            args=[ast.Constant(value=name)], keywords=[]
+        )
+
+    def _metric_argument(self, node: ast.Call) -> str:
+        if len(node.args) != 1 or node.keywords:
+            raise ExpressionError(f"{node.func.id}() takes exactly one metric")
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            return arg.value
+        name = _dotted_name(arg)
+        if name is None:
+            raise ExpressionError(f"{node.func.id}() argument must be a metric name")
+        return name
+
+    def visit_Expression(self, node: ast.Expression) -> ast.AST:
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in ("True", "False"):
+            return ast.Constant(value=node.id == "True")
+        self.metrics.add(node.id)
+        return self._metric_call("_metric", node.id)
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        name = _dotted_name(node)
+        if name is None:
+            raise ExpressionError("Attribute access is not allowed")
+        self.metrics.add(name)
+        return self._metric_call("_metric", name)
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        if type(node.value) not in (int, float, bool):
+            raise ExpressionError(f"Unsupported constant: {node.value!r}")
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if not isinstance(node.func, ast.Name):
+            raise ExpressionError("Only plain function calls are allowed")
+        func_name = node.func.id
+        if func_name == "metric":
+            name = self._metric_argument(node)
+            self.metrics.add(name)
+            return self._metric_call("_metric", name)
+        if func_name == "rate":
+            name = self._metric_argument(node)
+            self.rate_metrics.add(name)
+            return self._metric_call("_rate", name)
+        if func_name not in FUNCTIONS:
+            raise ExpressionError(f"Unknown function: {func_name}")
+        if node.keywords or not node.args:
+            raise ExpressionError(f"{func_name}() takes one or more positional arguments")
+        return ast.Call(
+            func=ast.Name(id=f"_fn_{func_name}", ctx=ast.Load()),
+            args=[self.visit(arg) for arg in node.args], keywords=[]
+        )
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise ExpressionError(f"Operator not allowed: {type(node.op).__name__}")
+        return self.generic_visit(node)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise ExpressionError(f"Operator not allowed: {type(node.op).__name__}")
+        return self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        if not all(isinstance(op, _COMPARE_OPERATORS) for op in node.ops):
+            raise ExpressionError("Comparison operator not allowed")
+        return self.generic_visit(node)
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        return self.generic_visit(node)
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        allowed = (
+            ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare,
+            ast.And, ast.Or, ast.Load
+        ) + _BINARY_OPERATORS + _UNARY_OPERATORS + _COMPARE_OPERATORS
+        if not isinstance(node, allowed):
+            raise ExpressionError(f"Syntax not allowed: {type(node).__name__}")
+        return super().generic_visit(node)
+
+
+class CompiledExpression:
+    """编译后的自定义规则表达式
+
+    保存时解析校验一次，编译为普通 Python 函数；评估时只是一次函数调用，
+    不再解析或遍历语法树。rate() 所需的上一次观测由调用方按规则保存。
+    """
+
+    __slots__ = ("source", "metrics", "rate_metrics", "_fn")
+
+    def __init__(self, source: str, metrics: FrozenSet[str], rate_metrics: FrozenSet[str], fn):
+        self.source = source
+        self.metrics = metrics
+        self.rate_metrics = rate_metrics
+        self._fn = fn
+
+    @property
+    def referenced_metrics(self) -> FrozenSet[str]:
+        """表达式引用的全部指标，包括只出现在 rate() 中的指标"""
+        return self.metrics | self.rate_metrics
+
+    def evaluate(
+        self,
+        data: Any,
+        state: Optional[Dict[str, Tuple[float, float]]] = None,
+        now: Optional[float] = None
+    ) -> Any:
+        """对一组指标值求值
+
+        Args:
+            data: 指标名 -> 值，支持 dict 或任何带 get() 的对象
+            state: rate() 的上一次观测 {指标名: (值, 时间戳)}，会被原地更新
+            now: 当前时间戳
+
+        Returns:
+            表达式的值（布尔或数值）
+        """
+        get = data.get
+
+        def metric(name: str) -> float:
+            value = get(name)
+            if value is None:
+                raise MissingMetricError(name)
+            return value
+
+        rates: Dict[str, float] = {}
+        if self.rate_metrics:
+            now = time.time() if now is None else now
+            state = {} if state is None else state
+            # 先更新全部观测，同一表达式中重复的 rate(x) 得到相同结果
+            for name in self.rate_metrics:
+                value = metric(name)
+                previous = state.get(name)
+                state[name] = (value, now)
+                if previous is not None and now > previous[1]:
+                    delta = value - previous[0]
+                    # 计数器重置时把当前值视为增量
+                    rates[name] = (delta if delta >= 0 else value) / (now - previous[1])
+
+        def rate(name: str) -> float:
+            if name not in rates:
+                raise InsufficientDataError(name)
+            return rates[name]
+
+        return self._fn(metric, rate)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(source: str) -> CompiledExpression:
+    """解析、校验并编译表达式，相同表达式只编译一次
+
+    Raises:
+        ExpressionError: 表达式非法
+    """
+    if not isinstance(source, str) or not source.strip():
+        raise ExpressionError("Expression is empty")
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_EXPRESSION_NODES:
+        raise ExpressionError(f"Expression has more than {MAX_EXPRESSION_NODES} nodes")
+
+    compiler = _Compiler()
+    body = compiler.visit(tree).body
+    lambda_tree = ast.Expression(body=ast.Lambda(
+        args=ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg="_metric"), ast.arg(arg="_rate")],
+            kwonlyargs=[], kw_defaults=[], defaults=[]
+        ),
+        body=body
+    ))
+    ast.fix_missing_locations(lambda_tree)
+
+    namespace: Dict[str, Any] = {"__builtins__": {}}
+    namespace.update({f"_fn_{name}": fn for name, fn in FUNCTIONS.items()})
+    fn = eval(compile(lambda_tree, "<alert-expression>", "eval"), namespace)
+
+    return CompiledExpression(
+        source, frozenset(compiler.metrics), frozenset(compiler.rate_metrics), fn
+    )
+
+
+class RateStateStore:
+    """各自定义规则 rate() 的上一次观测，按 (规则, 序列指纹) 分别保存
+
+    不同主机的样本交替到达时各自计算速率，互不干扰；规则索引重建后仍然保留。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, Dict[str, Dict[str, Tuple[float, float]]]] = {}
+
+    def get(self, alert_rule_id: int, fingerprint: str = "") -> Dict[str, Tuple[float, float]]:
+        with self._lock:
+            return self._states.setdefault(alert_rule_id, {}).setdefault(fingerprint, {})
+
+    def discard_rule(self, alert_rule_id: int) -> None:
+        with self._lock:
+            self._states.pop(alert_rule_id, None)
+
+
+# 进程级 rate() 观测状态，由所有 AlertEngine 实例共享
+rate_states = RateStateStore()
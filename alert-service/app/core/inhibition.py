@@ -0,0 +1,226 @@
+import enum
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.rule_index import rule_index
+from app.models.alert import InhibitionRule
+
+logger = logging.getLogger(__name__)
+
+
+Labels = Dict[str, str]
+SourceKey = Tuple[int, Tuple[str, ...]]
+
+
+def alert_labels(
+    alert_rule_id: int, severity: Any, labels: Optional[Dict[str, Any]] = None
+) -> Labels:
+    """告警参与抑制匹配的标签：告警标签加上 alertname（规则名）与 severity
+
+    Args:
+        alert_rule_id: 告警规则ID
+        severity: 告警级别
+        labels: 告警标签，嵌套的值不参与匹配
+
+    Returns:
+        {标签: 字符串值}
+    """
+    result = {
+        str(name): str(value) for name, value in (labels or {}).items()
+        if value is not None and not isinstance(value, (dict, list))
+    }
+    rule = rule_index.snapshot.get(alert_rule_id)
+    if rule is not None:
+        result.setdefault("alertname", rule.name)
+    result["severity"] = severity.value if isinstance(severity, enum.Enum) else str(severity)
+    return result
+
+
+class _CompiledInhibitionRule:
+    __slots__ = ("id", "source", "target", "equal")
+
+    def __init__(self, rule: InhibitionRule):
+        self.id = rule.id
+        self.source = {str(name): str(value) for name, value in (rule.source_matchers or {}).items()}
+        self.target = {str(name): str(value) for name, value in (rule.target_matchers or {}).items()}
+        self.equal = tuple(rule.equal or ())
+
+    def equal_values(self, labels: Labels) -> Tuple[str, ...]:
+        # 与 Alertmanager 相同，双方都缺少的标签视为相等
+        return tuple(labels.get(name, "") for name in self.equal)
+
+
+class _MatcherIndex:
+    """(标签, 值) -> 规则 的倒排索引，用于找出全部等值匹配条件都满足的规则"""
+
+    def __init__(self, rules: Sequence[_CompiledInhibitionRule], attr: str):
+        self._sizes: Dict[int, int] = {}
+        self._postings: Dict[Tuple[str, str], List[int]] = {}
+        for rule in rules:
+            matchers = getattr(rule, attr)
+            self._sizes[rule.id] = len(matchers)
+            for pair in matchers.items():
+                self._postings.setdefault(pair, []).append(rule.id)
+
+    def matching(self, labels: Labels) -> List[int]:
+        """标签满足全部匹配条件的规则ID，耗时与标签数（及命中的倒排项）成正比"""
+        hits: Dict[int, int] = {}
+        postings = self._postings
+        for pair in labels.items():
+            for rule_id in postings.get(pair, ()):
+                hits[rule_id] = hits.get(rule_id, 0) + 1
+        sizes = self._sizes
+        return [rule_id for rule_id, count in hits.items() if count == sizes[rule_id]]
+
+
+class InhibitionIndex:
+    """抑制规则与触发中源告警的内存索引
+
+    规则的源与目标匹配条件分别建立 (标签, 值) 倒排索引；触发中的源告警按
+    (抑制规则, equal 标签取值) 登记。检查新告警时先由目标倒排索引找出其
+    满足的规则，再按 equal 标签取值查找是否有其他触发中的源告警，耗时只与
+    告警的标签数有关，与触发中的告警数量无关。
+    """
+
+    def __init__(self, refresh_interval: int = 60):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rules: Dict[int, _CompiledInhibitionRule] = {}
+        self._source_index = _MatcherIndex([], "source")
+        self._target_index = _MatcherIndex([], "target")
+        # (规则ID, equal 取值) -> {源告警指纹: 告警ID}
+        self._sources: Dict[SourceKey, Dict[str, int]] = {}
+        # 告警ID -> (指纹, 登记的键)，告警解决时据此移除
+        self._source_keys: Dict[int, Tuple[str, List[SourceKey]]] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_stale(self) -> bool:
+        """从未加载或超过刷新间隔时需要从数据库重新加载"""
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def load(
+        self,
+        rules: Iterable[InhibitionRule],
+        firing: Iterable[Tuple[int, str, Labels]]
+    ) -> int:
+        """用数据库中的抑制规则与触发中告警整体替换索引
+
+        Args:
+            rules: 启用的抑制规则
+            firing: 触发中告警的 (告警ID, 指纹, 匹配标签)
+
+        Returns:
+            加载的抑制规则数量
+        """
+        compiled = [_CompiledInhibitionRule(rule) for rule in rules]
+        with self._lock:
+            self._rules = {rule.id: rule for rule in compiled}
+            self._source_index = _MatcherIndex(compiled, "source")
+            self._target_index = _MatcherIndex(compiled, "target")
+            self._sources = {}
+            self._source_keys = {}
+            if self._rules:
+                for alert_id, fingerprint, labels in firing:
+                    self._add_source(alert_id, fingerprint, labels)
+            self._loaded_at = time.monotonic()
+            sources = len(self._source_keys)
+
+        logger.info(f"Inhibition index loaded: {len(compiled)} rules, {sources} source alerts")
+        return len(compiled)
+
+    def add_source(self, alert_id: int, fingerprint: str, labels: Labels) -> None:
+        """登记一条新触发的告警（只有满足某条规则源匹配条件的告警会被登记）"""
+        with self._lock:
+            self._remove_source(alert_id)
+            self._add_source(alert_id, fingerprint, labels)
+
+    def remove_source(self, alert_id: int) -> None:
+        """告警解决后移除其登记"""
+        with self._lock:
+            self._remove_source(alert_id)
+
+    def is_inhibited(self, fingerprint: str, labels: Labels) -> bool:
+        """检查告警是否被某条触发中的源告警抑制（告警不会抑制自己）"""
+        if not self._rules:
+            return False
+        with self._lock:
+            return self._inhibitor(fingerprint, labels) is not None
+
+    def split_inhibited(
+        self, alerts: Sequence[Tuple[str, Labels]]
+    ) -> List[bool]:
+        """检查同一批新告警，批内的源告警同样可以抑制批内其他告警
+
+        Args:
+            alerts: (指纹, 匹配标签) 列表
+
+        Returns:
+            与输入对应的是否被抑制
+        """
+        if not self._rules:
+            return [False] * len(alerts)
+        with self._lock:
+            batch: Dict[SourceKey, Dict[str, int]] = {}
+            for fingerprint, labels in alerts:
+                for key in self._keys_for_source(labels):
+                    batch.setdefault(key, {})[fingerprint] = 0
+            return [
+                self._inhibitor(fingerprint, labels, batch) is not None
+                for fingerprint, labels in alerts
+            ]
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def _keys_for_source(self, labels: Labels) -> List[SourceKey]:
+        rules = self._rules
+        return [
+            (rule_id, rules[rule_id].equal_values(labels))
+            for rule_id in self._source_index.matching(labels)
+        ]
+
+    def _inhibitor(
+        self, fingerprint: str, labels: Labels, batch: Optional[Dict[SourceKey, Dict[str, int]]] = None
+    ) -> Optional[int]:
+        rules = self._rules
+        for rule_id in self._target_index.matching(labels):
+            key = (rule_id, rules[rule_id].equal_values(labels))
+            for sources in (self._sources.get(key), batch.get(key) if batch else None):
+                if sources and any(source != fingerprint for source in sources):
+                    return rule_id
+        return None
+
+    def _add_source(self, alert_id: int, fingerprint: str, labels: Labels) -> None:
+        keys = self._keys_for_source(labels)
+        if not keys:
+            return
+        for key in keys:
+            self._sources.setdefault(key, {})[fingerprint] = alert_id
+        self._source_keys[alert_id] = (fingerprint, keys)
+
+    def _remove_source(self, alert_id: int) -> None:
+        record = self._source_keys.pop(alert_id, None)
+        if record is None:
+            return
+        fingerprint, keys = record
+        for key in keys:
+            fingerprints = self._sources.get(key)
+            if fingerprints is None:
+                continue
+            if fingerprints.get(fingerprint) == alert_id:
+                del fingerprints[fingerprint]
+            if not fingerprints:
+                del self._sources[key]
+
+
+# 进程级抑制索引，由所有 AlertEngine 实例共享
+inhibition_index = InhibitionIndex(refresh_interval=settings.ALERT_INHIBITION_REFRESH_INTERVAL)
@@ -0,0 +1,147 @@
+import logging
+from collections import Counter, deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式字符串匹配自动机
+
+    一次扫描文本即可找出所有出现的模式，复杂度与模式数量无关。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        outputs: List[List[int]] = [[]]
+        for pattern in patterns:
+            if not pattern:
+                continue
+            index = len(self.patterns)
+            self.patterns.append(pattern)
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        # 广度优先构建失败指针，并合并后缀状态的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+
+        self._output = [tuple(sorted(set(output))) for output in outputs]
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def search(self, text: str) -> Set[int]:
+        """返回文本中出现的模式下标集合"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class LogRuleMatcher:
+    """所有 LOG 规则的联合匹配器
+
+    pattern 条件编译进一个 Aho-Corasick 自动机，level 与 source 条件
+    使用哈希查找。对日志批次只扫描一遍，即可得到每条规则的匹配数。
+    单条日志满足规则任一条件即计为一次匹配，与 evaluate_log_rule 一致。
+    """
+
+    def __init__(self, rules: Iterable[Any]):
+        self.rule_ids: List[int] = []
+        patterns: Dict[str, int] = {}
+        # 匹配键 -> 规则ID；键形如 ("pattern", i)、("level", "ERROR")、("source", "nginx")
+        self._rules_by_key: Dict[Tuple[str, Any], List[int]] = {}
+        self._levels: Set[str] = set()
+        self._sources: Set[str] = set()
+
+        for rule in rules:
+            condition = rule.condition or {}
+            log_pattern = condition.get("pattern")
+            log_level = condition.get("level")
+            log_source = condition.get("source")
+            if not log_pattern and not log_level:
+                continue
+
+            self.rule_ids.append(rule.id)
+            if log_pattern:
+                index = patterns.setdefault(log_pattern, len(patterns))
+                self._rules_by_key.setdefault(("pattern", index), []).append(rule.id)
+            if log_level:
+                self._levels.add(log_level.upper())
+                self._rules_by_key.setdefault(("level", log_level.upper()), []).append(rule.id)
+            if log_source:
+                self._sources.add(log_source)
+                self._rules_by_key.setdefault(("source", log_source), []).append(rule.id)
+
+        self._automaton = AhoCorasick(patterns)
+
+    def count(self, log_data: Iterable[Dict[str, Any]]) -> Dict[int, int]:
+        """扫描一遍日志批次，返回每条规则的匹配日志数
+
+        Args:
+            log_data: 日志数据列表
+
+        Returns:
+            {规则ID: 匹配数}
+        """
+        automaton = self._automaton
+        levels = self._levels
+        sources = self._sources
+
+        # 按单条日志命中的匹配键组合计数，组合种类远少于日志条数
+        signatures: Counter = Counter()
+        for log in log_data:
+            keys: List[Tuple[str, Any]] = []
+            if levels and "level" in log:
+                level = log["level"].upper()
+                if level in levels:
+                    keys.append(("level", level))
+            if automaton and "message" in log:
+                keys.extend(("pattern", index) for index in automaton.search(log["message"]))
+            if sources and "source" in log:
+                if log["source"] in sources:
+                    keys.append(("source", log["source"]))
+            if keys:
+                signatures[frozenset(keys)] += 1
+
+        counts = dict.fromkeys(self.rule_ids, 0)
+        for keys, hits in signatures.items():
+            for rule_id in self._rules_for(keys):
+                counts[rule_id] += hits
+        return counts
+
+    def _rules_for(self, keys: FrozenSet[Tuple[str, Any]]) -> Set[int]:
+        rule_ids: Set[int] = set()
+        for key in keys:
+            rule_ids.update(self._rules_by_key.get(key, ()))
+        return rule_ids
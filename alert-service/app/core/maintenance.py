@@ -0,0 +1,387 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from dateutil import rrule, tz
+
+from app.core.config import settings
+from app.core.silence_index import LabelMatcher, as_utc_naive, compile_matchers
+from app.models.alert import MaintenanceWindow
+
+logger = logging.getLogger(__name__)
+
+
+Interval = Tuple[datetime, datetime]
+
+_CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+_MONTH_NAMES = {
+    name: pos for pos, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1
+    )
+}
+_DAY_NAMES = {name: pos for pos, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+# (下限, 上限, 名称) 依次对应 分 时 日 月 周
+_CRON_FIELDS = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, _MONTH_NAMES),
+    (0, 7, _DAY_NAMES),
+)
+
+
+def _cron_value(token: str, names: Dict[str, int]) -> int:
+    token = token.lower()
+    if token in names:
+        return names[token]
+    if not token.isdigit():
+        raise ValueError(f"Invalid cron value: {token}")
+    return int(token)
+
+
+def _parse_cron_field(field: str, low: int, high: int, names: Dict[str, int]) -> List[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        expr, _, step_text = part.partition("/")
+        step = int(step_text) if step_text.isdigit() else 0
+        if step_text and step <= 0:
+            raise ValueError(f"Invalid cron step: {part}")
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start_text, end_text = expr.split("-", 1)
+            start, end = _cron_value(start_text, names), _cron_value(end_text, names)
+        else:
+            start = _cron_value(expr, names)
+            end = high if step_text else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron value out of range: {part}")
+        values.update(range(start, end + 1, step or 1))
+    return sorted(values)
+
+
+def cron_to_rrule(expression: str, dtstart: datetime) -> rrule.rruleset:
+    """把 5 段 cron 表达式转换为等价的 rruleset
+
+    日与周字段都受限时按 cron 的约定取并集，拆成两条 rrule。
+
+    Args:
+        expression: cron 表达式（分 时 日 月 周），支持 @daily 等宏
+        dtstart: 展开起点（含时区）
+
+    Returns:
+        rruleset
+
+    Raises:
+        ValueError: 表达式无效
+    """
+    fields = _CRON_MACROS.get(expression.strip().lower(), expression).split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron expression must have 5 fields: {expression}")
+    minutes, hours, days, months, weekdays = (
+        _parse_cron_field(field, low, high, names)
+        for field, (low, high, names) in zip(fields, _CRON_FIELDS)
+    )
+    # cron 的周日为 0 或 7，dateutil 的周一为 0
+    weekdays = sorted({(day + 6) % 7 for day in weekdays})
+
+    common = dict(
+        dtstart=dtstart.replace(second=0, microsecond=0),
+        byminute=minutes, byhour=hours, bysecond=0, bymonth=months
+    )
+    day_restricted, weekday_restricted = not fields[2].startswith("*"), not fields[4].startswith("*")
+    rules = rrule.rruleset()
+    if day_restricted and weekday_restricted:
+        rules.rrule(rrule.rrule(rrule.DAILY, bymonthday=days, **common))
+        rules.rrule(rrule.rrule(rrule.DAILY, byweekday=weekdays, **common))
+    elif day_restricted:
+        rules.rrule(rrule.rrule(rrule.DAILY, bymonthday=days, **common))
+    elif weekday_restricted:
+        rules.rrule(rrule.rrule(rrule.DAILY, byweekday=weekdays, **common))
+    else:
+        rules.rrule(rrule.rrule(rrule.DAILY, **common))
+    return rules
+
+
+def _to_local(value: datetime, zone: Any) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(zone)
+
+
+class CompiledMaintenanceWindow:
+    """编译后的维护窗口，负责把周期规则展开为 UTC 时间区间"""
+
+    def __init__(self, window: MaintenanceWindow):
+        self.id = window.id
+        self.name = window.name
+        self.duration = timedelta(seconds=window.duration)
+        self.zone = tz.gettz(window.timezone or "UTC")
+        if self.zone is None:
+            raise ValueError(f"Unknown timezone: {window.timezone}")
+        schedule_type = getattr(window.schedule_type, "value", window.schedule_type)
+        if schedule_type not in ("cron", "rrule"):
+            raise ValueError(f"Unsupported schedule type: {schedule_type}")
+        self.schedule_type = schedule_type
+        self.schedule = window.schedule
+        self.starts_at = as_utc_naive(window.starts_at) if window.starts_at else None
+        self.ends_at = as_utc_naive(window.ends_at) if window.ends_at else None
+        self.ci_ids: Set[int] = set(window.ci_ids or ())
+        self.ci_type_ids: Set[int] = set(window.ci_type_ids or ())
+        self.matchers: List[LabelMatcher] = compile_matchers(window.matchers)
+
+        if schedule_type == "rrule":
+            # RRULE 的 INTERVAL、COUNT 等依赖 DTSTART，只解析一次
+            dtstart = self.starts_at or as_utc_naive(getattr(window, "created_at", None) or datetime.utcnow())
+            try:
+                self._rrule = rrule.rrulestr(
+                    self.schedule, dtstart=_to_local(dtstart, self.zone), forceset=True
+                )
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Invalid RRULE: {e}")
+        else:
+            self._rrule = None
+            cron_to_rrule(self.schedule, datetime.now(self.zone))
+
+    @property
+    def is_scoped_by_ci(self) -> bool:
+        return bool(self.ci_ids or self.ci_type_ids)
+
+    def expand(self, start: datetime, end: datetime, limit: int) -> List[Interval]:
+        """展开与 [start, end) 相交的维护区间
+
+        Args:
+            start: 开始时间（UTC）
+            end: 结束时间（UTC）
+            limit: 最多展开的区间数
+
+        Returns:
+            按开始时间排序的 (开始, 结束) UTC 区间
+        """
+        if self.starts_at is not None:
+            start = max(start, self.starts_at)
+        if self.ends_at is not None:
+            end = min(end, self.ends_at)
+        if start >= end:
+            return []
+
+        local_start = _to_local(start - self.duration, self.zone)
+        local_end = _to_local(end, self.zone)
+        if self._rrule is not None:
+            occurrences = self._rrule.xafter(local_start, count=limit, inc=True)
+        else:
+            occurrences = iter(cron_to_rrule(self.schedule, local_start))
+
+        intervals = []
+        for occurrence in occurrences:
+            if occurrence >= local_end or len(intervals) >= limit:
+                break
+            begin = as_utc_naive(occurrence)
+            if self.starts_at is not None and begin < self.starts_at:
+                continue
+            finish = begin + self.duration
+            if self.ends_at is not None:
+                finish = min(finish, self.ends_at)
+            if finish > start:
+                intervals.append((begin, finish))
+        if len(intervals) >= limit:
+            logger.warning(f"Maintenance window {self.id} expanded to more than {limit} occurrences")
+        return intervals
+
+
+class _IntervalCalendar:
+    """合并后互不重叠、按开始时间排序的区间，用二分查找判断时间点是否落在区间内"""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals: Iterable[Interval]):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for begin, finish in sorted(intervals):
+            if self.ends and begin <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], finish)
+            else:
+                self.starts.append(begin)
+                self.ends.append(finish)
+
+    def contains(self, moment: datetime) -> bool:
+        pos = bisect.bisect_right(self.starts, moment) - 1
+        return pos >= 0 and moment < self.ends[pos]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class MaintenanceCalendar:
+    """周期维护窗口预先展开的滚动区间日历
+
+    加载时把每个启用的维护窗口在 [now - duration, now + horizon) 内的全部
+    发生时间展开为 UTC 区间，按作用范围合并成有序区间列表：只限定 CI 或
+    CI 类型的窗口按 CI 合并，不限定范围的窗口合并为全局日历，带标签条件
+    的窗口单独保存。检查告警时只需对相应日历做二分查找，不在每条告警上
+    计算周期规则。日历在刷新间隔到期或接近展开范围末尾时整体重建。
+    """
+
+    def __init__(self, horizon: int = 86400, refresh_interval: int = 300, max_occurrences: int = 10000):
+        self.horizon = timedelta(seconds=max(horizon, 2 * refresh_interval))
+        self.refresh_interval = refresh_interval
+        self.max_occurrences = max_occurrences
+        self._lock = threading.Lock()
+        self._global = _IntervalCalendar(())
+        self._by_ci: Dict[int, _IntervalCalendar] = {}
+        # (限定的CI集合, 标签匹配条件, 区间日历)，CI集合为 None 表示不限定
+        self._labelled: List[Tuple[Optional[FrozenSet[int]], List[LabelMatcher], _IntervalCalendar]] = []
+        self._windows = 0
+        self._expanded_until: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_stale(self) -> bool:
+        """从未加载、超过刷新间隔或展开范围即将用完时需要重新加载"""
+        if self._loaded_at is None or self._expanded_until is None:
+            return True
+        if time.monotonic() - self._loaded_at >= self.refresh_interval:
+            return True
+        return datetime.utcnow() + timedelta(seconds=self.refresh_interval) >= self._expanded_until
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def load(
+        self,
+        windows: Iterable[MaintenanceWindow],
+        ci_ids_by_type: Optional[Mapping[int, Sequence[int]]] = None,
+        now: Optional[datetime] = None
+    ) -> int:
+        """展开维护窗口并整体替换日历
+
+        Args:
+            windows: 启用的维护窗口
+            ci_ids_by_type: {CI类型ID: [CI ID]}，用于展开按CI类型限定的窗口
+            now: 当前UTC时间
+
+        Returns:
+            加载的维护窗口数量
+        """
+        now = now or datetime.utcnow()
+        until = now + self.horizon
+        ci_ids_by_type = ci_ids_by_type or {}
+
+        global_intervals: List[Interval] = []
+        ci_intervals: Dict[int, List[Interval]] = {}
+        labelled = []
+        count = 0
+        for window in windows:
+            try:
+                compiled = CompiledMaintenanceWindow(window)
+            except ValueError as e:
+                logger.warning(f"Skipping maintenance window {window.id}: {e}")
+                continue
+            count += 1
+            intervals = compiled.expand(now, until, self.max_occurrences)
+            if not intervals:
+                continue
+
+            ci_scope: Optional[Set[int]] = None
+            if compiled.is_scoped_by_ci:
+                ci_scope = set(compiled.ci_ids)
+                for ci_type_id in compiled.ci_type_ids:
+                    ci_scope.update(ci_ids_by_type.get(ci_type_id, ()))
+                if not ci_scope:
+                    continue
+
+            if compiled.matchers:
+                labelled.append((
+                    frozenset(ci_scope) if ci_scope is not None else None,
+                    compiled.matchers,
+                    _IntervalCalendar(intervals)
+                ))
+            elif ci_scope is None:
+                global_intervals.extend(intervals)
+            else:
+                for ci_id in ci_scope:
+                    ci_intervals.setdefault(ci_id, []).extend(intervals)
+
+        by_ci = {ci_id: _IntervalCalendar(intervals) for ci_id, intervals in ci_intervals.items()}
+        with self._lock:
+            self._global = _IntervalCalendar(global_intervals)
+            self._by_ci = by_ci
+            self._labelled = labelled
+            self._windows = count
+            self._expanded_until = until
+            self._loaded_at = time.monotonic()
+
+        logger.info(
+            f"Maintenance calendar loaded: {count} windows, {len(by_ci)} CIs, "
+            f"{len(labelled)} label-scoped windows until {until.isoformat()}"
+        )
+        return count
+
+    def is_in_maintenance(
+        self,
+        ci_id: Optional[int] = None,
+        labels: Optional[Mapping[str, str]] = None,
+        now: Optional[datetime] = None
+    ) -> bool:
+        """检查告警当前是否处于维护窗口内
+
+        Args:
+            ci_id: 告警关联的CI ID
+            labels: 告警的匹配标签
+            now: 当前UTC时间
+
+        Returns:
+            是否处于维护窗口内
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            global_calendar, by_ci, labelled = self._global, self._by_ci, self._labelled
+
+        if global_calendar.contains(now):
+            return True
+        if ci_id is not None:
+            calendar = by_ci.get(ci_id)
+            if calendar is not None and calendar.contains(now):
+                return True
+        if labels is None:
+            return False
+        for ci_scope, matchers, calendar in labelled:
+            if not calendar.contains(now):
+                continue
+            if ci_scope is not None and ci_id not in ci_scope:
+                continue
+            if all(matcher.matches(labels) for matcher in matchers):
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "windows": self._windows,
+                "cis": len(self._by_ci),
+                "label_scoped_windows": len(self._labelled),
+                "global_intervals": len(self._global),
+                "expanded_until": self._expanded_until.isoformat() if self._expanded_until else None
+            }
+
+    def __len__(self) -> int:
+        return self._windows
+
+
+# 进程级维护窗口日历，由所有 AlertEngine 实例共享
+maintenance_calendar = MaintenanceCalendar(
+    horizon=settings.ALERT_MAINTENANCE_HORIZON,
+    refresh_interval=settings.ALERT_MAINTENANCE_REFRESH_INTERVAL,
+    max_occurrences=settings.ALERT_MAINTENANCE_MAX_OCCURRENCES
+)
@@ -0,0 +1,611 @@
+import asyncio
+import logging
+import random
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.crud import crud_alert
+from app.db.session import SessionLocal
+from app.models.alert import NotificationChannelType
+
+logger = logging.getLogger(__name__)
+
+
+# 单条通知中逐条列出的告警数上限，其余只计数
+MAX_LISTED_ALERTS = 20
+
+
+class ChannelTarget:
+    """从 NotificationChannel 复制出的投递目标，不持有数据库会话"""
+
+    __slots__ = ("id", "name", "channel_type", "config")
+
+    def __init__(
+        self, channel_id: int, name: str, channel_type: NotificationChannelType, config: Dict[str, Any]
+    ):
+        self.id = channel_id
+        self.name = name
+        self.channel_type = channel_type
+        self.config = config or {}
+
+
+class GroupPolicy:
+    """告警分组的通知合并策略，与 Alertmanager 的 group_by/group_wait/group_interval 含义相同
+
+    group_by 中的 "alertname" 表示告警规则，其余为告警标签名。
+    """
+
+    __slots__ = ("alert_group_id", "name", "group_by", "group_wait", "group_interval")
+
+    def __init__(
+        self,
+        alert_group_id: Optional[int],
+        name: Optional[str],
+        group_by: List[str],
+        group_wait: float,
+        group_interval: float
+    ):
+        self.alert_group_id = alert_group_id
+        self.name = name
+        self.group_by = list(group_by)
+        self.group_wait = group_wait
+        self.group_interval = group_interval
+
+    def group_key(self, alert: Dict[str, Any]) -> Tuple[Any, ...]:
+        labels = alert.get("labels") or {}
+        values = tuple(
+            alert["alert_rule_id"] if name == "alertname" else str(labels.get(name, ""))
+            for name in self.group_by
+        )
+        if self.alert_group_id is None and "alertname" not in self.group_by:
+            # 没有告警分组时不同规则的告警不合并
+            return ("rule", alert["alert_rule_id"]) + values
+        return (self.alert_group_id,) + values
+
+
+class _AlertGroupState:
+    """一个分组键下等待合并发送的告警"""
+
+    __slots__ = ("policy", "alerts", "flush_handle", "flushed_at")
+
+    def __init__(self, policy: GroupPolicy):
+        self.policy = policy
+        self.alerts: List[Dict[str, Any]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.flushed_at = 0.0
+
+
+def format_notification(
+    alerts: List[Dict[str, Any]], group: Optional[str] = None
+) -> Tuple[str, str]:
+    """生成通知标题与正文
+
+    Args:
+        alerts: 同一条通知中的告警
+        group: 告警分组名称
+
+    Returns:
+        (标题, 正文)
+    """
+    if len(alerts) == 1:
+        alert = alerts[0]
+        lines = [alert["message"]]
+        for key, value in (alert.get("labels") or {}).items():
+            lines.append(f"{key}: {value}")
+        return alert["title"], "\n".join(lines)
+
+    severities = sorted({alert["severity"] for alert in alerts})
+    subject = f"[{'/'.join(severity.upper() for severity in severities)}] {len(alerts)} 条告警触发"
+    if group:
+        subject = f"{subject}（{group}）"
+    lines = [alert["title"] for alert in alerts[:MAX_LISTED_ALERTS]]
+    if len(alerts) > MAX_LISTED_ALERTS:
+        lines.append(f"... 另有 {len(alerts) - MAX_LISTED_ALERTS} 条告警")
+    return subject, "\n".join(lines)
+
+
+class NotificationDispatcher:
+    """基于 asyncio 的告警通知分发器
+
+    分发器在独立线程中运行自己的事件循环。告警触发时由评估线程放入有界
+    队列（队列满时丢弃并计数，评估从不等待投递）；分发协程按规则所属的
+    AlertGroup 与 group_by 标签把告警归入分组，分组内的告警在 group_wait /
+    group_interval 窗口内合并为一条通知，再向相关规则已启用的渠道投递。
+    每种渠道类型有独立的并发上限，失败按指数退避重试；每次投递只产生一条
+    处理记录，先在内存中累积，再定期用一条多行 INSERT 写入 AlertAction。
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = 16,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        timeout: float = 10.0,
+        flush_interval: float = 2.0,
+        channel_cache_ttl: int = 60,
+        group_by: Optional[List[str]] = None,
+        group_wait: float = 30.0,
+        group_interval: float = 300.0
+    ):
+        self.queue_size = queue_size
+        self.concurrency = {
+            channel_type: (concurrency or {}).get(channel_type.value, default_concurrency)
+            for channel_type in NotificationChannelType
+        }
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.channel_cache_ttl = channel_cache_ttl
+
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._ready = threading.Event()
+        self._channels: Dict[int, Tuple[float, List[ChannelTarget]]] = {}
+        self._actions: List[Dict[str, Any]] = []
+        # 未归入任何告警分组的规则使用的分组策略
+        self.default_policy = GroupPolicy(None, None, group_by or [], group_wait, group_interval)
+        self._policies: Dict[int, Tuple[float, GroupPolicy]] = {}
+        self._groups: Dict[Tuple[Any, ...], _AlertGroupState] = {}
+        self._dispatching: Set[asyncio.Task] = set()
+        self._deliveries: Set[asyncio.Task] = set()
+
+        self._senders = {
+            NotificationChannelType.EMAIL: self._send_email,
+            NotificationChannelType.SMS: self._send_sms,
+            NotificationChannelType.WECHAT: self._send_wechat,
+            NotificationChannelType.DINGTALK: self._send_dingtalk,
+            NotificationChannelType.SLACK: self._send_slack,
+            NotificationChannelType.TEAMS: self._send_slack,
+            NotificationChannelType.API: self._send_api,
+            NotificationChannelType.SYSLOG: self._send_syslog,
+        }
+
+        # 运行指标
+        self._enqueued = 0
+        self._dropped = 0
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self._enqueued,
+            "dropped": self._dropped,
+            "sent": self._sent,
+            "failed": self._failed,
+            "retried": self._retried,
+            "groups": len(self._groups),
+            "grouped_alerts": sum(len(group.alerts) for group in list(self._groups.values())),
+            "pending_actions": len(self._actions),
+        }
+
+    def notify(self, alerts: List[Dict[str, Any]]) -> int:
+        """把新触发的告警放入通知队列（线程安全，不阻塞）
+
+        Args:
+            alerts: 告警字段值，需包含 alert_id、alert_rule_id、title、message、severity
+
+        Returns:
+            提交的告警数（队列满时被丢弃的计入 dropped）
+        """
+        loop = self._loop
+        if loop is None or not alerts:
+            return 0
+        try:
+            for alert in alerts:
+                loop.call_soon_threadsafe(self._put, alert)
+        except RuntimeError:
+            # 分发器正在停止，事件循环已关闭
+            return 0
+        return len(alerts)
+
+    def _put(self, alert: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(alert)
+            self._enqueued += 1
+        except asyncio.QueueFull:
+            self._dropped += 1
+            if self._dropped % 1000 == 1:
+                logger.warning(f"Notification queue full, {self._dropped} alerts dropped")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+        logger.info("Notification dispatcher started")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """停止接收新告警，立即发出各分组暂存的告警，在 timeout 秒内投递完并写入处理记录"""
+        loop = self._loop
+        if loop is None or self._thread is None:
+            return
+        # 队列满时等待分发协程腾出位置，保证停止标记排在已入队的告警之后
+        asyncio.run_coroutine_threadsafe(self._queue.put(None), loop)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("Notification dispatcher stopped")
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main())
+        except Exception as e:
+            logger.error(f"Notification dispatcher crashed: {e}")
+        finally:
+            self._loop = None
+            loop.close()
+
+    async def _main(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._semaphores = {
+            channel_type: asyncio.Semaphore(limit) for channel_type, limit in self.concurrency.items()
+        }
+        # 进行中的投递任务总数上限，投递跟不上时积压留在有界队列中
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._deliveries: Set[asyncio.Task] = set()
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            while True:
+                alert = await self._queue.get()
+                if alert is None:
+                    break
+                try:
+                    policy = await self._policy_for(alert["alert_rule_id"])
+                except Exception as e:
+                    logger.error(f"Failed to load alert group for rule {alert['alert_rule_id']}: {e}")
+                    policy = self.default_policy
+                self._add_to_group(policy, alert)
+
+            # 停止时先停止接收，发出各分组暂存的告警，再等待进行中的投递
+            self._loop = None
+            for key in list(self._groups):
+                self._flush_group(key)
+            if self._dispatching:
+                await asyncio.wait(set(self._dispatching), timeout=self.timeout)
+            if self._deliveries:
+                await asyncio.wait(set(self._deliveries), timeout=self.timeout)
+        finally:
+            flusher.cancel()
+            await self._flush_actions()
+            await self._client.aclose()
+
+    def _add_to_group(self, policy: GroupPolicy, alert: Dict[str, Any]) -> None:
+        """把告警放入所属分组，并安排该分组的下一次发送
+
+        新分组在 group_wait 后发送；已发送过的分组在上次发送 group_interval
+        之后发送，期间到达的告警合并为一条通知。
+        """
+        key = policy.group_key(alert)
+        group = self._groups.get(key)
+        now = time.monotonic()
+        if group is None:
+            group = self._groups[key] = _AlertGroupState(policy)
+            delay = policy.group_wait
+        elif group.flush_handle is None:
+            delay = max(group.flushed_at + policy.group_interval - now, 0.0)
+        else:
+            delay = None
+        group.alerts.append(alert)
+        if delay is not None:
+            group.flush_handle = asyncio.get_running_loop().call_later(
+                delay, self._flush_group, key
+            )
+
+    def _flush_group(self, key: Tuple[Any, ...]) -> None:
+        group = self._groups.get(key)
+        if group is None:
+            return
+        if group.flush_handle is not None:
+            group.flush_handle.cancel()
+            group.flush_handle = None
+        alerts, group.alerts = group.alerts, []
+        group.flushed_at = time.monotonic()
+        if not alerts:
+            return
+        notification = {
+            "group": group.policy.name,
+            "alert_rule_ids": sorted({alert["alert_rule_id"] for alert in alerts}),
+            "alerts": alerts,
+        }
+        task = asyncio.create_task(self._dispatch(notification))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    def _expire_groups(self) -> None:
+        """清理超过 group_interval 没有新告警的分组，之后到达的告警重新等待 group_wait"""
+        now = time.monotonic()
+        for key, group in list(self._groups.items()):
+            if group.flush_handle is None and now - group.flushed_at >= group.policy.group_interval:
+                del self._groups[key]
+
+    async def _dispatch(self, notification: Dict[str, Any]) -> None:
+        """为一条（可能合并了多条告警的）通知向相关规则的全部渠道创建投递任务"""
+        try:
+            channels = await self._channels_for(notification["alert_rule_ids"])
+        except Exception as e:
+            logger.error(f"Failed to load notification channels: {e}")
+            return
+        for channel in channels:
+            await self._slots.acquire()
+            task = asyncio.create_task(self._deliver(channel, notification))
+            self._deliveries.add(task)
+            task.add_done_callback(self._delivery_done)
+
+    def _delivery_done(self, task: asyncio.Task) -> None:
+        self._deliveries.discard(task)
+        self._slots.release()
+
+    async def _policy_for(self, alert_rule_id: int) -> GroupPolicy:
+        """规则所属告警分组的分组策略，缓存 channel_cache_ttl 秒
+
+        规则属于多个分组时取ID最小的分组，不属于任何分组时使用默认分组，
+        没有默认分组时按规则单独分组。
+        """
+        now = time.monotonic()
+        cached = self._policies.get(alert_rule_id)
+        if cached is None or cached[0] <= now:
+            policy = await asyncio.get_running_loop().run_in_executor(
+                None, self._load_policy, alert_rule_id
+            )
+            cached = self._policies[alert_rule_id] = (now + self.channel_cache_ttl, policy)
+        return cached[1]
+
+    def _load_policy(self, alert_rule_id: int) -> GroupPolicy:
+        db = SessionLocal()
+        try:
+            alert_group = crud_alert.get_rule_alert_group(db, alert_rule_id)
+        finally:
+            db.close()
+        if alert_group is None:
+            return self.default_policy
+        return GroupPolicy(
+            alert_group.id,
+            alert_group.name,
+            alert_group.group_by if alert_group.group_by is not None else self.default_policy.group_by,
+            alert_group.group_wait if alert_group.group_wait is not None else self.default_policy.group_wait,
+            (
+                alert_group.group_interval if alert_group.group_interval is not None
+                else self.default_policy.group_interval
+            )
+        )
+
+    async def _channels_for(self, alert_rule_ids: List[int]) -> List[ChannelTarget]:
+        """规则已启用的通知渠道（按渠道去重），缓存 channel_cache_ttl 秒"""
+        now = time.monotonic()
+        missing = [
+            alert_rule_id for alert_rule_id in alert_rule_ids
+            if self._channels.get(alert_rule_id, (0.0, None))[0] <= now
+        ]
+        if missing:
+            loaded = await asyncio.get_running_loop().run_in_executor(
+                None, self._load_channels, missing
+            )
+            expires_at = now + self.channel_cache_ttl
+            for alert_rule_id, targets in loaded.items():
+                self._channels[alert_rule_id] = (expires_at, targets)
+
+        channels: Dict[int, ChannelTarget] = {}
+        for alert_rule_id in alert_rule_ids:
+            for target in self._channels.get(alert_rule_id, (0.0, []))[1]:
+                channels[target.id] = target
+        return list(channels.values())
+
+    def _load_channels(self, alert_rule_ids: List[int]) -> Dict[int, List[ChannelTarget]]:
+        db = SessionLocal()
+        try:
+            return {
+                alert_rule_id: [
+                    ChannelTarget(channel.id, channel.name, channel.channel_type, channel.config)
+                    for channel in channels
+                ]
+                for alert_rule_id, channels in crud_alert.get_rule_notification_channels(
+                    db, alert_rule_ids
+                ).items()
+            }
+        finally:
+            db.close()
+
+    async def _deliver(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        """向一个渠道投递一条通知，失败按指数退避（带抖动）重试"""
+        sender = self._senders[channel.channel_type]
+        semaphore = self._semaphores[channel.channel_type]
+        error: Optional[str] = None
+        attempts = 0
+        for attempt in range(self.max_retries + 1):
+            attempts += 1
+            try:
+                async with semaphore:
+                    await sender(channel, notification)
+                error = None
+                break
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                if attempt < self.max_retries:
+                    self._retried += 1
+                    # 退避期间不占用渠道并发额度
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+        if error is None:
+            self._sent += 1
+        else:
+            self._failed += 1
+            logger.warning(f"Notification to channel {channel.name} failed after {attempts} attempts: {error}")
+        self._record(channel, notification["alerts"], error, attempts)
+
+    def _record(
+        self, channel: ChannelTarget, alerts: List[Dict[str, Any]], error: Optional[str], attempts: int
+    ) -> None:
+        # 一次投递一条处理记录，挂在通知中的第一条告警上
+        result: Dict[str, Any] = {
+            "channel_id": channel.id,
+            "channel": channel.name,
+            "channel_type": channel.channel_type.value,
+            "attempts": attempts,
+        }
+        if len(alerts) > 1:
+            result["alert_ids"] = [alert["alert_id"] for alert in alerts]
+        if error is not None:
+            result["error"] = error
+        self._actions.append({
+            "alert_id": alerts[0]["alert_id"],
+            "action_type": "notification",
+            "status": "failure" if error is not None else "success",
+            "action_result": result,
+            "executed_by": "notification-dispatcher",
+        })
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self._expire_groups()
+            await self._flush_actions()
+
+    async def _flush_actions(self) -> None:
+        actions, self._actions = self._actions, []
+        if not actions:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_actions, actions)
+        except Exception as e:
+            logger.error(f"Failed to record {len(actions)} notification actions: {e}")
+
+    def _write_actions(self, actions: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            crud_alert.bulk_create_alert_actions(db, actions)
+        finally:
+            db.close()
+
+    # 各渠道类型的发送实现，失败时抛出异常
+
+    async def _post(self, url: Optional[str], payload: Dict[str, Any]) -> httpx.Response:
+        if not url:
+            raise ValueError("Channel config has no url")
+        response = await self._client.post(url, json=payload)
+        response.raise_for_status()
+        return response
+
+    async def _send_email(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, text = format_notification(notification["alerts"], notification.get("group"))
+        # smtplib 是同步的，放到线程池执行，并发仍受渠道类型的信号量限制
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._send_email_sync, channel.config, subject, text
+        )
+
+    def _send_email_sync(self, config: Dict[str, Any], subject: str, text: str) -> None:
+        recipients = config.get("to")
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        if not recipients:
+            raise ValueError("Email channel has no recipients")
+
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = config.get("from", settings.EMAIL_FROM)
+        message["To"] = ", ".join(recipients)
+        message.set_content(text)
+
+        host = config.get("smtp_server", settings.EMAIL_SMTP_SERVER)
+        port = int(config.get("smtp_port", settings.EMAIL_SMTP_PORT))
+        with smtplib.SMTP(host, port, timeout=self.timeout) as smtp:
+            if config.get("use_tls", settings.EMAIL_USE_TLS):
+                smtp.starttls()
+            username = config.get("username", settings.EMAIL_USERNAME)
+            if username:
+                smtp.login(username, config.get("password", settings.EMAIL_PASSWORD))
+            smtp.send_message(message)
+
+    async def _send_sms(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, _ = format_notification(notification["alerts"], notification.get("group"))
+        await self._post(channel.config.get("url"), {
+            "phones": channel.config.get("phones", []),
+            "content": subject,
+        })
+
+    async def _send_wechat(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, text = format_notification(notification["alerts"], notification.get("group"))
+        response = await self._post(channel.config.get("webhook_url"), {
+            "msgtype": "markdown",
+            "markdown": {"content": f"**{subject}**\n{text}"},
+        })
+        self._check_errcode(response)
+
+    async def _send_dingtalk(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, text = format_notification(notification["alerts"], notification.get("group"))
+        response = await self._post(channel.config.get("webhook_url"), {
+            "msgtype": "markdown",
+            "markdown": {"title": subject, "text": f"### {subject}\n{text}"},
+        })
+        self._check_errcode(response)
+
+    def _check_errcode(self, response: httpx.Response) -> None:
+        # 企业微信与钉钉机器人出错时仍返回 200，错误码在响应体中
+        body = response.json()
+        if body.get("errcode", 0) != 0:
+            raise RuntimeError(f"errcode {body.get('errcode')}: {body.get('errmsg')}")
+
+    async def _send_slack(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, text = format_notification(notification["alerts"], notification.get("group"))
+        await self._post(channel.config.get("webhook_url"), {"text": f"*{subject}*\n{text}"})
+
+    async def _send_api(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        await self._post(channel.config.get("url") or channel.config.get("webhook_url"), {
+            "group": notification.get("group"),
+            "alerts": notification["alerts"],
+        })
+
+    async def _send_syslog(self, channel: ChannelTarget, notification: Dict[str, Any]) -> None:
+        subject, text = format_notification(notification["alerts"], notification.get("group"))
+        host = channel.config.get("host", "localhost")
+        port = int(channel.config.get("port", 514))
+        # <facility * 8 + severity>，默认 local0.warning
+        priority = int(channel.config.get("facility", 16)) * 8 + 4
+        payload = f"<{priority}>alert-service: {subject} | {text.replace(chr(10), ' | ')}"
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, port), family=socket.AF_INET
+        )
+        try:
+            transport.sendto(payload.encode("utf-8"))
+        finally:
+            transport.close()
+
+
+# 进程级通知分发器，由所有 AlertEngine 实例共享
+notification_dispatcher = NotificationDispatcher(
+    queue_size=settings.ALERT_NOTIFY_QUEUE_SIZE,
+    concurrency=settings.ALERT_NOTIFY_CONCURRENCY,
+    default_concurrency=settings.ALERT_NOTIFY_DEFAULT_CONCURRENCY,
+    max_retries=settings.ALERT_NOTIFY_MAX_RETRIES,
+    retry_backoff=settings.ALERT_NOTIFY_RETRY_BACKOFF,
+    timeout=settings.ALERT_NOTIFY_TIMEOUT,
+    flush_interval=settings.ALERT_NOTIFY_FLUSH_INTERVAL,
+    channel_cache_ttl=settings.ALERT_NOTIFY_CHANNEL_CACHE_TTL,
+    group_by=settings.ALERT_GROUP_BY,
+    group_wait=settings.ALERT_GROUP_WAIT,
+    group_interval=settings.ALERT_GROUP_INTERVAL
+)
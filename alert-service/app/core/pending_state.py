@@ -0,0 +1,284 @@
+import enum
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.sharding import shard_coordinator, shard_of
+
+logger = logging.getLogger(__name__)
+
+
+class RuleState(enum.Enum):
+    INACTIVE = "inactive"
+    PENDING = "pending"
+    FIRING = "firing"
+
+
+class PendingEntry:
+    """单个规则（或规则下单个序列）的状态与时间戳"""
+
+    __slots__ = ("state", "active_since", "fired_at", "last_seen")
+
+    def __init__(
+        self,
+        state: RuleState,
+        active_since: float,
+        fired_at: Optional[float] = None,
+        last_seen: Optional[float] = None
+    ):
+        self.state = state
+        self.active_since = active_since
+        self.fired_at = fired_at
+        self.last_seen = active_since if last_seen is None else last_seen
+
+
+StateKey = Tuple[int, str]
+
+
+class PendingStateTracker:
+    """基于 AlertRule.duration 的规则状态机：inactive -> pending -> firing
+
+    条件首次满足时进入 pending，持续满足 duration 秒后进入 firing，
+    只有进入 firing 的规则才会创建告警；条件不满足时回到 inactive。
+    状态按规则所属分片定期写入 Redis 哈希（每个分片一个字段），重启后
+    恢复，避免所有计时器归零。规则分片到多个副本时，每个副本只写入并
+    恢复自己持有的分片，接管分片时再恢复该分片的状态。
+    超过 max_age 秒未再观测到的序列（例如已下线的主机）在检查点时淘汰。
+    """
+
+    def __init__(
+        self,
+        checkpoint_key: str,
+        checkpoint_interval: int = 15,
+        max_age: int = 3600,
+        shard_count: int = 64,
+        owned_shards: Optional[Callable[[], Set[int]]] = None
+    ):
+        self.checkpoint_key = checkpoint_key
+        self.checkpoint_interval = checkpoint_interval
+        self.max_age = max_age
+        self.shard_count = shard_count
+        # 返回本副本持有的分片，未分片部署时为 None（持有全部分片）
+        self._owned_shards = owned_shards
+        self._lock = threading.Lock()
+        self._states: Dict[StateKey, PendingEntry] = {}
+        # 自上次检查点以来有变化的分片
+        self._dirty: Set[int] = set()
+        # 已从检查点恢复的分片
+        self._restored: Set[int] = set()
+        self._restore_retry_at = 0.0
+        self._checkpointed_at = 0.0
+
+    def _shard(self, key: StateKey) -> int:
+        return shard_of(key[0], self.shard_count)
+
+    def owned_shards(self) -> Set[int]:
+        if self._owned_shards is None:
+            return set(range(self.shard_count))
+        return self._owned_shards()
+
+    def observe(
+        self,
+        alert_rule_id: int,
+        is_triggered: bool,
+        duration: int,
+        fingerprint: str = "",
+        now: Optional[float] = None
+    ) -> RuleState:
+        """记录一次评估结果并返回规则的最新状态
+
+        Args:
+            alert_rule_id: 告警规则ID
+            is_triggered: 本次评估条件是否满足
+            duration: 条件需持续满足的秒数
+            fingerprint: 序列指纹，规则不区分序列时为空
+            now: 当前时间戳（秒）
+
+        Returns:
+            规则状态
+        """
+        now = time.time() if now is None else now
+        key = (alert_rule_id, fingerprint)
+
+        with self._lock:
+            entry = self._states.get(key)
+            if not is_triggered:
+                if entry is not None:
+                    del self._states[key]
+                    self._dirty.add(self._shard(key))
+                return RuleState.INACTIVE
+
+            if entry is None:
+                entry = PendingEntry(RuleState.PENDING, now)
+                self._states[key] = entry
+                self._dirty.add(self._shard(key))
+            entry.last_seen = now
+
+            if entry.state == RuleState.PENDING and now - entry.active_since >= (duration or 0):
+                entry.state = RuleState.FIRING
+                entry.fired_at = now
+                self._dirty.add(self._shard(key))
+
+            return entry.state
+
+    def get(self, alert_rule_id: int, fingerprint: str = "") -> Optional[PendingEntry]:
+        return self._states.get((alert_rule_id, fingerprint))
+
+    def fingerprints(self, alert_rule_id: int) -> List[str]:
+        """返回规则下有状态的序列指纹"""
+        with self._lock:
+            return [key[1] for key in self._states if key[0] == alert_rule_id]
+
+    def discard_rule(self, alert_rule_id: int) -> None:
+        """移除规则下的全部状态（规则删除或停用时调用）"""
+        with self._lock:
+            for key in [key for key in self._states if key[0] == alert_rule_id]:
+                del self._states[key]
+                self._dirty.add(self._shard(key))
+
+    def count(self, state: RuleState) -> int:
+        return sum(1 for entry in list(self._states.values()) if entry.state == state)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """淘汰超过 max_age 秒未再观测到的状态
+
+        Returns:
+            淘汰的状态数量
+        """
+        if not self.max_age:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.max_age
+        with self._lock:
+            expired = [key for key, entry in self._states.items() if entry.last_seen < cutoff]
+            for key in expired:
+                del self._states[key]
+                self._dirty.add(self._shard(key))
+        if expired:
+            logger.info(f"Pruned {len(expired)} pending rule states not observed for {self.max_age}s")
+        return len(expired)
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """将本副本持有分片中有变化的状态写入 Redis（未到检查点间隔或无变化时跳过）
+
+        每个分片写入哈希的一个字段，已无状态的分片删除其字段；不再持有的
+        分片由接管它的副本写入。
+
+        Returns:
+            是否执行了写入
+        """
+        now = time.monotonic()
+        if not force and now - self._checkpointed_at < self.checkpoint_interval:
+            return False
+        self._checkpointed_at = now
+        self.prune()
+
+        owned = self.owned_shards()
+        with self._lock:
+            dirty = self._dirty & owned
+            if not dirty:
+                return False
+            by_shard: Dict[int, Dict[str, list]] = {shard: {} for shard in dirty}
+            for key, entry in self._states.items():
+                payload = by_shard.get(self._shard(key))
+                if payload is not None:
+                    payload[f"{key[0]}|{key[1]}"] = [
+                        entry.state.value, entry.active_since, entry.fired_at, entry.last_seen
+                    ]
+            self._dirty -= dirty
+
+        mapping = {str(shard): json.dumps(payload) for shard, payload in by_shard.items() if payload}
+        empty = [str(shard) for shard, payload in by_shard.items() if not payload]
+        try:
+            pipe = get_redis().pipeline()
+            if mapping:
+                pipe.hset(self.checkpoint_key, mapping=mapping)
+            if empty:
+                pipe.hdel(self.checkpoint_key, *empty)
+            pipe.execute()
+            return True
+        except Exception as e:
+            with self._lock:
+                self._dirty |= dirty
+            logger.warning(f"Failed to checkpoint pending state: {e}")
+            return False
+
+    def restore(self) -> int:
+        """从 Redis 恢复本副本新持有分片的检查点（读取失败时按检查点间隔重试）
+
+        不再持有的分片丢弃本地状态，之后重新接管时从检查点恢复。
+
+        Returns:
+            恢复的状态数量
+        """
+        owned = self.owned_shards()
+        lost = self._restored - owned
+        if lost:
+            self._drop_shards(lost)
+        missing = owned - self._restored
+        if not missing:
+            return 0
+        now = time.monotonic()
+        if now < self._restore_retry_at:
+            return 0
+
+        shards = sorted(missing)
+        try:
+            client = get_redis()
+            if client.type(self.checkpoint_key) == "string":
+                # 旧版本以单个字符串键保存全部状态，读取后删除以便改写为哈希
+                payloads = [client.get(self.checkpoint_key)]
+                client.delete(self.checkpoint_key)
+            else:
+                payloads = client.hmget(self.checkpoint_key, [str(shard) for shard in shards])
+        except Exception as e:
+            self._restore_retry_at = now + self.checkpoint_interval
+            logger.warning(f"Failed to restore pending state, will retry: {e}")
+            return 0
+
+        states: Dict[StateKey, PendingEntry] = {}
+        for payload in payloads:
+            if not payload:
+                continue
+            for raw_key, values in json.loads(payload).items():
+                alert_rule_id, _, fingerprint = raw_key.partition("|")
+                key = (int(alert_rule_id), fingerprint)
+                if self._shard(key) not in missing:
+                    continue
+                # 旧检查点没有 last_seen
+                state, active_since, fired_at, *rest = values
+                states[key] = PendingEntry(
+                    RuleState(state), active_since, fired_at, rest[0] if rest else None
+                )
+
+        restored = len(states)
+        with self._lock:
+            # 已在本进程中产生的状态优先
+            states.update(self._states)
+            self._states = states
+            self._restored |= missing
+
+        logger.info(f"Restored {restored} pending rule states for {len(shards)} shards")
+        return restored
+
+    def _drop_shards(self, shards: Iterable[int]) -> None:
+        """丢弃不再持有分片的本地状态，这些分片由接管的副本负责检查点"""
+        shards = set(shards)
+        with self._lock:
+            for key in [key for key in self._states if self._shard(key) in shards]:
+                del self._states[key]
+            self._dirty -= shards
+            self._restored -= shards
+
+
+# 进程级规则状态机，由所有 AlertEngine 实例共享
+pending_states = PendingStateTracker(
+    checkpoint_key=settings.ALERT_PENDING_CHECKPOINT_KEY,
+    checkpoint_interval=settings.ALERT_PENDING_CHECKPOINT_INTERVAL,
+    max_age=settings.ALERT_PENDING_STATE_MAX_AGE,
+    shard_count=settings.ALERT_SHARD_COUNT,
+    owned_shards=shard_coordinator.owned_shards if settings.ALERT_SHARDING_ENABLED else None
+)
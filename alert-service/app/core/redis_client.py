@@ -0,0 +1,27 @@
+import logging
+import threading
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """获取进程级 Redis 客户端（首次调用时创建）"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    decode_responses=True,
+                    socket_timeout=5,
+                    health_check_interval=30
+                )
+    return _client
@@ -0,0 +1,277 @@
+import logging
+import operator
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.core.anomaly import AnomalySpec
+from app.core.expression import CompiledExpression, ExpressionError, compile_expression
+from app.core.log_matcher import LogRuleMatcher
+from app.core.window import WindowSpec
+from app.models.alert import AlertRule, AlertRuleType
+
+logger = logging.getLogger(__name__)
+
+
+# 比较运算符 -> 可调用对象，编译规则时一次性解析
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class CompiledRule:
+    """编译后的告警规则
+
+    从 ORM 对象复制评估所需字段，脱离数据库会话后仍可安全使用；
+    比较运算符在编译时解析为可调用对象，自定义规则的表达式在编译时
+    解析为 CompiledExpression，窗口函数解析为 WindowSpec，异常检测参数
+    解析为 AnomalySpec。
+    """
+
+    __slots__ = (
+        "id", "name", "rule_type", "status", "severity", "condition",
+        "threshold", "comparison_operator", "duration", "evaluation_interval",
+        "tags", "ci_id", "metric_name", "compare", "expression", "window", "anomaly",
+    )
+
+    def __init__(self, rule: AlertRule):
+        self.id = rule.id
+        self.name = rule.name
+        self.rule_type = rule.rule_type
+        self.status = rule.status
+        self.severity = rule.severity
+        self.condition = dict(rule.condition or {})
+        self.threshold = rule.threshold
+        self.comparison_operator = rule.comparison_operator
+        self.duration = rule.duration
+        self.evaluation_interval = rule.evaluation_interval
+        self.tags = rule.tags
+        self.ci_id = rule.ci_id
+        self.metric_name = self.condition.get("metric_name")
+        self.compare = OPERATORS.get(rule.comparison_operator)
+        self.expression: Optional[CompiledExpression] = None
+        self.window: Optional[WindowSpec] = None
+        if self.rule_type == AlertRuleType.METRIC:
+            self.window = WindowSpec.from_condition(self.condition)
+        self.anomaly: Optional[AnomalySpec] = None
+        if self.rule_type == AlertRuleType.ANOMALY:
+            self.anomaly = AnomalySpec.from_condition(self.condition)
+        if self.rule_type == AlertRuleType.CUSTOM:
+            self.expression = compile_expression(self.condition.get("expression"))
+
+    @property
+    def referenced_metrics(self) -> Set[str]:
+        """规则评估需要的指标名"""
+        if self.expression is not None:
+            return set(self.expression.referenced_metrics)
+        return {self.metric_name} if self.metric_name else set()
+
+
+class RuleSnapshot:
+    """某一版本活动规则的不可变快照
+
+    指标规则按 condition["metric_name"] 建立分派索引，评估时只需访问
+    数据中出现的指标对应的规则；其他类型规则按规则类型分组。
+    """
+
+    __slots__ = (
+        "by_id", "by_metric", "by_custom_metric", "by_anomaly_metric", "by_type", "log_matcher",
+        "window_retention", "generation", "source_version",
+    )
+
+    def __init__(
+        self,
+        by_id: Dict[int, CompiledRule],
+        by_metric: Dict[str, List[CompiledRule]],
+        by_custom_metric: Dict[str, List[CompiledRule]],
+        by_anomaly_metric: Dict[str, List[CompiledRule]],
+        by_type: Dict[AlertRuleType, List[CompiledRule]],
+        log_matcher: LogRuleMatcher,
+        window_retention: Optional[Dict[str, float]] = None,
+        generation: int = -1,
+        source_version: Optional[int] = None
+    ):
+        self.by_id = by_id
+        self.by_metric = by_metric
+        self.by_custom_metric = by_custom_metric
+        self.by_anomaly_metric = by_anomaly_metric
+        self.by_type = by_type
+        self.log_matcher = log_matcher
+        # 指标名 -> 引用该指标的最大窗口（秒）
+        self.window_retention = window_retention or {}
+        self.generation = generation
+        self.source_version = source_version
+
+    def get(self, alert_rule_id: int) -> Optional[CompiledRule]:
+        return self.by_id.get(alert_rule_id)
+
+    def rules_for_metrics(self, metric_names: Iterable[str]) -> Iterator[CompiledRule]:
+        """返回监听给定指标的指标规则"""
+        by_metric = self.by_metric
+        for metric_name in metric_names:
+            rules = by_metric.get(metric_name)
+            if rules:
+                yield from rules
+
+    def custom_rules_for_metrics(self, metric_names: Iterable[str]) -> List[CompiledRule]:
+        """返回表达式引用了给定指标的自定义规则（每条规则只出现一次）"""
+        matched: Dict[int, CompiledRule] = {}
+        by_custom_metric = self.by_custom_metric
+        for metric_name in metric_names:
+            for rule in by_custom_metric.get(metric_name, ()):
+                matched[rule.id] = rule
+        return list(matched.values())
+
+    def anomaly_rules_for_metrics(self, metric_names: Iterable[str]) -> List[CompiledRule]:
+        """返回监听给定指标的异常检测规则"""
+        by_anomaly_metric = self.by_anomaly_metric
+        return [
+            rule for metric_name in metric_names
+            for rule in by_anomaly_metric.get(metric_name, ())
+        ]
+
+    def rules_by_type(self, rule_type: Optional[AlertRuleType] = None) -> List[CompiledRule]:
+        """返回指定类型的规则，未指定类型时返回全部规则"""
+        if rule_type is not None:
+            return list(self.by_type.get(rule_type, []))
+        return [rule for rules in self.by_type.values() for rule in rules]
+
+    def count(self, rule_type: Optional[AlertRuleType] = None) -> int:
+        if rule_type is not None:
+            return len(self.by_type.get(rule_type, []))
+        return sum(len(rules) for rules in self.by_type.values())
+
+
+class RuleIndex:
+    """活动告警规则索引
+
+    持有当前版本的 RuleSnapshot。规则变更后调用 invalidate()，下次评估前
+    重建新快照并以一次引用赋值整体替换；评估中的调用方可以先取得
+    snapshot，在整个批次内使用同一版本的规则。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = RuleSnapshot({}, {}, {}, {}, {}, LogRuleMatcher([]))
+        # 每次失效递增代数，重建期间发生的变更不会被覆盖
+        self._generation = 0
+
+    @property
+    def is_stale(self) -> bool:
+        return self._snapshot.generation != self._generation
+
+    @property
+    def version(self) -> int:
+        """当前索引对应的代数，索引重建后变化"""
+        return self._snapshot.generation
+
+    @property
+    def source_version(self) -> Optional[int]:
+        """构建当前快照时规则集的全局版本号（未知时为 None）"""
+        return self._snapshot.source_version
+
+    @property
+    def snapshot(self) -> RuleSnapshot:
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        """标记索引失效（规则新增、修改或删除后调用）"""
+        with self._lock:
+            self._generation += 1
+
+    def build(self, rules: Iterable[AlertRule], source_version: Optional[int] = None) -> int:
+        """根据活动规则重建索引
+
+        Args:
+            rules: 活动告警规则
+            source_version: 读取规则前的全局规则版本号
+
+        Returns:
+            索引中的规则数量
+        """
+        generation = self._generation
+        by_id: Dict[int, CompiledRule] = {}
+        by_metric: Dict[str, List[CompiledRule]] = {}
+        by_custom_metric: Dict[str, List[CompiledRule]] = {}
+        by_anomaly_metric: Dict[str, List[CompiledRule]] = {}
+        by_type: Dict[AlertRuleType, List[CompiledRule]] = {}
+        window_retention: Dict[str, float] = {}
+        count = 0
+
+        for rule in rules:
+            try:
+                compiled = CompiledRule(rule)
+            except ExpressionError as e:
+                logger.warning(f"Custom rule {rule.id} has invalid expression, skipped: {e}")
+                continue
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Rule {rule.id} has invalid condition, skipped: {e}")
+                continue
+            if compiled.expression is not None:
+                for metric_name in compiled.expression.referenced_metrics:
+                    by_custom_metric.setdefault(metric_name, []).append(compiled)
+            if compiled.rule_type in (AlertRuleType.METRIC, AlertRuleType.ANOMALY):
+                if not compiled.metric_name:
+                    logger.warning(f"Metric rule {compiled.id} has no metric_name, skipped")
+                    continue
+                if compiled.compare is None:
+                    logger.warning(
+                        f"Metric rule {compiled.id} has invalid operator "
+                        f"{compiled.comparison_operator}, skipped"
+                    )
+                    continue
+            if compiled.anomaly is not None:
+                by_anomaly_metric.setdefault(compiled.metric_name, []).append(compiled)
+            elif compiled.rule_type == AlertRuleType.METRIC:
+                by_metric.setdefault(compiled.metric_name, []).append(compiled)
+                if compiled.window is not None:
+                    window_retention[compiled.metric_name] = max(
+                        window_retention.get(compiled.metric_name, 0), compiled.window.window
+                    )
+            by_type.setdefault(compiled.rule_type, []).append(compiled)
+            by_id[compiled.id] = compiled
+            count += 1
+
+        snapshot = RuleSnapshot(
+            by_id, by_metric, by_custom_metric, by_anomaly_metric, by_type,
+            LogRuleMatcher(by_type.get(AlertRuleType.LOG, [])),
+            window_retention, generation, source_version
+        )
+
+        # 整体替换引用，评估中的调用方继续使用旧快照；并发重建时保留较新的一份
+        with self._lock:
+            if generation >= self._snapshot.generation:
+                self._snapshot = snapshot
+
+        logger.info(
+            f"Rule index rebuilt: {count} rules, {len(by_metric)} metrics, "
+            f"version {source_version}"
+        )
+        return count
+
+    @property
+    def log_matcher(self) -> LogRuleMatcher:
+        """全部 LOG 规则编译成的联合匹配器"""
+        return self._snapshot.log_matcher
+
+    def get(self, alert_rule_id: int) -> Optional[CompiledRule]:
+        return self._snapshot.get(alert_rule_id)
+
+    def rules_for_metrics(self, metric_names: Iterable[str]) -> Iterator[CompiledRule]:
+        """返回监听给定指标的指标规则"""
+        return self._snapshot.rules_for_metrics(metric_names)
+
+    def rules_by_type(self, rule_type: Optional[AlertRuleType] = None) -> List[CompiledRule]:
+        """返回指定类型的规则，未指定类型时返回全部规则"""
+        return self._snapshot.rules_by_type(rule_type)
+
+    def count(self, rule_type: Optional[AlertRuleType] = None) -> int:
+        return self._snapshot.count(rule_type)
+
+
+# 进程级规则索引，由所有 AlertEngine 实例共享
+rule_index = RuleIndex()
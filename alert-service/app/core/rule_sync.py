@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.rule_index import rule_index
+
+logger = logging.getLogger(__name__)
+
+
+class RuleChangeBus:
+    """规则集变更的跨副本通知
+
+    规则增删改后递增 Redis 中的全局版本号并在频道上广播新版本；每个副本
+    的订阅线程收到比当前快照更新的版本时使规则索引失效，下次评估前才
+    重新读取规则表。订阅线程同时按 check_interval 比对版本号，以弥补
+    pub/sub 断线期间丢失的消息。
+    """
+
+    def __init__(self, version_key: str, channel: str, check_interval: int = 30):
+        self.version_key = version_key
+        self.channel = channel
+        self.check_interval = check_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current_version(self) -> Optional[int]:
+        """读取全局规则版本号，Redis 不可用时返回 None"""
+        try:
+            version = get_redis().get(self.version_key)
+        except Exception as e:
+            logger.warning(f"Failed to read rule version: {e}")
+            return None
+        return int(version) if version is not None else 0
+
+    def notify(self) -> Optional[int]:
+        """规则变更后调用：使本地索引失效并通知其他副本
+
+        Returns:
+            新的全局规则版本号，Redis 不可用时为 None
+        """
+        version = None
+        try:
+            client = get_redis()
+            version = client.incr(self.version_key)
+            client.publish(self.channel, version)
+        except Exception as e:
+            logger.warning(f"Failed to publish rule change: {e}")
+        finally:
+            # 先递增版本再失效，重建时读到的版本号已包含本次变更
+            rule_index.invalidate()
+        return version
+
+    def _on_version(self, version: Optional[int]) -> None:
+        if version is None:
+            return
+        source_version = rule_index.source_version
+        if source_version is None or version > source_version:
+            rule_index.invalidate()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="rule-change-bus", daemon=True)
+        self._thread.start()
+        logger.info(f"Rule change subscriber started on channel {self.channel}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        backoff = 1
+        while not self._stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # (重新)订阅期间可能错过了变更
+                self._on_version(self.current_version())
+                backoff = 1
+                checked_at = time.monotonic()
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._on_version(int(message["data"]))
+                    if time.monotonic() - checked_at >= self.check_interval:
+                        self._on_version(self.current_version())
+                        checked_at = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Rule change subscriber error, reconnecting in {backoff}s: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+# 进程级规则变更通知，由规则接口与所有 AlertEngine 实例共享
+rule_changes = RuleChangeBus(
+    version_key=settings.ALERT_RULE_VERSION_KEY,
+    channel=settings.ALERT_RULE_CHANNEL,
+    check_interval=settings.ALERT_RULE_VERSION_CHECK_INTERVAL
+)
@@ -0,0 +1,205 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.series import SeriesBatch
+
+logger = logging.getLogger(__name__)
+
+
+class LatestSampleStore:
+    """各序列各指标的最新样本值，供调度器按规则评估间隔读取
+
+    样本按 (指标名, 序列指纹) 保存，序列由标签（含 ci_id）区分，调度器
+    逐序列评估规则，不同主机的样本互不覆盖。超过 staleness 秒未更新的
+    样本视为不存在并定期淘汰。规则分片到多个副本时，接入的样本同时按
+    指标名分键写入 Redis 共享哈希，持有规则分片的副本评估前只合并其规则
+    引用的指标。
+    """
+
+    def __init__(
+        self,
+        staleness: int = 300,
+        shared_key: str = "alert:samples",
+        refresh_interval: float = 1.0
+    ):
+        self.staleness = staleness
+        self.shared_key = shared_key
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # 指标名 -> {序列指纹: (值, 更新时间)}
+        self._samples: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        # 序列指纹 -> 标签
+        self._labels: Dict[str, Dict[str, Any]] = {}
+        # 指标名 -> 上次从共享哈希读取的时间（monotonic）
+        self._refreshed_at: Dict[str, float] = {}
+        self._pruned_at = time.time()
+
+    def update(self, batch: SeriesBatch, now: Optional[float] = None) -> int:
+        """写入一批样本
+
+        Returns:
+            写入的样本数
+        """
+        now = time.time() if now is None else now
+        count = 0
+        with self._lock:
+            for metric_name in batch.metric_names:
+                samples = self._samples.setdefault(metric_name, {})
+                for fingerprint, labels, value in batch.series(metric_name):
+                    samples[fingerprint] = (value, now)
+                    self._labels[fingerprint] = labels
+                    count += 1
+        if now - self._pruned_at >= self.staleness:
+            self.prune(now)
+        return count
+
+    def batch(self, metric_names: Iterable[str], now: Optional[float] = None) -> SeriesBatch:
+        """返回给定指标未过期的全部序列样本"""
+        cutoff = (time.time() if now is None else now) - self.staleness
+        by_metric: Dict[str, List[tuple]] = {}
+        with self._lock:
+            for metric_name in set(metric_names):
+                samples = self._samples.get(metric_name)
+                if not samples:
+                    continue
+                series = [
+                    (fingerprint, self._labels.get(fingerprint) or {}, value)
+                    for fingerprint, (value, updated_at) in samples.items()
+                    if updated_at >= cutoff
+                ]
+                if series:
+                    by_metric[metric_name] = series
+        return SeriesBatch.from_series(by_metric)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """淘汰过期样本以及不再有样本的序列标签
+
+        Returns:
+            淘汰的样本数
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.staleness
+        removed = 0
+        with self._lock:
+            self._pruned_at = now
+            live = set()
+            for metric_name in list(self._samples):
+                samples = self._samples[metric_name]
+                for fingerprint in [fp for fp, (_, updated_at) in samples.items() if updated_at < cutoff]:
+                    del samples[fingerprint]
+                    removed += 1
+                if samples:
+                    live.update(samples)
+                else:
+                    del self._samples[metric_name]
+            for fingerprint in [fp for fp in self._labels if fp not in live]:
+                del self._labels[fingerprint]
+        return removed
+
+    def _shared_metric_key(self, metric_name: str) -> str:
+        return f"{self.shared_key}:{metric_name}"
+
+    def publish(self, batch: SeriesBatch, now: Optional[float] = None) -> None:
+        """把样本写入 Redis 共享哈希，供其他副本读取
+
+        每个指标一个哈希 "{shared_key}:{指标名}"，字段为序列指纹，值为
+        [值, 更新时间, 标签]，副本只需读取其规则引用的指标。
+        """
+        now = time.time() if now is None else now
+        payloads = {
+            metric_name: {
+                fingerprint: json.dumps([value, now, labels])
+                for fingerprint, labels, value in batch.series(metric_name)
+            }
+            for metric_name in batch.metric_names
+        }
+        payloads = {metric_name: payload for metric_name, payload in payloads.items() if payload}
+        if not payloads:
+            return
+        try:
+            pipe = get_redis().pipeline()
+            for metric_name, payload in payloads.items():
+                key = self._shared_metric_key(metric_name)
+                pipe.hset(key, mapping=payload)
+                pipe.expire(key, self.staleness)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to publish samples: {e}")
+
+    def refresh(self, metric_names: Iterable[str], now: Optional[float] = None) -> Optional[SeriesBatch]:
+        """从 Redis 共享哈希合并给定指标比本地更新的样本
+
+        每个指标至多每 refresh_interval 秒读取一次，只读取本副本规则引用的
+        指标，副本的读取量随其持有的分片而不是全部样本增长。过期的共享样本
+        被忽略，并从共享哈希中删除。
+
+        Args:
+            metric_names: 需要合并的指标名
+
+        Returns:
+            本次合并进来的样本，没有时为 None
+        """
+        started_at = time.monotonic()
+        with self._lock:
+            due = [
+                metric_name for metric_name in set(metric_names)
+                if started_at - self._refreshed_at.get(metric_name, 0.0) >= self.refresh_interval
+            ]
+            for metric_name in due:
+                self._refreshed_at[metric_name] = started_at
+        if not due:
+            return None
+
+        try:
+            redis = get_redis()
+            pipe = redis.pipeline()
+            for metric_name in due:
+                pipe.hgetall(self._shared_metric_key(metric_name))
+            shared = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to refresh shared samples: {e}")
+            return None
+
+        cutoff = (time.time() if now is None else now) - self.staleness
+        merged: Dict[str, List[tuple]] = {}
+        expired: Dict[str, List[str]] = {}
+        with self._lock:
+            for metric_name, fields in zip(due, shared):
+                samples = self._samples.setdefault(metric_name, {})
+                for fingerprint, raw_value in fields.items():
+                    value, updated_at, labels = json.loads(raw_value)
+                    if updated_at < cutoff:
+                        expired.setdefault(metric_name, []).append(fingerprint)
+                        continue
+                    current = samples.get(fingerprint)
+                    if current is None or updated_at > current[1]:
+                        samples[fingerprint] = (value, updated_at)
+                        self._labels[fingerprint] = labels or {}
+                        merged.setdefault(metric_name, []).append((fingerprint, labels or {}, value))
+                if not samples:
+                    del self._samples[metric_name]
+
+        if expired:
+            try:
+                pipe = redis.pipeline()
+                for metric_name, fingerprints in expired.items():
+                    pipe.hdel(self._shared_metric_key(metric_name), *fingerprints)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to drop expired shared samples: {e}")
+        return SeriesBatch.from_series(merged) if merged else None
+
+    def __len__(self) -> int:
+        return sum(len(samples) for samples in self._samples.values())
+
+
+# 进程级最新样本，由指标接入接口写入、调度器读取
+latest_samples = LatestSampleStore(
+    staleness=settings.ALERT_SAMPLE_STALENESS,
+    shared_key=settings.ALERT_SAMPLE_SHARED_KEY
+)
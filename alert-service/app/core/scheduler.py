@@ -0,0 +1,309 @@
+import heapq
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.alert_state import firing_alerts
+from app.core.rule_index import rule_index
+from app.core.sample_store import latest_samples
+from app.core.sharding import shard_coordinator
+from app.db.session import SessionLocal
+from app.models.alert import AlertRuleType
+
+logger = logging.getLogger(__name__)
+
+
+class RuleScheduler:
+    """按 AlertRule.evaluation_interval 调度规则评估
+
+    规则按下次运行时间放入最小堆，调度线程取出到期规则后分批提交给有界
+    线程池执行。首次运行时间按规则ID散列到 [0, interval * jitter) 内，
+    避免大量相同间隔的规则在同一时刻触发。线程池饱和时调度线程阻塞，
+    积压体现为 queue_depth 与 lag。
+    """
+
+    def __init__(
+        self,
+        load_rules: Callable[[], Dict[int, int]],
+        evaluate_batch: Callable[[List[int]], Any],
+        max_workers: int = 4,
+        batch_size: int = 200,
+        jitter: float = 1.0,
+        sync_interval: int = 10,
+        max_pending_batches: Optional[int] = None
+    ):
+        self.load_rules = load_rules
+        self.evaluate_batch = evaluate_batch
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.sync_interval = sync_interval
+        self.tick = 0.05
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._heap: List[Tuple[float, int]] = []
+        self._intervals: Dict[int, int] = {}
+        self._next_run: Dict[int, float] = {}
+        self._slots = threading.BoundedSemaphore(max_pending_batches or max_workers * 2)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._next_sync = 0.0
+
+        # 运行指标
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._last_lag = 0.0
+        self._avg_lag = 0.0
+        self._max_lag = 0.0
+        self._evaluated_rules = 0
+        self._failed_batches = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="rule-eval"
+        )
+        self._thread = threading.Thread(target=self._run, name="rule-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Rule scheduler started with {self.max_workers} workers")
+
+    def stop(self, wait: bool = True) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self._executor.shutdown(wait=wait)
+        self._executor = None
+        logger.info("Rule scheduler stopped")
+
+    def sync(self, intervals: Dict[int, int], now: Optional[float] = None) -> None:
+        """与当前规则集同步：新增规则入堆，删除规则出堆，间隔变化的规则重新排期"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for rule_id in list(self._intervals):
+                if rule_id not in intervals:
+                    # 堆中残留条目在出堆时跳过
+                    del self._intervals[rule_id]
+                    self._next_run.pop(rule_id, None)
+
+            for rule_id, interval in intervals.items():
+                interval = max(int(interval or 0), 1)
+                if self._intervals.get(rule_id) == interval:
+                    continue
+                self._intervals[rule_id] = interval
+                run_at = now + self._phase(rule_id, interval)
+                self._next_run[rule_id] = run_at
+                heapq.heappush(self._heap, (run_at, rule_id))
+        self._wakeup.set()
+
+    def request_sync(self) -> None:
+        """在下一轮循环立即同步规则集（分片归属变化时调用）"""
+        self._next_sync = 0.0
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            next_due = self._heap[0][0] - time.time() if self._heap else None
+            return {
+                "running": self._thread is not None,
+                "workers": self.max_workers,
+                "scheduled_rules": len(self._intervals),
+                "queue_depth": self._queue_depth,
+                "in_flight_batches": self._in_flight,
+                "lag_seconds": round(self._last_lag, 3),
+                "avg_lag_seconds": round(self._avg_lag, 3),
+                "max_lag_seconds": round(self._max_lag, 3),
+                "next_due_seconds": round(next_due, 3) if next_due is not None else None,
+                "evaluated_rules": self._evaluated_rules,
+                "failed_batches": self._failed_batches,
+            }
+
+    def _phase(self, rule_id: int, interval: int) -> float:
+        # 按规则ID散列得到稳定的相位偏移，重启后保持一致
+        fraction = zlib.crc32(str(rule_id).encode()) / 0xFFFFFFFF
+        return interval * self.jitter * fraction
+
+    def _pop_due(self, now: float) -> List[Tuple[float, int]]:
+        due: List[Tuple[float, int]] = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                run_at, rule_id = heapq.heappop(heap)
+                if self._next_run.get(rule_id) != run_at:
+                    continue
+
+                interval = self._intervals[rule_id]
+                next_run = run_at + interval
+                if next_run <= now:
+                    # 积压超过一个周期时跳过错过的运行，保持相位
+                    next_run += ((now - next_run) // interval + 1) * interval
+                self._next_run[rule_id] = next_run
+                heapq.heappush(heap, (next_run, rule_id))
+                due.append((run_at, rule_id))
+        return due
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            if now >= self._next_sync:
+                self._next_sync = now + self.sync_interval
+                try:
+                    self.sync(self.load_rules(), now)
+                except Exception as e:
+                    logger.error(f"Failed to sync scheduled rules: {e}")
+
+            due = self._pop_due(now)
+            for start in range(0, len(due), self.batch_size):
+                self._submit(due[start:start + self.batch_size])
+
+            with self._lock:
+                timeout = self._heap[0][0] - time.time() if self._heap else self.sync_interval
+            # 至少等待一个 tick，让相邻到期的规则合并为同一批次
+            timeout = max(min(timeout, self._next_sync - time.time()), self.tick)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _submit(self, batch: List[Tuple[float, int]]) -> None:
+        with self._lock:
+            self._queue_depth += len(batch)
+        # 线程池饱和时阻塞调度线程，实现背压
+        while not self._slots.acquire(timeout=1):
+            if self._stop.is_set():
+                with self._lock:
+                    self._queue_depth -= len(batch)
+                return
+        self._executor.submit(self._execute, batch)
+
+    def _execute(self, batch: List[Tuple[float, int]]) -> None:
+        started_at = time.time()
+        lag = max(started_at - batch[0][0], 0.0)
+        with self._lock:
+            self._queue_depth -= len(batch)
+            self._in_flight += 1
+            self._last_lag = lag
+            self._avg_lag = lag if not self._evaluated_rules else self._avg_lag * 0.9 + lag * 0.1
+            self._max_lag = max(self._max_lag, lag)
+
+        try:
+            self.evaluate_batch([rule_id for _, rule_id in batch])
+            with self._lock:
+                self._evaluated_rules += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to evaluate scheduled rule batch: {e}")
+            with self._lock:
+                self._failed_batches += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+
+def load_rule_intervals() -> Dict[int, int]:
+    """读取需要定时评估的指标与自定义规则及其评估间隔
+
+    异常检测规则的估计器随样本推进，在样本接入时评估，不参与调度。
+    启用分片时只返回本副本持有分片内的规则；此时异常检测规则也参与调度，
+    按评估间隔合并其他副本接收的样本。
+    """
+    from app.core.alert_engine import AlertEngine
+
+    if rule_index.is_stale:
+        db = SessionLocal()
+        try:
+            AlertEngine(db).ensure_rule_index()
+        finally:
+            db.close()
+
+    rule_types = [AlertRuleType.METRIC, AlertRuleType.CUSTOM]
+    if settings.ALERT_SHARDING_ENABLED:
+        rule_types.append(AlertRuleType.ANOMALY)
+    intervals = {
+        rule.id: rule.evaluation_interval or 60
+        for rule_type in rule_types
+        for rule in rule_index.rules_by_type(rule_type)
+    }
+    if settings.ALERT_SHARDING_ENABLED:
+        owned = shard_coordinator.filter_owned(intervals)
+        intervals = {rule_id: intervals[rule_id] for rule_id in owned}
+    return intervals
+
+
+def evaluate_rule_batch(rule_ids: List[int]) -> Dict[str, Any]:
+    """在独立会话中以批量模式评估一批到期规则"""
+    from app.core.alert_engine import AlertEngine
+
+    if settings.ALERT_SHARDING_ENABLED:
+        # 排期后租约可能已失效，分片交给其他副本后不再评估
+        rule_ids = shard_coordinator.filter_owned(rule_ids)
+        if not rule_ids:
+            return {"evaluated_rules": 0}
+
+    db = SessionLocal()
+    try:
+        engine = AlertEngine(db, batch_mode=True)
+        if settings.ALERT_SHARDING_ENABLED:
+            # 样本可能由其他副本接收，评估前只合并这批规则引用的共享样本，
+            # 合并进来的样本补记窗口并推进本副本持有的异常检测规则
+            snapshot = rule_index.snapshot
+            metric_names = set()
+            for rule in map(snapshot.get, rule_ids):
+                if rule is not None:
+                    metric_names.update(rule.referenced_metrics)
+            merged = latest_samples.refresh(metric_names)
+            if merged:
+                engine.advance_samples(merged)
+        return engine.evaluate_scheduled_rules(rule_ids)
+    finally:
+        db.close()
+
+
+_scheduler: Optional[RuleScheduler] = None
+
+
+def get_scheduler() -> Optional[RuleScheduler]:
+    return _scheduler
+
+
+def _on_shards_changed() -> None:
+    # 接管的分片可能有其他副本创建的触发中告警，重新与数据库对账
+    firing_alerts.invalidate()
+    if _scheduler is not None:
+        _scheduler.request_sync()
+
+
+def start_scheduler() -> RuleScheduler:
+    """创建并启动进程级规则调度器"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RuleScheduler(
+            load_rules=load_rule_intervals,
+            evaluate_batch=evaluate_rule_batch,
+            max_workers=settings.ALERT_SCHEDULER_WORKERS,
+            batch_size=settings.ALERT_SCHEDULER_BATCH_SIZE,
+            jitter=settings.ALERT_SCHEDULER_JITTER,
+            sync_interval=settings.ALERT_SCHEDULER_SYNC_INTERVAL
+        )
+        if settings.ALERT_SHARDING_ENABLED:
+            shard_coordinator.on_change(_on_shards_changed)
+    _scheduler.start()
+    if settings.ALERT_SHARDING_ENABLED:
+        shard_coordinator.start()
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    if _scheduler is not None:
+        _scheduler.stop()
+    if settings.ALERT_SHARDING_ENABLED:
+        # 主动释放租约，其他副本无需等待租约过期即可接管
+        shard_coordinator.stop()
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def series_fingerprint(labels: Optional[Dict[str, Any]]) -> str:
+    """计算标签集合的稳定指纹，与标签顺序无关；无标签时为空串"""
+    if not labels:
+        return ""
+    normalized = json.dumps(
+        {str(key): str(value) for key, value in labels.items()},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def alert_fingerprint(alert_rule_id: int, series_fp: str = "") -> str:
+    """告警指纹：规则ID + 序列指纹，用于触发中告警的去重"""
+    return hashlib.blake2b(
+        f"{alert_rule_id}:{series_fp}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def match_labels(selectors: Optional[Dict[str, Any]], labels: Dict[str, Any]) -> bool:
+    """标签选择器（等值匹配）是否全部满足"""
+    if not selectors:
+        return True
+    for key, value in selectors.items():
+        if str(labels.get(key)) != str(value):
+            return False
+    return True
+
+
+class SeriesResult:
+    """规则针对单个序列的评估结果"""
+
+    __slots__ = ("fingerprint", "labels", "is_triggered", "details")
+
+    def __init__(
+        self,
+        fingerprint: str,
+        labels: Optional[Dict[str, Any]],
+        is_triggered: bool,
+        details: Dict[str, Any]
+    ):
+        self.fingerprint = fingerprint
+        self.labels = labels
+        self.is_triggered = is_triggered
+        self.details = details
+
+
+class SeriesBatch:
+    """按指标名分组的多序列样本
+
+    样本格式为 {"metric_name": str, "labels": {...}, "value": float}，
+    指纹在分组时计算一次，供所有规则复用。
+    """
+
+    def __init__(self, samples: Iterable[Dict[str, Any]] = ()):
+        self._by_metric: Dict[str, List[tuple]] = {}
+        for sample in samples:
+            metric_name = sample.get("metric_name")
+            value = sample.get("value")
+            if not metric_name or value is None:
+                continue
+            labels = sample.get("labels") or {}
+            self._by_metric.setdefault(metric_name, []).append(
+                (series_fingerprint(labels), labels, float(value))
+            )
+
+    @property
+    def metric_names(self) -> List[str]:
+        return list(self._by_metric)
+
+    def series(self, metric_name: str) -> List[tuple]:
+        """返回指标下的 (指纹, 标签, 值) 列表"""
+        return self._by_metric.get(metric_name, [])
+
+    @classmethod
+    def from_series(cls, by_metric: Dict[str, List[tuple]]) -> "SeriesBatch":
+        """由已计算指纹的 {指标名: [(指纹, 标签, 值)]} 构建，不再重复计算指纹"""
+        batch = cls()
+        batch._by_metric = by_metric
+        return batch
+
+    @classmethod
+    def from_metric_data(
+        cls, metric_data: Dict[str, float], labels: Optional[Dict[str, Any]] = None
+    ) -> "SeriesBatch":
+        """把 {"metric_name": value} 视为同一序列（labels 对应的序列）的样本"""
+        labels = labels or {}
+        fingerprint = series_fingerprint(labels)
+        return cls.from_series({
+            metric_name: [(fingerprint, labels, float(value))]
+            for metric_name, value in metric_data.items() if value is not None
+        })
+
+    def values_by_series(
+        self, metric_names: Optional[Iterable[str]] = None
+    ) -> Dict[str, Tuple[Dict[str, Any], Dict[str, float]]]:
+        """按序列汇总各指标的值，供引用多个指标的自定义规则逐序列求值
+
+        Returns:
+            {指纹: (标签, {指标名: 值})}
+        """
+        result: Dict[str, Tuple[Dict[str, Any], Dict[str, float]]] = {}
+        for metric_name in (self._by_metric if metric_names is None else metric_names):
+            for fingerprint, labels, value in self._by_metric.get(metric_name, ()):
+                entry = result.get(fingerprint)
+                if entry is None:
+                    entry = result[fingerprint] = (labels, {})
+                entry[1][metric_name] = value
+        return result
+
+    def __len__(self) -> int:
+        return sum(len(series) for series in self._by_metric.values())
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# 仅当租约仍属于本副本时续期/释放（比较并操作）
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def jump_consistent_hash(key: int, num_buckets: int) -> int:
+    """Jump consistent hash：分片数变化时只有约 1/n 的键改变分片"""
+    bucket, next_bucket = -1, 0
+    while next_bucket < num_buckets:
+        bucket = next_bucket
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        next_bucket = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(alert_rule_id: int, shard_count: int) -> int:
+    """规则所属分片"""
+    return jump_consistent_hash(_hash64(str(alert_rule_id)), shard_count)
+
+
+class ShardCoordinator:
+    """用 Redis 租约在副本之间分配规则分片
+
+    每个副本定期写入心跳，按存活副本数计算应持有的分片数，续期已持有的
+    租约、释放多出的分片并抢占空闲分片。副本退出或失联后其租约过期，
+    分片由其他副本接管。本地只在租约到期前 safety_margin 秒内认为自己
+    持有分片，保证交接期间不会有两个副本同时评估同一分片。
+    """
+
+    def __init__(
+        self,
+        shard_count: int = 64,
+        lease_ttl: int = 15,
+        key_prefix: str = "alert:shard",
+        replica_id: Optional[str] = None
+    ):
+        self.shard_count = shard_count
+        self.lease_ttl = lease_ttl
+        self.key_prefix = key_prefix
+        self.replica_id = replica_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.renew_interval = max(lease_ttl / 3, 1)
+        self.safety_margin = self.renew_interval
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 分片 -> 本地认为租约有效的截止时间（monotonic）
+        self._owned: Dict[int, float] = {}
+        self._live_replicas = 1
+        self._listeners: List[Callable[[], None]] = []
+        # 各副本按不同顺序尝试分片，减少抢占冲突
+        self._preference = sorted(
+            range(shard_count), key=lambda shard: _hash64(f"{self.replica_id}:{shard}")
+        )
+
+    @property
+    def replicas_key(self) -> str:
+        return f"{self.key_prefix}:replicas"
+
+    def _lease_key(self, shard: int) -> str:
+        return f"{self.key_prefix}:{shard}"
+
+    def on_change(self, listener: Callable[[], None]) -> None:
+        """注册分片归属变化时的回调"""
+        self._listeners.append(listener)
+
+    def owned_shards(self) -> Set[int]:
+        now = time.monotonic()
+        with self._lock:
+            return {shard for shard, valid_until in self._owned.items() if valid_until > now}
+
+    def owns(self, alert_rule_id: int) -> bool:
+        valid_until = self._owned.get(shard_of(alert_rule_id, self.shard_count))
+        return valid_until is not None and valid_until > time.monotonic()
+
+    def filter_owned(self, rule_ids: Iterable[int]) -> List[int]:
+        owned = self.owned_shards()
+        return [rule_id for rule_id in rule_ids if shard_of(rule_id, self.shard_count) in owned]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "replica_id": self.replica_id,
+            "shard_count": self.shard_count,
+            "live_replicas": self._live_replicas,
+            "owned_shards": sorted(self.owned_shards()),
+        }
+
+    def rebalance(self) -> bool:
+        """执行一轮心跳、续期、释放与抢占
+
+        Returns:
+            本轮分片归属是否变化
+        """
+        client = get_redis()
+        now = time.time()
+        ttl_ms = int(self.lease_ttl * 1000)
+
+        # 心跳，并清理超过租约时长未心跳的副本
+        pipe = client.pipeline()
+        pipe.zadd(self.replicas_key, {self.replica_id: now})
+        pipe.zremrangebyscore(self.replicas_key, "-inf", now - self.lease_ttl)
+        pipe.zcard(self.replicas_key)
+        live_replicas = max(pipe.execute()[2], 1)
+        target = math.ceil(self.shard_count / live_replicas)
+
+        before = set(self._owned)
+        renewed_at = time.monotonic()
+        valid_until = renewed_at + self.lease_ttl - self.safety_margin
+        owned: Dict[int, float] = {}
+
+        renew = client.register_script(_RENEW_SCRIPT)
+        for shard in sorted(self._owned):
+            if renew(keys=[self._lease_key(shard)], args=[self.replica_id, ttl_ms]):
+                owned[shard] = valid_until
+            else:
+                logger.warning(f"Lost lease on shard {shard}")
+
+        # 新副本加入后让出多出的分片
+        if len(owned) > target:
+            release = client.register_script(_RELEASE_SCRIPT)
+            for shard in sorted(owned, key=self._preference.index, reverse=True)[:len(owned) - target]:
+                del owned[shard]
+                release(keys=[self._lease_key(shard)], args=[self.replica_id])
+
+        for shard in self._preference:
+            if len(owned) >= target:
+                break
+            if shard in owned:
+                continue
+            if client.set(self._lease_key(shard), self.replica_id, nx=True, px=ttl_ms):
+                owned[shard] = valid_until
+
+        with self._lock:
+            self._owned = owned
+            self._live_replicas = live_replicas
+
+        changed = set(owned) != before
+        if changed:
+            logger.info(
+                f"Replica {self.replica_id} owns {len(owned)}/{self.shard_count} shards "
+                f"({live_replicas} live replicas)"
+            )
+            for listener in self._listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    logger.error(f"Shard change listener failed: {e}")
+        return changed
+
+    def release_all(self) -> None:
+        """主动释放全部租约（正常退出时调用），分片可立即被接管"""
+        with self._lock:
+            owned, self._owned = list(self._owned), {}
+        try:
+            client = get_redis()
+            release = client.register_script(_RELEASE_SCRIPT)
+            for shard in owned:
+                release(keys=[self._lease_key(shard)], args=[self.replica_id])
+            client.zrem(self.replicas_key, self.replica_id)
+        except Exception as e:
+            logger.warning(f"Failed to release shard leases: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="shard-coordinator", daemon=True)
+        self._thread.start()
+        logger.info(f"Shard coordinator started as {self.replica_id}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.release_all()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.rebalance()
+            except Exception as e:
+                # Redis 不可用时不再续期，本地持有关系随截止时间自然失效
+                logger.warning(f"Shard rebalance failed: {e}")
+            self._stop_event.wait(self.renew_interval)
+
+
+# 进程级分片协调器，由调度器与所有 AlertEngine 实例共享
+shard_coordinator = ShardCoordinator(
+    shard_count=settings.ALERT_SHARD_COUNT,
+    lease_ttl=settings.ALERT_SHARD_LEASE_TTL,
+    replica_id=settings.ALERT_REPLICA_ID
+)
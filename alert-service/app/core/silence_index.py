@@ -0,0 +1,282 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from app.core.config import settings
+from app.models.alert import AlertSilence
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc_naive(value: datetime) -> datetime:
+    """将带时区的时间转换为不带时区的UTC时间，便于与 datetime.utcnow() 比较"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+MATCH_OPERATORS = ("=", "!=", "=~", "!~")
+
+
+class LabelMatcher:
+    """单个标签匹配条件，正则在构造时编译一次
+
+    与 Alertmanager 相同，正则需匹配完整取值，缺少的标签按空字符串处理。
+    """
+
+    __slots__ = ("name", "op", "value", "_pattern")
+
+    def __init__(self, name: str, op: str, value: str):
+        if op not in MATCH_OPERATORS:
+            raise ValueError(f"Unsupported matcher operator: {op}")
+        if not name:
+            raise ValueError("Matcher label name is empty")
+        self.name = name
+        self.op = op
+        self.value = value
+        self._pattern = None
+        if op in ("=~", "!~"):
+            try:
+                self._pattern = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex for label {name}: {e}")
+
+    def matches(self, labels: Mapping[str, str]) -> bool:
+        value = labels.get(self.name, "")
+        if self.op == "=":
+            return value == self.value
+        if self.op == "!=":
+            return value != self.value
+        matched = self._pattern.fullmatch(value) is not None
+        return matched if self.op == "=~" else not matched
+
+
+def compile_matchers(matchers: Optional[Iterable[Mapping[str, Any]]]) -> List[LabelMatcher]:
+    """编译静默的标签匹配条件
+
+    Args:
+        matchers: [{"name": 标签名, "op": 运算符, "value": 值}]，op 默认为 "="
+
+    Returns:
+        编译后的匹配条件列表
+
+    Raises:
+        ValueError: 运算符或正则表达式无效
+    """
+    compiled = []
+    for matcher in matchers or ():
+        op = matcher.get("op") or "="
+        compiled.append(LabelMatcher(
+            str(matcher.get("name") or ""), getattr(op, "value", op), str(matcher.get("value") or "")
+        ))
+    return compiled
+
+
+class SilenceIndex:
+    """活动静默的内存区间索引
+
+    静默按 alert_rule_id、alert_id 以及二者组合分别建立索引，每个键下的
+    条目按 ends_at 有序排列，判断是否静默只需查看最晚结束的条目。
+    过期条目通过最小堆在查询时自动淘汰。
+
+    标签静默（matchers）挂在其中一个非空等值条件的 (标签, 值) 倒排键下，
+    取当时候选最少的键；检查告警时只取告警各标签对应的候选静默，再逐条
+    验证其余条件（包括正则），耗时与告警标签数及候选数有关，与静默总数
+    无关。没有可用等值条件的静默放在单独的键下，每次都需要验证。
+    """
+
+    def __init__(self, refresh_interval: int = 60):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._buckets: Dict[Hashable, List[Tuple[datetime, int]]] = {}
+        self._entries: Dict[int, Tuple[List[Hashable], datetime]] = {}
+        self._expiry: List[Tuple[datetime, int]] = []
+        # 标签静默ID -> (限定的告警规则ID, 编译后的匹配条件)
+        self._label_silences: Dict[int, Tuple[Optional[int], List[LabelMatcher]]] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_stale(self) -> bool:
+        """从未加载或超过刷新间隔时需要从数据库重新加载"""
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def load(self, silences: Iterable[AlertSilence]) -> int:
+        """用数据库中的活动静默整体替换索引
+
+        Args:
+            silences: 活动静默列表
+
+        Returns:
+            加载的静默数量
+        """
+        with self._lock:
+            self._buckets = {}
+            self._entries = {}
+            self._expiry = []
+            self._label_silences = {}
+            for silence in silences:
+                self._add(silence)
+            self._loaded_at = time.monotonic()
+            count = len(self._entries)
+
+        logger.info(f"Silence index loaded: {count} active silences")
+        return count
+
+    def add(self, silence: AlertSilence) -> None:
+        """新增或更新一条静默"""
+        with self._lock:
+            self._remove(silence.id)
+            self._add(silence)
+
+    def remove(self, silence_id: int) -> None:
+        """移除一条静默（静默被取消时调用）"""
+        with self._lock:
+            self._remove(silence_id)
+
+    def is_silenced(
+        self,
+        alert_rule_id: Optional[int] = None,
+        alert_id: Optional[int] = None,
+        labels: Optional[Mapping[str, str]] = None,
+        now: Optional[datetime] = None
+    ) -> bool:
+        """检查告警或规则是否被静默，条件同时给出时需同一条静默全部匹配
+
+        Args:
+            alert_rule_id: 告警规则ID
+            alert_id: 告警ID
+            labels: 告警的匹配标签，给出时同时检查标签静默
+            now: 当前UTC时间
+
+        Returns:
+            是否被静默
+        """
+        if not alert_rule_id and not alert_id and labels is None:
+            return False
+
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._expire(now)
+            if alert_rule_id or alert_id:
+                entries = self._buckets.get(self._key(alert_rule_id, alert_id))
+                if entries and entries[-1][0] > now:
+                    return True
+            if labels is not None and self._label_silences:
+                return self._labels_silenced(alert_rule_id, labels, now)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(alert_rule_id: Optional[int], alert_id: Optional[int]) -> Hashable:
+        if alert_rule_id and alert_id:
+            return ("pair", alert_rule_id, alert_id)
+        if alert_rule_id:
+            return ("rule", alert_rule_id)
+        return ("alert", alert_id)
+
+    def _labels_silenced(
+        self, alert_rule_id: Optional[int], labels: Mapping[str, str], now: datetime
+    ) -> bool:
+        buckets = self._buckets
+        candidates = [buckets.get(("labels",))]
+        candidates.extend(buckets.get(("labels", name, value)) for name, value in labels.items())
+        for entries in candidates:
+            if not entries:
+                continue
+            for ends_at, silence_id in reversed(entries):
+                if ends_at <= now:
+                    break
+                rule_id, matchers = self._label_silences[silence_id]
+                if rule_id and rule_id != alert_rule_id:
+                    continue
+                if all(matcher.matches(labels) for matcher in matchers):
+                    return True
+        return False
+
+    def _label_key(self, matchers: List[LabelMatcher]) -> Hashable:
+        # 取当前候选最少的非空等值条件作为倒排键，空值等值条件表示标签不存在，不能作键
+        keys = [
+            ("labels", matcher.name, matcher.value)
+            for matcher in matchers if matcher.op == "=" and matcher.value
+        ]
+        if not keys:
+            return ("labels",)
+        return min(keys, key=lambda key: len(self._buckets.get(key, ())))
+
+    def _add(self, silence: AlertSilence) -> None:
+        if not silence.is_active or silence.ends_at is None:
+            return
+        matchers = getattr(silence, "matchers", None)
+        if not silence.alert_rule_id and not silence.alert_id and not matchers:
+            return
+
+        ends_at = as_utc_naive(silence.ends_at)
+        if ends_at <= datetime.utcnow():
+            return
+
+        keys: List[Hashable] = []
+        if matchers:
+            # 标签静默作用于新告警，只按标签与可选的 alert_rule_id 匹配
+            try:
+                compiled = compile_matchers(matchers)
+            except ValueError as e:
+                logger.warning(f"Skipping silence {silence.id} with invalid matchers: {e}")
+                return
+            keys.append(self._label_key(compiled))
+            self._label_silences[silence.id] = (silence.alert_rule_id, compiled)
+        else:
+            if silence.alert_rule_id:
+                keys.append(self._key(silence.alert_rule_id, None))
+            if silence.alert_id:
+                keys.append(self._key(None, silence.alert_id))
+            if silence.alert_rule_id and silence.alert_id:
+                keys.append(self._key(silence.alert_rule_id, silence.alert_id))
+
+        entry = (ends_at, silence.id)
+        for key in keys:
+            bisect.insort(self._buckets.setdefault(key, []), entry)
+        self._entries[silence.id] = (keys, ends_at)
+        heapq.heappush(self._expiry, entry)
+
+    def _remove(self, silence_id: int) -> None:
+        # 过期堆中的残留条目在淘汰时会被忽略
+        record = self._entries.pop(silence_id, None)
+        if record is None:
+            return
+        self._label_silences.pop(silence_id, None)
+
+        keys, ends_at = record
+        entry = (ends_at, silence_id)
+        for key in keys:
+            entries = self._buckets.get(key)
+            if not entries:
+                continue
+            pos = bisect.bisect_left(entries, entry)
+            if pos < len(entries) and entries[pos] == entry:
+                del entries[pos]
+            if not entries:
+                del self._buckets[key]
+
+    def _expire(self, now: datetime) -> None:
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            ends_at, silence_id = heapq.heappop(expiry)
+            record = self._entries.get(silence_id)
+            if record is not None and record[1] == ends_at:
+                self._remove(silence_id)
+
+
+# 进程级静默索引，由所有 AlertEngine 实例共享
+silence_index = SilenceIndex(refresh_interval=settings.ALERT_SILENCE_REFRESH_INTERVAL)
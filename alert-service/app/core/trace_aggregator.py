@@ -0,0 +1,78 @@
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class OperationCounters:
+    """单个 operation_name 的链路计数"""
+
+    __slots__ = ("total", "errors", "slow_buckets")
+
+    def __init__(self, bucket_count: int):
+        self.total = 0
+        self.errors = 0
+        self.slow_buckets = [0] * bucket_count
+
+
+class TraceAggregate:
+    """链路批次的一次性聚合结果
+
+    遍历一次 trace_data，按 operation_name 统计总数、错误数，以及相对
+    每个不同 duration_threshold 的慢链路数；之后每条 TRACE 规则都从
+    计数器中得出结果，总复杂度为 O(链路数 + 规则数)。
+    """
+
+    def __init__(self, trace_data: Iterable[Dict[str, Any]], duration_thresholds: Iterable[float]):
+        self.thresholds: List[float] = sorted(set(t for t in duration_thresholds if t))
+        self._threshold_pos = {threshold: pos for pos, threshold in enumerate(self.thresholds)}
+        self.operations: Dict[str, OperationCounters] = {}
+        self._matches: Dict[str, List[OperationCounters]] = {}
+
+        thresholds = self.thresholds
+        bucket_count = len(thresholds) + 1
+        operations = self.operations
+        for trace in trace_data:
+            operation_name = trace.get("operation_name", "")
+            counters = operations.get(operation_name)
+            if counters is None:
+                counters = operations[operation_name] = OperationCounters(bucket_count)
+
+            counters.total += 1
+            if trace.get("status") == "ERROR":
+                counters.errors += 1
+            if thresholds:
+                # 第 i 个区间表示耗时恰好大于前 i 个阈值
+                counters.slow_buckets[bisect.bisect_left(thresholds, trace.get("duration", 0))] += 1
+
+        # 转为后缀和：slow_buckets[i] 为耗时大于前 i 个阈值的链路数
+        for counters in operations.values():
+            buckets = counters.slow_buckets
+            for i in range(len(buckets) - 2, -1, -1):
+                buckets[i] += buckets[i + 1]
+
+    def counters(
+        self, operation_name: str, duration_threshold: Optional[float] = None
+    ) -> Tuple[int, int, int]:
+        """汇总 operation_name 子串匹配的全部操作
+
+        Args:
+            operation_name: 规则中的操作名（子串匹配，与 evaluate_trace_rule 一致）
+            duration_threshold: 慢链路阈值
+
+        Returns:
+            (总链路数, 错误链路数, 慢链路数)
+        """
+        matched = self._matches.get(operation_name)
+        if matched is None:
+            matched = self._matches[operation_name] = [
+                counters for name, counters in self.operations.items()
+                if operation_name in name
+            ]
+
+        total = errors = slow = 0
+        pos = self._threshold_pos.get(duration_threshold) if duration_threshold else None
+        for counters in matched:
+            total += counters.total
+            errors += counters.errors
+            if pos is not None:
+                slow += counters.slow_buckets[pos + 1]
+        return total, errors, slow
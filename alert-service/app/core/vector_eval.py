@@ -0,0 +1,112 @@
+import logging
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# 运算符编码，便于以整数数组形式传递给其他进程
+OPERATOR_CODES: Dict[str, int] = {">": 0, ">=": 1, "<": 2, "<=": 3, "==": 4, "!=": 5}
+OPERATOR_UFUNCS = (
+    np.greater, np.greater_equal, np.less, np.less_equal, np.equal, np.not_equal
+)
+
+# 每次比较的行数上限，限制 N × M 布尔中间结果的内存
+DEFAULT_CHUNK_ROWS = 8192
+
+
+def evaluate_threshold_arrays(
+    values: np.ndarray,
+    columns: np.ndarray,
+    thresholds: np.ndarray,
+    op_codes: np.ndarray,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """对 N 个对象 × K 个指标的样本矩阵批量评估 M 条阈值规则
+
+    Args:
+        values: 样本矩阵 (N, K)，缺失值为 NaN
+        columns: 每条规则对应的指标列 (M,)
+        thresholds: 每条规则的阈值 (M,)
+        op_codes: 每条规则的运算符编码 (M,)
+        chunk_rows: 每次比较的行数
+
+    Returns:
+        (规则下标, 行下标)，只包含越限的组合
+    """
+    rule_hits: List[np.ndarray] = []
+    row_hits: List[np.ndarray] = []
+
+    groups = [(code, np.flatnonzero(op_codes == code)) for code in np.unique(op_codes)]
+    for start in range(0, values.shape[0], chunk_rows):
+        block = values[start:start + chunk_rows]
+        for code, rule_idx in groups:
+            sub = block[:, columns[rule_idx]]
+            # NaN 表示该对象没有此指标，不参与比较
+            mask = OPERATOR_UFUNCS[code](sub, thresholds[rule_idx]) & ~np.isnan(sub)
+            rows, cols = np.nonzero(mask)
+            if rows.size:
+                rule_hits.append(rule_idx[cols])
+                row_hits.append(rows + start)
+
+    if not rule_hits:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    return np.concatenate(rule_hits), np.concatenate(row_hits)
+
+
+class ThresholdMatrix:
+    """一组阈值规则针对固定指标列编译成的向量化评估器"""
+
+    def __init__(self, rules: Sequence[Any], metric_names: Sequence[str]):
+        positions = {name: pos for pos, name in enumerate(metric_names)}
+        self.metric_names = list(metric_names)
+        self.rules = [
+            rule for rule in rules
+            if rule.metric_name in positions and rule.comparison_operator in OPERATOR_CODES
+        ]
+        self.columns = np.array(
+            [positions[rule.metric_name] for rule in self.rules], dtype=np.intp
+        )
+        self.thresholds = np.array([rule.threshold for rule in self.rules], dtype=np.float64)
+        self.op_codes = np.array(
+            [OPERATOR_CODES[rule.comparison_operator] for rule in self.rules], dtype=np.int8
+        )
+
+    def evaluate(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """返回越限的 (规则下标, 行下标)"""
+        if not self.rules:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.metric_names):
+            raise ValueError(
+                f"Expected values of shape (N, {len(self.metric_names)}), got {values.shape}"
+            )
+        return evaluate_threshold_arrays(values, self.columns, self.thresholds, self.op_codes)
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[Tuple[int, Tuple[str, ...]], ThresholdMatrix] = {}
+_cache_version = -1
+
+
+def get_threshold_matrix(
+    version: int, rules: Sequence[Any], metric_names: Sequence[str]
+) -> ThresholdMatrix:
+    """按规则索引版本与指标列缓存编译结果，规则变更后自动失效"""
+    global _cache_version
+    key = (version, tuple(metric_names))
+    with _cache_lock:
+        if version != _cache_version:
+            _cache.clear()
+            _cache_version = version
+        matrix = _cache.get(key)
+    if matrix is None:
+        matrix = ThresholdMatrix(rules, metric_names)
+        with _cache_lock:
+            if version == _cache_version:
+                _cache[key] = matrix
+    return matrix
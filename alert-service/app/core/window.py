@@ -0,0 +1,300 @@
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 规则 condition["function"] 支持的窗口函数
+WINDOW_FUNCTIONS = ("rate", "increase", "avg_over_time", "max_over_time", "quantile_over_time")
+
+_DURATION = re.compile(r"^(?P<amount>\d+(?:\.\d+)?)(?P<unit>[smhd]?)$")
+_UNIT_SECONDS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(window: Any) -> float:
+    """解析窗口长度：秒数，或 "30s"/"5m"/"1h"/"1d" 形式的字符串
+
+    Raises:
+        ValueError: 格式非法或不为正数
+    """
+    if isinstance(window, (int, float)) and not isinstance(window, bool):
+        seconds = float(window)
+    else:
+        match = _DURATION.match(str(window).strip())
+        if not match:
+            raise ValueError(f"Invalid window: {window!r}")
+        seconds = float(match.group("amount")) * _UNIT_SECONDS[match.group("unit")]
+    if seconds <= 0:
+        raise ValueError(f"Window must be positive: {window!r}")
+    return seconds
+
+
+class WindowSpec:
+    """规则引用的窗口函数"""
+
+    __slots__ = ("function", "window", "quantile")
+
+    def __init__(self, function: str, window: float, quantile: Optional[float] = None):
+        self.function = function
+        self.window = window
+        self.quantile = quantile
+
+    @classmethod
+    def from_condition(cls, condition: Dict[str, Any]) -> Optional["WindowSpec"]:
+        """从规则条件解析窗口函数，未配置 function 时返回 None
+
+        Raises:
+            ValueError: 函数、窗口或分位数非法
+        """
+        function = condition.get("function")
+        if not function:
+            return None
+        if function not in WINDOW_FUNCTIONS:
+            raise ValueError(f"Unknown window function: {function}")
+        if condition.get("window") is None:
+            raise ValueError(f"{function} requires a window")
+        window = parse_window(condition["window"])
+
+        quantile = None
+        if function == "quantile_over_time":
+            quantile = condition.get("quantile")
+            if not isinstance(quantile, (int, float)) or not 0 <= quantile <= 1:
+                raise ValueError("quantile_over_time requires a quantile between 0 and 1")
+            quantile = float(quantile)
+        return cls(function, window, quantile)
+
+
+class SeriesBuffer:
+    """单个序列的样本环形缓冲
+
+    样本按时间追加，超过保留时长或点数上限的旧样本从头部淘汰。同时维护
+    累计和与计数器累计增量的前缀和，使 avg_over_time、increase、rate
+    只需二分定位窗口起点即可求出；max_over_time 为每个窗口长度维护
+    单调队列，均摊 O(1)。quantile_over_time 需要对窗口内样本排序。
+    """
+
+    __slots__ = (
+        "retention", "max_points", "_ts", "_values", "_cum_sum", "_cum_inc",
+        "_start", "_offset", "_max_queues",
+    )
+
+    def __init__(self, retention: float, max_points: int):
+        self.retention = retention
+        self.max_points = max_points
+        self._ts: List[float] = []
+        self._values: List[float] = []
+        self._cum_sum: List[float] = []
+        self._cum_inc: List[float] = []
+        # 列表头部已淘汰的位置数，以及已压缩掉的绝对序号
+        self._start = 0
+        self._offset = 0
+        self._max_queues: Dict[float, Deque[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ts) - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        return self._ts[-1] if len(self) else None
+
+    def append(self, timestamp: float, value: float) -> None:
+        # 与 Prometheus 一致，同一时间戳的重复样本与乱序样本被丢弃
+        if len(self) and timestamp <= self._ts[-1]:
+            return
+        if len(self):
+            previous = self._values[-1]
+            delta = value - previous
+            # 计数器重置时把当前值视为增量
+            self._cum_sum.append(self._cum_sum[-1] + value)
+            self._cum_inc.append(self._cum_inc[-1] + (delta if delta >= 0 else value))
+        else:
+            self._cum_sum.append(value)
+            self._cum_inc.append(0.0)
+        self._ts.append(timestamp)
+        self._values.append(value)
+
+        index = self._offset + len(self._ts) - 1
+        for queue in self._max_queues.values():
+            while queue and self._values[queue[-1] - self._offset] <= value:
+                queue.pop()
+            queue.append(index)
+
+        self._evict(timestamp - self.retention)
+
+    def _evict(self, cutoff: float) -> None:
+        ts = self._ts
+        start = self._start
+        overflow = len(ts) - start - self.max_points
+        if overflow > 0:
+            start += overflow
+        while start < len(ts) and ts[start] < cutoff:
+            start += 1
+        self._start = start
+
+        first = self._offset + start
+        for queue in self._max_queues.values():
+            while queue and queue[0] < first:
+                queue.popleft()
+
+        # 头部空洞超过一半时压缩，列表操作均摊 O(1)
+        if start and start * 2 >= len(ts):
+            del ts[:start], self._values[:start], self._cum_sum[:start], self._cum_inc[:start]
+            # 前缀和只用差值，顺便重设基准以免长期累加损失精度
+            sum_base, inc_base = self._cum_sum[0], self._cum_inc[0]
+            self._cum_sum = [total - sum_base for total in self._cum_sum]
+            self._cum_inc = [total - inc_base for total in self._cum_inc]
+            self._offset += start
+            self._start = 0
+
+    def _window_start(self, window: float, now: float) -> int:
+        return bisect.bisect_left(self._ts, now - window, lo=self._start)
+
+    def increase(self, window: float, now: float) -> Optional[float]:
+        first = self._window_start(window, now)
+        if len(self._ts) - first < 2:
+            return None
+        return self._cum_inc[-1] - self._cum_inc[first]
+
+    def rate(self, window: float, now: float) -> Optional[float]:
+        first = self._window_start(window, now)
+        if len(self._ts) - first < 2:
+            return None
+        elapsed = self._ts[-1] - self._ts[first]
+        return (self._cum_inc[-1] - self._cum_inc[first]) / elapsed
+
+    def avg_over_time(self, window: float, now: float) -> Optional[float]:
+        first = self._window_start(window, now)
+        count = len(self._ts) - first
+        if count < 1:
+            return None
+        total = self._cum_sum[-1] - self._cum_sum[first] + self._values[first]
+        return total / count
+
+    def max_over_time(self, window: float, now: float) -> Optional[float]:
+        queue = self._max_queues.get(window)
+        if queue is None:
+            # 首次查询该窗口长度时由现有样本建立单调队列
+            queue = self._max_queues[window] = deque()
+            for position in range(self._start, len(self._ts)):
+                while queue and self._values[queue[-1] - self._offset] <= self._values[position]:
+                    queue.pop()
+                queue.append(position + self._offset)
+
+        first = self._window_start(window, now) + self._offset
+        while queue and queue[0] < first:
+            queue.popleft()
+        if not queue:
+            return None
+        return self._values[queue[0] - self._offset]
+
+    def quantile_over_time(self, window: float, now: float, quantile: float) -> Optional[float]:
+        first = self._window_start(window, now)
+        values = sorted(self._values[first:])
+        if not values:
+            return None
+        # 与 Prometheus 相同的线性插值
+        rank = quantile * (len(values) - 1)
+        lower = math.floor(rank)
+        upper = min(lower + 1, len(values) - 1)
+        weight = rank - lower
+        return values[lower] * (1 - weight) + values[upper] * weight
+
+    def query(self, spec: WindowSpec, now: float) -> Optional[float]:
+        if spec.function == "quantile_over_time":
+            return self.quantile_over_time(spec.window, now, spec.quantile)
+        return getattr(self, spec.function)(spec.window, now)
+
+
+class WindowStore:
+    """按 (指标, 序列指纹) 保存样本环形缓冲
+
+    只记录至少被一条窗口规则引用的指标，保留时长为引用该指标的最大窗口，
+    每个序列最多 max_points 个点；长时间没有新样本的序列会被清理。
+    """
+
+    def __init__(self, max_points: int = 1000, prune_interval: int = 60):
+        self.max_points = max_points
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._retention: Dict[str, float] = {}
+        self._buffers: Dict[Tuple[str, str], SeriesBuffer] = {}
+        self._pruned_at = time.monotonic()
+
+    def configure(self, retention: Dict[str, float]) -> None:
+        """设置需要记录的指标及其保留时长（规则索引重建后调用）"""
+        with self._lock:
+            self._retention = dict(retention)
+            for (metric_name, fingerprint), buffer in list(self._buffers.items()):
+                if metric_name not in self._retention:
+                    del self._buffers[(metric_name, fingerprint)]
+                else:
+                    buffer.retention = self._retention[metric_name]
+
+    def wants(self, metric_name: str) -> bool:
+        return metric_name in self._retention
+
+    def record(
+        self, samples: Iterable[Tuple[str, str, float]], timestamp: Optional[float] = None
+    ) -> int:
+        """记录一批 (指标, 序列指纹, 值) 样本
+
+        Returns:
+            实际记录的样本数
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        recorded = 0
+        with self._lock:
+            retention = self._retention
+            if not retention:
+                return 0
+            for metric_name, fingerprint, value in samples:
+                metric_retention = retention.get(metric_name)
+                if metric_retention is None:
+                    continue
+                key = (metric_name, fingerprint)
+                buffer = self._buffers.get(key)
+                if buffer is None:
+                    buffer = self._buffers[key] = SeriesBuffer(metric_retention, self.max_points)
+                buffer.append(timestamp, float(value))
+                recorded += 1
+
+            if time.monotonic() - self._pruned_at >= self.prune_interval:
+                self._prune(timestamp)
+        return recorded
+
+    def _prune(self, now: float) -> None:
+        stale = [
+            key for key, buffer in self._buffers.items()
+            if buffer.last_timestamp is None or now - buffer.last_timestamp > buffer.retention
+        ]
+        for key in stale:
+            del self._buffers[key]
+        self._pruned_at = time.monotonic()
+        if stale:
+            logger.debug(f"Pruned {len(stale)} idle series windows")
+
+    def query(
+        self, metric_name: str, fingerprint: str, spec: WindowSpec, now: Optional[float] = None
+    ) -> Optional[float]:
+        """计算序列在窗口内的函数值，样本不足时返回 None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            buffer = self._buffers.get((metric_name, fingerprint))
+            if buffer is None:
+                return None
+            return buffer.query(spec, now)
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+
+# 进程级序列窗口，由所有 AlertEngine 实例共享
+window_samples = WindowStore(max_points=settings.ALERT_WINDOW_MAX_POINTS)
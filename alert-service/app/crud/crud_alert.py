@@ -1,16 +1,21 @@
+from sqlalchemy import delete, func, insert, literal_column, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Set, Tuple
 from datetime import datetime
+from app.db.partitioning import is_partitioned
 from app.models.alert import (
     AlertRule, AlertRuleStatus, AlertRuleType, AlertSeverity,
-    Alert, AlertStatus, AlertGroup, AlertAction,
-    NotificationChannel, NotificationChannelType, AlertSilence
+    Alert, AlertStatus, AlertGroup, AlertGroupRule, AlertAction, AlertRuleNotificationChannel,
+    NotificationChannel, NotificationChannelType, AlertSilence, InhibitionRule,
+    MaintenanceWindow
 )
 from app.schemas.alert import (
     AlertRuleCreate, AlertRuleUpdate, AlertCreate, AlertUpdate,
     AlertGroupCreate, AlertGroupUpdate, AlertActionCreate,
     AlertActionUpdate, NotificationChannelCreate, NotificationChannelUpdate,
-    AlertSilenceCreate
+    AlertSilenceCreate, InhibitionRuleCreate, InhibitionRuleUpdate,
+    MaintenanceWindowCreate, MaintenanceWindowUpdate
 )
 
 
@@ -41,6 +46,21 @@ def get_alert_rules(
     return query.order_by(AlertRule.created_at.desc()).offset(skip).limit(limit).all()
 
 
+def iter_alert_rules(
+    db: Session,
+    rule_type: Optional[AlertRuleType] = None,
+    status: Optional[AlertRuleStatus] = None,
+    batch_size: int = 500
+) -> Iterator[AlertRule]:
+    """按主键顺序流式遍历全部匹配的告警规则（服务端游标，分批读取）"""
+    query = db.query(AlertRule)
+    if rule_type:
+        query = query.filter(AlertRule.rule_type == rule_type)
+    if status:
+        query = query.filter(AlertRule.status == status)
+    return iter(query.order_by(AlertRule.id).yield_per(batch_size))
+
+
 def create_alert_rule(db: Session, alert_rule: AlertRuleCreate) -> AlertRule:
     db_alert_rule = AlertRule(**alert_rule.dict())
     db.add(db_alert_rule)
@@ -121,6 +141,13 @@ def get_alerts(
     return query.order_by(Alert.firing_at.desc()).offset(skip).limit(limit).all()
 
 
+def get_firing_alert_ids(db: Session) -> List[Tuple[int, int, Optional[str]]]:
+    """一次查询返回全部触发中告警的 (alert_rule_id, alert_id, fingerprint)，按规则分组排列"""
+    return db.query(Alert.alert_rule_id, Alert.id, Alert.fingerprint).filter(
+        Alert.status == AlertStatus.FIRING
+    ).order_by(Alert.alert_rule_id, Alert.id).all()
+
+
 def create_alert(db: Session, alert: AlertCreate) -> Alert:
     db_alert = Alert(**alert.dict())
     db.add(db_alert)
@@ -164,6 +191,236 @@ def resolve_alert(
     return db_alert
 
 
+def _alert_upsert(db: Session):
+    """按指纹幂等写入触发中告警的 INSERT ... ON CONFLICT DO UPDATE 语句
+    
+    冲突时只刷新 last_seen_at 与 updated_at；数据库不支持 ON CONFLICT 时退化为
+    普通 INSERT。分区表不使用该语句，见 _write_partitioned_alerts。
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Alert)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Alert)
+    else:
+        return insert(Alert)
+    return stmt.on_conflict_do_update(
+        index_elements=[Alert.fingerprint],
+        # 与 uq_alerts_firing_fingerprint 的谓词一致；写成不含绑定参数的文本，
+        # 否则 SQLite 把枚举值渲染为 literal_execute 参数，无法用于 executemany
+        index_where=text("status = 'FIRING'"),
+        set_={"last_seen_at": func.now(), "updated_at": func.now()}
+    )
+
+
+def _touch_firing_alerts(
+    db: Session, fingerprints: List[str]
+) -> List[Tuple[int, int, Optional[str], bool]]:
+    """刷新指定指纹的触发中告警的 last_seen_at，返回的告警均为已存在"""
+    if not fingerprints:
+        return []
+    result = db.execute(
+        update(Alert)
+        .where(Alert.fingerprint.in_(fingerprints), Alert.status == AlertStatus.FIRING)
+        .values(last_seen_at=func.now(), updated_at=func.now())
+        .returning(Alert.id, Alert.alert_rule_id, Alert.fingerprint)
+        .execution_options(synchronize_session=False)
+    )
+    return [(row.id, row.alert_rule_id, row.fingerprint, False) for row in result]
+
+
+def _write_partitioned_alerts(
+    db: Session, alerts: List[Dict[str, Any]]
+) -> List[Tuple[int, int, Optional[str], bool]]:
+    """在分区表上按指纹幂等写入触发中告警
+    
+    分区表的指纹唯一索引只存在于各分区上，跨月的同一指纹不会冲突，无法依赖
+    ON CONFLICT。这里先按指纹取事务级咨询锁（按指纹排序加锁，避免副本间死锁），
+    再刷新已存在的触发中告警，只插入仍不存在的指纹；锁在提交时释放。
+    """
+    fingerprints = sorted({alert["fingerprint"] for alert in alerts if alert.get("fingerprint")})
+    if fingerprints:
+        db.execute(
+            text(
+                "SELECT count(pg_advisory_xact_lock(hashtext(fp))) "
+                "FROM unnest(CAST(:fingerprints AS text[])) AS fp"
+            ),
+            {"fingerprints": fingerprints}
+        )
+    written = _touch_firing_alerts(db, fingerprints)
+    existing = {row[2] for row in written}
+    missing = [alert for alert in alerts if alert.get("fingerprint") not in existing]
+    if missing:
+        result = db.execute(
+            insert(Alert).returning(Alert.id, Alert.alert_rule_id, Alert.fingerprint),
+            missing
+        )
+        written.extend((row.id, row.alert_rule_id, row.fingerprint, True) for row in result)
+    return written
+
+
+def _get_firing_fingerprints(db: Session, fingerprints: List[str]) -> Set[str]:
+    """返回给定指纹中已有触发中告警的指纹"""
+    if not fingerprints:
+        return set()
+    return set(db.scalars(
+        select(Alert.fingerprint).where(
+            Alert.fingerprint.in_(fingerprints), Alert.status == AlertStatus.FIRING
+        )
+    ))
+
+
+def _upsert_firing_alerts(
+    db: Session, alerts: List[Dict[str, Any]]
+) -> List[Tuple[int, int, Optional[str], bool]]:
+    """在普通表上按指纹幂等写入触发中告警，并区分新建与已存在的告警
+    
+    PostgreSQL 上由 RETURNING (xmax = 0) 判断：本次 INSERT 产生的行版本 xmax 为 0，
+    ON CONFLICT DO UPDATE 更新的行不为 0。其他数据库没有可靠的行级信号，
+    写入前先查出已有触发中告警的指纹。
+    """
+    columns = [Alert.id, Alert.alert_rule_id, Alert.fingerprint]
+    if db.get_bind().dialect.name == "postgresql":
+        result = db.execute(
+            _alert_upsert(db).returning(*columns, literal_column("xmax = 0").label("inserted")),
+            alerts
+        )
+        return [
+            (row.id, row.alert_rule_id, row.fingerprint, bool(row.inserted)) for row in result
+        ]
+    
+    existing = _get_firing_fingerprints(
+        db, [alert["fingerprint"] for alert in alerts if alert.get("fingerprint")]
+    )
+    result = db.execute(_alert_upsert(db).returning(*columns), alerts)
+    return [
+        (row.id, row.alert_rule_id, row.fingerprint, row.fingerprint not in existing)
+        for row in result
+    ]
+
+
+def upsert_alert(db: Session, alert: Dict[str, Any]) -> Tuple[Alert, bool]:
+    """按指纹创建触发中告警，已存在时刷新其 last_seen_at 并返回已有告警
+    
+    Returns:
+        (告警, 是否为本次新建)
+    """
+    try:
+        if is_partitioned(db, Alert.__tablename__):
+            written = _write_partitioned_alerts(db, [alert])
+        else:
+            written = _upsert_firing_alerts(db, [alert])
+        alert_id, _, _, inserted = written[0]
+        db_alert = db.query(Alert).filter(Alert.id == alert_id).populate_existing().one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db_alert, inserted
+
+
+def bulk_write_alerts(
+    db: Session,
+    new_alerts: List[Dict[str, Any]],
+    resolved_alert_ids: List[int],
+    resolved_by: Optional[str] = None
+) -> List[Tuple[int, int, Optional[str], bool]]:
+    """在同一事务中批量创建与解决告警
+    
+    新告警使用一次按指纹幂等的 INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+    写入，解决的告警使用一次按ID的 UPDATE 完成，最后只提交一次。
+    
+    Returns:
+        写入告警的 (alert_id, alert_rule_id, fingerprint, 是否为本次新建) 列表；
+        指纹已有触发中告警（例如由其他副本创建）时该告警标记为非新建
+    """
+    created: List[Tuple[int, int, Optional[str], bool]] = []
+    try:
+        if new_alerts:
+            # 同一语句内的重复指纹会导致 ON CONFLICT 冲突两次，先去重
+            unique_alerts = list({
+                alert.get("fingerprint") or id(alert): alert for alert in new_alerts
+            }.values())
+            if is_partitioned(db, Alert.__tablename__):
+                created = _write_partitioned_alerts(db, unique_alerts)
+            else:
+                created = _upsert_firing_alerts(db, unique_alerts)
+        
+        if resolved_alert_ids:
+            values = {
+                "status": AlertStatus.RESOLVED,
+                "resolved_at": datetime.utcnow()
+            }
+            if resolved_by:
+                values["acknowledged_by"] = resolved_by
+            db.execute(
+                update(Alert)
+                .where(Alert.id.in_(resolved_alert_ids), Alert.status == AlertStatus.FIRING)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return created
+
+
+def get_oldest_firing_time(db: Session) -> Optional[datetime]:
+    """最早一条触发中告警的 firing_at"""
+    return db.query(func.min(Alert.firing_at)).filter(
+        Alert.status == AlertStatus.FIRING
+    ).scalar()
+
+
+def has_firing_alerts_between(db: Session, start: datetime, end: datetime) -> bool:
+    """[start, end) 内是否存在触发中告警（分区表上只扫描对应分区）"""
+    return db.query(Alert.id).filter(
+        Alert.firing_at >= start,
+        Alert.firing_at < end,
+        Alert.status == AlertStatus.FIRING
+    ).first() is not None
+
+
+def delete_alerts_before(db: Session, cutoff: datetime, batch_size: int = 5000) -> int:
+    """分批删除 firing_at 早于 cutoff 的非触发告警及其处理记录
+    
+    每批用一条按ID排序并 LIMIT 的子查询在数据库端删除，并单独提交，
+    不把告警加载到会话中，也不会产生长事务。
+    
+    Returns:
+        删除的告警数量
+    """
+    deleted = 0
+    while True:
+        chunk = (
+            select(Alert.id)
+            .where(Alert.firing_at < cutoff, Alert.status != AlertStatus.FIRING)
+            .order_by(Alert.id)
+            .limit(batch_size)
+        )
+        try:
+            db.execute(
+                delete(AlertAction)
+                .where(AlertAction.alert_id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+            result = db.execute(
+                delete(Alert)
+                .where(Alert.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
 def count_alerts(
     db: Session,
     status: Optional[AlertStatus] = None,
@@ -245,6 +502,20 @@ def delete_alert_group(db: Session, alert_group_id: int) -> Optional[AlertGroup]
     return db_alert_group
 
 
+def get_rule_alert_group(db: Session, alert_rule_id: int) -> Optional[AlertGroup]:
+    """规则所属的告警分组（属于多个分组时取ID最小的），不属于任何分组时返回默认分组"""
+    alert_group = (
+        db.query(AlertGroup)
+        .join(AlertGroupRule, AlertGroupRule.alert_group_id == AlertGroup.id)
+        .filter(AlertGroupRule.alert_rule_id == alert_rule_id)
+        .order_by(AlertGroup.id)
+        .first()
+    )
+    if alert_group is None:
+        alert_group = db.query(AlertGroup).filter(AlertGroup.is_default == True).first()
+    return alert_group
+
+
 def count_alert_groups(
     db: Session,
     is_default: Optional[bool] = None
@@ -332,6 +603,34 @@ def count_notification_channels(
     return query.count()
 
 
+def get_rule_notification_channels(
+    db: Session, alert_rule_ids: List[int]
+) -> Dict[int, List[NotificationChannel]]:
+    """一次查询多条规则已启用的通知渠道
+    
+    Returns:
+        {规则ID: 通知渠道列表}，没有渠道的规则映射为空列表
+    """
+    channels: Dict[int, List[NotificationChannel]] = {
+        alert_rule_id: [] for alert_rule_id in alert_rule_ids
+    }
+    if not alert_rule_ids:
+        return channels
+    rows = db.execute(
+        select(AlertRuleNotificationChannel.alert_rule_id, NotificationChannel)
+        .select_from(AlertRuleNotificationChannel)
+        .join(NotificationChannel, NotificationChannel.id == AlertRuleNotificationChannel.channel_id)
+        .where(
+            AlertRuleNotificationChannel.alert_rule_id.in_(alert_rule_ids),
+            AlertRuleNotificationChannel.is_enabled.is_(True),
+            NotificationChannel.is_enabled.is_(True)
+        )
+    )
+    for alert_rule_id, channel in rows.tuples():
+        channels[alert_rule_id].append(channel)
+    return channels
+
+
 # Alert Action CRUD
 def get_alert_action(db: Session, action_id: int) -> Optional[AlertAction]:
     return db.query(AlertAction).filter(AlertAction.id == action_id).first()
@@ -397,6 +696,33 @@ def count_alert_actions(
     return query.count()
 
 
+def bulk_create_alert_actions(db: Session, actions: List[Dict[str, Any]]) -> int:
+    """用一条多行 INSERT 写入一批告警处理记录
+    
+    Returns:
+        写入的记录数
+    """
+    if not actions:
+        return 0
+    try:
+        db.execute(insert(AlertAction), actions)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(actions)
+
+
+def iter_firing_alert_labels(
+    db: Session, batch_size: int = 1000
+) -> Iterator[Tuple[int, int, AlertSeverity, Optional[Dict[str, Any]], Optional[str]]]:
+    """流式遍历触发中告警的 (id, alert_rule_id, severity, labels, fingerprint)"""
+    query = db.query(
+        Alert.id, Alert.alert_rule_id, Alert.severity, Alert.labels, Alert.fingerprint
+    ).filter(Alert.status == AlertStatus.FIRING)
+    return iter(query.yield_per(batch_size))
+
+
 # Alert Silence CRUD
 def get_alert_silence(db: Session, silence_id: int) -> Optional[AlertSilence]:
     return db.query(AlertSilence).filter(AlertSilence.id == silence_id).first()
@@ -420,6 +746,17 @@ def get_active_alert_silences(
     return query.order_by(AlertSilence.ends_at.desc()).offset(skip).limit(limit).all()
 
 
+def iter_active_alert_silences(
+    db: Session, batch_size: int = 500
+) -> Iterator[AlertSilence]:
+    """流式遍历全部未过期的活动静默"""
+    query = db.query(AlertSilence).filter(
+        AlertSilence.is_active == True,
+        AlertSilence.ends_at > datetime.utcnow()
+    )
+    return iter(query.order_by(AlertSilence.id).yield_per(batch_size))
+
+
 def create_alert_silence(
     db: Session, alert_silence: AlertSilenceCreate
 ) -> AlertSilence:
@@ -457,3 +794,156 @@ def count_active_alert_silences(
     if alert_rule_id:
         query = query.filter(AlertSilence.alert_rule_id == alert_rule_id)
     return query.count()
+
+
+# Inhibition Rule CRUD
+def get_inhibition_rule(db: Session, inhibition_rule_id: int) -> Optional[InhibitionRule]:
+    return db.query(InhibitionRule).filter(InhibitionRule.id == inhibition_rule_id).first()
+
+
+def get_inhibition_rule_by_name(db: Session, name: str) -> Optional[InhibitionRule]:
+    return db.query(InhibitionRule).filter(InhibitionRule.name == name).first()
+
+
+def get_inhibition_rules(
+    db: Session,
+    is_enabled: Optional[bool] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[InhibitionRule]:
+    query = db.query(InhibitionRule)
+    if is_enabled is not None:
+        query = query.filter(InhibitionRule.is_enabled == is_enabled)
+    return query.order_by(InhibitionRule.name).offset(skip).limit(limit).all()
+
+
+def iter_enabled_inhibition_rules(
+    db: Session, batch_size: int = 500
+) -> Iterator[InhibitionRule]:
+    """流式遍历全部启用的抑制规则"""
+    query = db.query(InhibitionRule).filter(InhibitionRule.is_enabled == True)
+    return iter(query.order_by(InhibitionRule.id).yield_per(batch_size))
+
+
+def create_inhibition_rule(
+    db: Session, inhibition_rule: InhibitionRuleCreate
+) -> InhibitionRule:
+    db_rule = InhibitionRule(**inhibition_rule.dict())
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+
+def update_inhibition_rule(
+    db: Session, inhibition_rule_id: int, inhibition_rule: InhibitionRuleUpdate
+) -> Optional[InhibitionRule]:
+    db_rule = get_inhibition_rule(db, inhibition_rule_id)
+    if not db_rule:
+        return None
+    
+    update_data = inhibition_rule.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_rule, key, value)
+    
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+
+def delete_inhibition_rule(
+    db: Session, inhibition_rule_id: int
+) -> Optional[InhibitionRule]:
+    db_rule = get_inhibition_rule(db, inhibition_rule_id)
+    if db_rule:
+        db.delete(db_rule)
+        db.commit()
+    return db_rule
+
+
+def count_inhibition_rules(
+    db: Session,
+    is_enabled: Optional[bool] = None
+) -> int:
+    query = db.query(InhibitionRule)
+    if is_enabled is not None:
+        query = query.filter(InhibitionRule.is_enabled == is_enabled)
+    return query.count()
+
+
+# Maintenance Window CRUD
+def get_maintenance_window(db: Session, maintenance_window_id: int) -> Optional[MaintenanceWindow]:
+    return db.query(MaintenanceWindow).filter(MaintenanceWindow.id == maintenance_window_id).first()
+
+
+def get_maintenance_window_by_name(db: Session, name: str) -> Optional[MaintenanceWindow]:
+    return db.query(MaintenanceWindow).filter(MaintenanceWindow.name == name).first()
+
+
+def get_maintenance_windows(
+    db: Session,
+    is_enabled: Optional[bool] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[MaintenanceWindow]:
+    query = db.query(MaintenanceWindow)
+    if is_enabled is not None:
+        query = query.filter(MaintenanceWindow.is_enabled == is_enabled)
+    return query.order_by(MaintenanceWindow.name).offset(skip).limit(limit).all()
+
+
+def iter_enabled_maintenance_windows(
+    db: Session, batch_size: int = 500
+) -> Iterator[MaintenanceWindow]:
+    """流式遍历全部启用且未结束的维护窗口"""
+    query = db.query(MaintenanceWindow).filter(
+        MaintenanceWindow.is_enabled == True,
+        MaintenanceWindow.ends_at.is_(None) | (MaintenanceWindow.ends_at > datetime.utcnow())
+    )
+    return iter(query.order_by(MaintenanceWindow.id).yield_per(batch_size))
+
+
+def create_maintenance_window(
+    db: Session, maintenance_window: MaintenanceWindowCreate
+) -> MaintenanceWindow:
+    db_window = MaintenanceWindow(**maintenance_window.dict())
+    db.add(db_window)
+    db.commit()
+    db.refresh(db_window)
+    return db_window
+
+
+def update_maintenance_window(
+    db: Session, maintenance_window_id: int, maintenance_window: MaintenanceWindowUpdate
+) -> Optional[MaintenanceWindow]:
+    db_window = get_maintenance_window(db, maintenance_window_id)
+    if not db_window:
+        return None
+    
+    update_data = maintenance_window.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_window, key, value)
+    
+    db.commit()
+    db.refresh(db_window)
+    return db_window
+
+
+def delete_maintenance_window(
+    db: Session, maintenance_window_id: int
+) -> Optional[MaintenanceWindow]:
+    db_window = get_maintenance_window(db, maintenance_window_id)
+    if db_window:
+        db.delete(db_window)
+        db.commit()
+    return db_window
+
+
+def count_maintenance_windows(
+    db: Session,
+    is_enabled: Optional[bool] = None
+) -> int:
+    query = db.query(MaintenanceWindow)
+    if is_enabled is not None:
+        query = query.filter(MaintenanceWindow.is_enabled == is_enabled)
+    return query.count()
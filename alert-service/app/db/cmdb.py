@@ -0,0 +1,32 @@
+from typing import Dict, Iterable, List
+
+from sqlalchemy import column, select, table
+from sqlalchemy.orm import Session
+
+
+# cmdb-service 的配置项表（与告警服务同库），只声明维护窗口需要的列
+cis = table(
+    "cis",
+    column("id"),
+    column("ci_type_id"),
+)
+
+
+def get_ci_ids_by_type(db: Session, ci_type_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """查询各CI类型下的全部CI
+
+    Args:
+        db: 数据库会话
+        ci_type_ids: CI类型ID
+
+    Returns:
+        {CI类型ID: [CI ID]}
+    """
+    type_ids = sorted(set(ci_type_ids))
+    if not type_ids:
+        return {}
+    result: Dict[int, List[int]] = {}
+    rows = db.execute(select(cis.c.id, cis.c.ci_type_id).where(cis.c.ci_type_id.in_(type_ids)))
+    for ci_id, ci_type_id in rows:
+        result.setdefault(ci_type_id, []).append(ci_id)
+    return result
@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import column, create_engine, select, table
+from sqlalchemy.engine import Engine, Row
+
+from app.core.config import settings
+from app.db.session import engine as default_engine
+
+
+# collector-service 的采集指标表，只声明回测需要的列
+collected_metrics = table(
+    "collected_metrics",
+    column("id"),
+    column("ci_id"),
+    column("metric_name"),
+    column("metric_value"),
+    column("labels"),
+    column("timestamp"),
+)
+
+_engine: Optional[Engine] = None
+_lock = threading.Lock()
+
+
+def get_collector_engine() -> Engine:
+    """采集数据库连接（未单独配置时复用告警服务的数据库）"""
+    global _engine
+    if not settings.COLLECTOR_DATABASE_URL:
+        return default_engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_engine(
+                    settings.COLLECTOR_DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_size=2,
+                    max_overflow=2
+                )
+    return _engine
+
+
+def stream_collected_metrics(
+    metric_names: Iterable[str],
+    start_time: datetime,
+    end_time: datetime,
+    batch_size: int = 20000,
+    ci_id: Optional[int] = None
+) -> Iterator[Sequence[Row]]:
+    """按时间顺序分块读取时间范围内的采集指标
+
+    使用服务端游标（stream_results），每次只在内存中保留一块结果。
+    指定 ci_id 时只读取该配置项的样本。
+
+    Yields:
+        (timestamp, ci_id, metric_name, metric_value, labels) 行的分块
+    """
+    names: List[str] = list(metric_names)
+    query = (
+        select(
+            collected_metrics.c.timestamp,
+            collected_metrics.c.ci_id,
+            collected_metrics.c.metric_name,
+            collected_metrics.c.metric_value,
+            collected_metrics.c.labels,
+        )
+        .where(
+            collected_metrics.c.metric_name.in_(names),
+            collected_metrics.c.timestamp >= start_time,
+            collected_metrics.c.timestamp < end_time,
+        )
+        .order_by(collected_metrics.c.timestamp, collected_metrics.c.id)
+    )
+    if ci_id is not None:
+        query = query.where(collected_metrics.c.ci_id == ci_id)
+    with get_collector_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        yield from result.partitions()
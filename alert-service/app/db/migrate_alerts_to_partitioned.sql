@@ -0,0 +1,105 @@
+-- Alert Service Partition Migration Script
+-- Converts existing non-partitioned alerts and alert_actions tables into the monthly
+-- range-partitioned layout of partition_alerts.sql (PostgreSQL 12+).
+--
+-- Run once with psql from this directory while every alert-service replica is stopped:
+--     psql -v ON_ERROR_STOP=1 -f migrate_alerts_to_partitioned.sql
+-- The whole migration runs in one transaction:
+--   1. rename the current tables (and their indexes) to *_legacy
+--   2. create the partitioned tables with partition_alerts.sql
+--   3. create monthly partitions covering the existing rows up to three months ahead
+--   4. add the series columns (fingerprint, last_seen_at) to alerts_legacy if the install predates them
+--   5. copy the rows and advance the id sequences past the copied ids
+-- The *_legacy tables are kept for verification; drop them manually afterwards.
+
+BEGIN;
+
+LOCK TABLE alerts, alert_actions IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE alerts RENAME TO alerts_legacy;
+ALTER TABLE alert_actions RENAME TO alert_actions_legacy;
+
+-- Index names are schema-wide, rename them so partition_alerts.sql can reuse the names
+DO $$
+DECLARE
+    idx record;
+BEGIN
+    FOR idx IN
+        SELECT i.relname AS name
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relname IN ('alerts_legacy', 'alert_actions_legacy') AND pg_table_is_visible(t.oid)
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.name, idx.name || '_legacy');
+    END LOOP;
+END $$;
+
+\ir partition_alerts.sql
+
+-- Rows must land in monthly partitions, not in the default partition: a default partition
+-- holding rows of a month prevents ensure_partitions from creating that month later.
+DO $$
+DECLARE
+    part record;
+    lower_bound date;
+    last_month date;
+    name text;
+BEGIN
+    FOR part IN
+        SELECT * FROM (VALUES ('alerts', 'firing_at'), ('alert_actions', 'executed_at')) AS t(tbl, col)
+    LOOP
+        EXECUTE format(
+            'SELECT date_trunc(''month'', min(%I) AT TIME ZONE ''UTC'')::date FROM %I',
+            part.col, part.tbl || '_legacy'
+        ) INTO lower_bound;
+        last_month := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months')::date;
+        lower_bound := least(coalesce(lower_bound, last_month), last_month);
+
+        WHILE lower_bound <= last_month LOOP
+            name := format('%s_p%s', part.tbl, to_char(lower_bound, 'YYYYMM'));
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                name, part.tbl,
+                lower_bound::text || ' 00:00:00+00',
+                (lower_bound + interval '1 month')::date::text || ' 00:00:00+00'
+            );
+            IF part.tbl = 'alerts' THEN
+                EXECUTE format(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS %I ON %I (fingerprint) WHERE status = ''FIRING''',
+                    'uq_' || name || '_firing_fingerprint', name
+                );
+            END IF;
+            lower_bound := (lower_bound + interval '1 month')::date;
+        END LOOP;
+    END LOOP;
+END $$;
+
+-- Installs older than series-level alerting have no fingerprint / last_seen_at columns
+ALTER TABLE alerts_legacy
+    ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE;
+
+INSERT INTO alerts (
+    id, alert_rule_id, status, severity, title, message, source, source_id, labels, annotations,
+    ci_id, fingerprint, firing_at, last_seen_at, resolved_at, acknowledged_at, acknowledged_by,
+    silenced_until, created_at, updated_at
+)
+SELECT
+    id, alert_rule_id, status, severity, title, message, source, source_id, labels, annotations,
+    ci_id, fingerprint, COALESCE(firing_at, created_at, CURRENT_TIMESTAMP),
+    COALESCE(last_seen_at, firing_at), resolved_at, acknowledged_at, acknowledged_by,
+    silenced_until, created_at, updated_at
+FROM alerts_legacy;
+
+INSERT INTO alert_actions (id, alert_id, action_type, status, action_result, executed_at, executed_by)
+SELECT id, alert_id, action_type, status, action_result, COALESCE(executed_at, CURRENT_TIMESTAMP), executed_by
+FROM alert_actions_legacy;
+
+SELECT setval(pg_get_serial_sequence('alerts', 'id'), COALESCE((SELECT max(id) FROM alerts), 0) + 1, false);
+SELECT setval(pg_get_serial_sequence('alert_actions', 'id'), COALESCE((SELECT max(id) FROM alert_actions), 0) + 1, false);
+
+COMMIT;
+
+-- After verifying the copied rows:
+-- DROP TABLE alert_actions_legacy, alerts_legacy;
@@ -0,0 +1,81 @@
+-- Alert Service Partitioned Tables Script
+-- This script creates alerts and alert_actions as monthly range-partitioned tables (PostgreSQL 12+).
+-- Monthly partitions are named <table>_pYYYYMM and are created ahead of time by the service
+-- (app/db/partitioning.py: ensure_partitions); retention detaches and drops whole partitions.
+--
+-- This script is for fresh installs only: it creates the tables and fails if alerts already
+-- exists. To convert an existing installation use migrate_alerts_to_partitioned.sql, which
+-- renames the current tables, runs this script and copies the rows over. Installs that keep
+-- a plain alerts table only need upgrade_alerts_fingerprint.sql.
+
+-- Create enum types
+DO $$ BEGIN
+    CREATE TYPE alertstatus AS ENUM ('FIRING', 'RESOLVED', 'SILENCED', 'ACKNOWLEDGED');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE alertseverity AS ENUM ('INFO', 'WARNING', 'ERROR', 'CRITICAL');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- Create Alerts table, partitioned by firing_at
+-- The primary key must include the partition key, so other tables cannot reference alerts(id)
+-- with a foreign key; the fingerprint unique index is created per partition. Because a firing
+-- fingerprint could still be inserted into two different partitions, the service serializes
+-- writes per fingerprint with transaction-level advisory locks instead of ON CONFLICT.
+CREATE TABLE alerts (
+    id SERIAL,
+    alert_rule_id INTEGER NOT NULL REFERENCES alert_rules(id),
+    status alertstatus NOT NULL DEFAULT 'FIRING',
+    severity alertseverity NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    message TEXT NOT NULL,
+    source VARCHAR(200) NOT NULL,
+    source_id VARCHAR(100),
+    labels JSON,
+    annotations JSON,
+    ci_id INTEGER REFERENCES cis(id),
+    fingerprint VARCHAR(64),
+    firing_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    resolved_at TIMESTAMP WITH TIME ZONE,
+    acknowledged_at TIMESTAMP WITH TIME ZONE,
+    acknowledged_by VARCHAR(100),
+    silenced_until TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id, firing_at)
+) PARTITION BY RANGE (firing_at);
+
+CREATE INDEX ix_alerts_id ON alerts(id);
+CREATE INDEX ix_alerts_status ON alerts(status);
+CREATE INDEX ix_alerts_severity ON alerts(severity);
+CREATE INDEX ix_alerts_firing_at ON alerts(firing_at);
+CREATE INDEX ix_alerts_resolved_at ON alerts(resolved_at);
+CREATE INDEX ix_alerts_fingerprint ON alerts(fingerprint);
+
+-- Rows outside every monthly partition (e.g. clock skew) land here
+CREATE TABLE alerts_default PARTITION OF alerts DEFAULT;
+CREATE UNIQUE INDEX uq_alerts_default_firing_fingerprint ON alerts_default(fingerprint) WHERE status = 'FIRING';
+
+-- Create Alert Actions table, partitioned by executed_at
+-- Actions are always executed after their alert fired, so their partitions expire together.
+CREATE TABLE alert_actions (
+    id SERIAL,
+    alert_id INTEGER NOT NULL,
+    action_type VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    action_result JSON,
+    executed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    executed_by VARCHAR(100),
+    PRIMARY KEY (id, executed_at)
+) PARTITION BY RANGE (executed_at);
+
+CREATE INDEX ix_alert_actions_id ON alert_actions(id);
+CREATE INDEX ix_alert_actions_alert_id ON alert_actions(alert_id);
+
+CREATE TABLE alert_actions_default PARTITION OF alert_actions DEFAULT;
+
+-- alert_silences.alert_id can no longer reference the partitioned alerts table
+ALTER TABLE IF EXISTS alert_silences DROP CONSTRAINT IF EXISTS alert_silences_alert_id_fkey;
@@ -0,0 +1,149 @@
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+# 按月分区的表及其分区键，分区名为 <表名>_pYYYYMM
+PARTITIONED_TABLES: Dict[str, str] = {
+    "alerts": "firing_at",
+    "alert_actions": "executed_at",
+}
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+_partitioned_lock = threading.Lock()
+_partitioned: Dict[str, bool] = {}
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_start(moment: datetime) -> datetime:
+    """所在月份的第一天零点"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start.year:04d}{start.month:02d}"
+
+
+def partition_bounds(name: str) -> Tuple[datetime, datetime]:
+    """由分区名得到 [起始, 结束) 时间范围"""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        raise ValueError(f"Not a monthly partition name: {name}")
+    start = datetime(int(match.group("year")), int(match.group("month")), 1)
+    return start, _add_months(start, 1)
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    """表是否为 PostgreSQL 声明式分区表，结果按进程缓存"""
+    with _partitioned_lock:
+        cached = _partitioned.get(table)
+    if cached is not None:
+        return cached
+
+    partitioned = False
+    if db.get_bind().dialect.name == "postgresql":
+        partitioned = db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ),
+            {"table": table}
+        ).first() is not None
+
+    with _partitioned_lock:
+        _partitioned[table] = partitioned
+    return partitioned
+
+
+def list_partitions(db: Session, table: str) -> List[Tuple[str, datetime, datetime]]:
+    """列出表的按月分区 (分区名, 起始, 结束)，按时间升序；默认分区不在其中"""
+    rows = db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+        ),
+        {"table": table}
+    ).scalars()
+
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions.append((name, *partition_bounds(name)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(db: Session, months_ahead: int = 3, now: datetime = None) -> List[str]:
+    """为分区表预建当前月及之后 months_ahead 个月的分区
+
+    新分区必须在数据写入默认分区之前建好，否则默认分区中的同范围数据
+    会阻止分区创建。alerts 的每个分区各自带一个触发中告警的指纹唯一索引。
+
+    Returns:
+        新建的分区名列表
+    """
+    start = month_start(now or datetime.utcnow())
+    created: List[str] = []
+    try:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(db, table):
+                continue
+            existing = {name for name, _, _ in list_partitions(db, table)}
+            for offset in range(months_ahead + 1):
+                lower = _add_months(start, offset)
+                name = partition_name(table, lower)
+                if name in existing:
+                    continue
+                db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{lower.isoformat()}+00') "
+                    f"TO ('{_add_months(lower, 1).isoformat()}+00')"
+                ))
+                if table == "alerts":
+                    db.execute(text(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{name}_firing_fingerprint "
+                        f"ON {name} (fingerprint) WHERE status = 'FIRING'"
+                    ))
+                created.append(name)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def drop_partition(db: Session, table: str, name: str) -> int:
+    """分离并删除一个分区
+
+    Returns:
+        分区中被删除的行数
+    """
+    try:
+        row_count = db.execute(text(f"SELECT count(*) FROM {name}")).scalar_one()
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Dropped partition {name} of {table} with {row_count} rows")
+    return row_count
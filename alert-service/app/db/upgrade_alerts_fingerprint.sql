@@ -0,0 +1,23 @@
+-- Alert Service Fingerprint Upgrade Script
+-- Adds the columns and the partial unique index used for fingerprint-based alert deduplication
+-- (INSERT ... ON CONFLICT (fingerprint) WHERE status = 'FIRING') to an existing, non-partitioned
+-- alerts table (PostgreSQL 9.6+). The script is idempotent and can be re-run safely.
+--
+-- Run it before starting an upgraded alert-service; without the unique index every upsert fails
+-- with "there is no unique or exclusion constraint matching the ON CONFLICT specification".
+-- Partitioned installs get these columns from partition_alerts.sql instead.
+
+ALTER TABLE alerts
+    ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- Same name and predicate as Alert.__table_args__; NULL fingerprints (alerts created before the
+-- upgrade) never conflict with each other
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alerts_firing_fingerprint
+    ON alerts (fingerprint) WHERE status = 'FIRING';
+
+-- Firing alerts created before the upgrade have no fingerprint, so the engine cannot match them
+-- to their series and neither re-uses nor resolves them. Resolve them once after the upgrade if
+-- the engine should take over (it re-creates fingerprinted alerts for series still breaching):
+-- UPDATE alerts SET status = 'RESOLVED', resolved_at = CURRENT_TIMESTAMP
+--     WHERE status = 'FIRING' AND fingerprint IS NULL;
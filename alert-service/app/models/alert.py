@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Enum, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Enum, Float, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
@@ -19,6 +19,11 @@ class AlertStatus(enum.Enum):
     ACKNOWLEDGED = "acknowledged"
 
 
+class MaintenanceScheduleType(enum.Enum):
+    CRON = "cron"
+    RRULE = "rrule"
+
+
 class AlertRuleStatus(enum.Enum):
     ACTIVE = "active"
     INACTIVE = "inactive"
@@ -30,6 +35,7 @@ class AlertRuleType(enum.Enum):
     LOG = "log"
     TRACE = "trace"
     CUSTOM = "custom"
+    ANOMALY = "anomaly"
 
 
 class NotificationChannelType(enum.Enum):
@@ -82,7 +88,9 @@ class Alert(Base):
     labels = Column(JSON, nullable=True)
     annotations = Column(JSON, nullable=True)
     ci_id = Column(Integer, ForeignKey("cis.id"), nullable=True)
+    fingerprint = Column(String(64), nullable=True)  # 规则ID + 归一化标签的指纹
     firing_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now())  # 最近一次确认触发的时间
     resolved_at = Column(DateTime(timezone=True), nullable=True, index=True)
     acknowledged_at = Column(DateTime(timezone=True), nullable=True)
     acknowledged_by = Column(String(100), nullable=True)
@@ -90,6 +98,15 @@ class Alert(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # 同一指纹最多只有一条触发中的告警，多副本并发写入时由数据库保证幂等
+    __table_args__ = (
+        Index(
+            "uq_alerts_firing_fingerprint", "fingerprint", unique=True,
+            postgresql_where=text("status = 'FIRING'"),
+            sqlite_where=text("status = 'FIRING'")
+        ),
+    )
+    
     # Relationships
     rule = relationship("AlertRule", back_populates="alerts")
     alert_actions = relationship("AlertAction", back_populates="alert", cascade="all, delete-orphan")
@@ -102,6 +119,10 @@ class AlertGroup(Base):
     name = Column(String(200), nullable=False, unique=True)
     description = Column(Text, nullable=True)
     is_default = Column(Boolean, default=False)
+    # 通知合并策略，为空时使用全局默认值
+    group_by = Column(JSON, nullable=True)  # 分组标签，"alertname" 表示告警规则
+    group_wait = Column(Integer, nullable=True)  # 新分组首次发送前的等待时间（秒）
+    group_interval = Column(Integer, nullable=True)  # 同一分组两次发送的最小间隔（秒）
     created_by = Column(String(100), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -169,8 +190,45 @@ class AlertSilence(Base):
     alert_id = Column(Integer, ForeignKey("alerts.id"), nullable=True)
     alert_rule_id = Column(Integer, ForeignKey("alert_rules.id"), nullable=True)
     silence_reason = Column(Text, nullable=False)
+    matchers = Column(JSON, nullable=True)  # 标签匹配条件 [{"name", "op", "value"}]，op 为 = != =~ !~
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     ends_at = Column(DateTime(timezone=True), nullable=False)
     is_active = Column(Boolean, default=True)
     created_by = Column(String(100), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class InhibitionRule(Base):
+    __tablename__ = "alert_inhibition_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False, unique=True)
+    description = Column(Text, nullable=True)
+    source_matchers = Column(JSON, nullable=False)  # 源告警需全部匹配的 {标签: 值}
+    target_matchers = Column(JSON, nullable=False)  # 被抑制告警需全部匹配的 {标签: 值}
+    equal = Column(JSON, nullable=True)  # 源告警与被抑制告警取值必须相同的标签
+    is_enabled = Column(Boolean, default=True)
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class MaintenanceWindow(Base):
+    __tablename__ = "alert_maintenance_windows"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False, unique=True)
+    description = Column(Text, nullable=True)
+    schedule_type = Column(Enum(MaintenanceScheduleType), nullable=False)
+    schedule = Column(Text, nullable=False)  # cron 表达式或 RFC 5545 RRULE
+    duration = Column(Integer, nullable=False)  # 每次维护持续时间（秒）
+    timezone = Column(String(64), nullable=False, default="UTC")  # 周期规则所在时区
+    starts_at = Column(DateTime(timezone=True), nullable=True)  # 生效开始时间，RRULE 的 DTSTART
+    ends_at = Column(DateTime(timezone=True), nullable=True)  # 生效结束时间
+    ci_ids = Column(JSON, nullable=True)  # 作用的CI ID列表
+    ci_type_ids = Column(JSON, nullable=True)  # 作用的CI类型ID列表
+    matchers = Column(JSON, nullable=True)  # 标签匹配条件，格式同静默
+    is_enabled = Column(Boolean, default=True)
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -29,6 +29,7 @@ class AlertRuleType(str, Enum):
     LOG = "log"
     TRACE = "trace"
     CUSTOM = "custom"
+    ANOMALY = "anomaly"
 
 
 class NotificationChannelType(str, Enum):
@@ -42,6 +43,18 @@ class NotificationChannelType(str, Enum):
     SYSLOG = "syslog"
 
 
+class MaintenanceScheduleType(str, Enum):
+    CRON = "cron"
+    RRULE = "rrule"
+
+
+class SilenceMatchOperator(str, Enum):
+    EQUAL = "="
+    NOT_EQUAL = "!="
+    REGEX = "=~"
+    NOT_REGEX = "!~"
+
+
 # Alert Rule schemas
 class AlertRuleBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=200, description="告警规则名称")
@@ -64,6 +77,7 @@ class AlertRuleCreate(AlertRuleBase):
 class AlertRuleUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200, description="告警规则名称")
     description: Optional[str] = Field(None, description="告警规则描述")
+    rule_type: Optional[AlertRuleType] = Field(None, description="告警规则类型")
     status: Optional[AlertRuleStatus] = Field(None, description="告警规则状态")
     severity: Optional[AlertSeverity] = Field(None, description="告警级别")
     condition: Optional[Dict[str, Any]] = Field(None, description="告警条件配置")
@@ -113,7 +127,9 @@ class Alert(AlertBase):
     id: int
     status: AlertStatus
     severity: AlertSeverity
+    fingerprint: Optional[str] = None
     firing_at: datetime
+    last_seen_at: Optional[datetime] = None
     resolved_at: Optional[datetime]
     acknowledged_at: Optional[datetime]
     acknowledged_by: Optional[str]
@@ -137,6 +153,9 @@ class AlertGroupBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=200, description="告警分组名称")
     description: Optional[str] = Field(None, description="告警分组描述")
     is_default: Optional[bool] = Field(False, description="是否为默认分组")
+    group_by: Optional[List[str]] = Field(None, description="通知分组标签，alertname 表示告警规则")
+    group_wait: Optional[int] = Field(None, ge=0, description="新分组首次发送前的等待时间（秒）")
+    group_interval: Optional[int] = Field(None, ge=0, description="同一分组两次发送的最小间隔（秒）")
 
 
 class AlertGroupCreate(AlertGroupBase):
@@ -147,6 +166,9 @@ class AlertGroupUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200, description="告警分组名称")
     description: Optional[str] = Field(None, description="告警分组描述")
     is_default: Optional[bool] = Field(None, description="是否为默认分组")
+    group_by: Optional[List[str]] = Field(None, description="通知分组标签，alertname 表示告警规则")
+    group_wait: Optional[int] = Field(None, ge=0, description="新分组首次发送前的等待时间（秒）")
+    group_interval: Optional[int] = Field(None, ge=0, description="同一分组两次发送的最小间隔（秒）")
 
 
 class AlertGroup(AlertGroupBase):
@@ -223,9 +245,16 @@ class AlertAction(AlertActionBase):
 
 
 # Alert Silence schemas
+class SilenceMatcher(BaseModel):
+    name: str = Field(..., min_length=1, description="标签名（alertname 为规则名，severity 为告警级别）")
+    op: SilenceMatchOperator = Field(default=SilenceMatchOperator.EQUAL, description="匹配运算符")
+    value: str = Field(..., description="标签值，=~ 与 !~ 时为需完整匹配的正则表达式")
+
+
 class AlertSilenceBase(BaseModel):
     alert_id: Optional[int] = Field(None, description="告警ID")
     alert_rule_id: Optional[int] = Field(None, description="告警规则ID")
+    matchers: Optional[List[SilenceMatcher]] = Field(None, description="标签匹配条件，需全部满足")
     silence_reason: str = Field(..., description="静默原因")
     ends_at: datetime = Field(..., description="静默结束时间")
 
@@ -244,6 +273,119 @@ class AlertSilence(AlertSilenceBase):
         from_attributes = True
 
 
+# Maintenance Window schemas
+class MaintenanceWindowBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200, description="维护窗口名称")
+    description: Optional[str] = Field(None, description="维护窗口描述")
+    schedule_type: MaintenanceScheduleType = Field(..., description="周期规则类型")
+    schedule: str = Field(..., min_length=1, description="cron 表达式或 RRULE")
+    duration: int = Field(..., gt=0, description="每次维护持续时间（秒）")
+    timezone: str = Field(default="UTC", description="周期规则所在时区")
+    starts_at: Optional[datetime] = Field(None, description="生效开始时间（RRULE 的 DTSTART）")
+    ends_at: Optional[datetime] = Field(None, description="生效结束时间")
+    ci_ids: Optional[List[int]] = Field(None, description="作用的CI ID列表")
+    ci_type_ids: Optional[List[int]] = Field(None, description="作用的CI类型ID列表")
+    matchers: Optional[List[SilenceMatcher]] = Field(None, description="标签匹配条件，需全部满足")
+    is_enabled: Optional[bool] = Field(True, description="是否启用")
+
+
+class MaintenanceWindowCreate(MaintenanceWindowBase):
+    pass
+
+
+class MaintenanceWindowUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=200, description="维护窗口名称")
+    description: Optional[str] = Field(None, description="维护窗口描述")
+    schedule_type: Optional[MaintenanceScheduleType] = Field(None, description="周期规则类型")
+    schedule: Optional[str] = Field(None, min_length=1, description="cron 表达式或 RRULE")
+    duration: Optional[int] = Field(None, gt=0, description="每次维护持续时间（秒）")
+    timezone: Optional[str] = Field(None, description="周期规则所在时区")
+    starts_at: Optional[datetime] = Field(None, description="生效开始时间（RRULE 的 DTSTART）")
+    ends_at: Optional[datetime] = Field(None, description="生效结束时间")
+    ci_ids: Optional[List[int]] = Field(None, description="作用的CI ID列表")
+    ci_type_ids: Optional[List[int]] = Field(None, description="作用的CI类型ID列表")
+    matchers: Optional[List[SilenceMatcher]] = Field(None, description="标签匹配条件，需全部满足")
+    is_enabled: Optional[bool] = Field(None, description="是否启用")
+
+
+class MaintenanceWindow(MaintenanceWindowBase):
+    id: int
+    created_by: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+# Inhibition Rule schemas
+class InhibitionRuleBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200, description="抑制规则名称")
+    description: Optional[str] = Field(None, description="抑制规则描述")
+    source_matchers: Dict[str, str] = Field(..., min_length=1, description="源告警需全部匹配的标签")
+    target_matchers: Dict[str, str] = Field(..., min_length=1, description="被抑制告警需全部匹配的标签")
+    equal: List[str] = Field([], description="源告警与被抑制告警取值必须相同的标签")
+    is_enabled: Optional[bool] = Field(True, description="是否启用")
+
+
+class InhibitionRuleCreate(InhibitionRuleBase):
+    pass
+
+
+class InhibitionRuleUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=200, description="抑制规则名称")
+    description: Optional[str] = Field(None, description="抑制规则描述")
+    source_matchers: Optional[Dict[str, str]] = Field(None, min_length=1, description="源告警需全部匹配的标签")
+    target_matchers: Optional[Dict[str, str]] = Field(None, min_length=1, description="被抑制告警需全部匹配的标签")
+    equal: Optional[List[str]] = Field(None, description="源告警与被抑制告警取值必须相同的标签")
+    is_enabled: Optional[bool] = Field(None, description="是否启用")
+
+
+class InhibitionRule(InhibitionRuleBase):
+    id: int
+    created_by: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+# Fleet sample schemas
+class FleetSamples(BaseModel):
+    ci_ids: List[int] = Field(..., description="CI ID 列表，与 values 的行对应")
+    metric_names: List[str] = Field(..., description="指标名列表，与 values 的列对应")
+    values: List[List[Optional[float]]] = Field(..., description="样本矩阵，缺失值为 null")
+    labels: Optional[List[Optional[Dict[str, Any]]]] = Field(
+        None, description="各行的序列标签，与 values 的行对应"
+    )
+
+
+# Backtest schemas
+class RuleBacktestRequest(BaseModel):
+    rule: AlertRuleCreate = Field(..., description="待回测的告警规则草稿")
+    start_time: datetime = Field(..., description="回测开始时间")
+    end_time: datetime = Field(..., description="回测结束时间")
+    max_events: int = Field(default=1000, ge=0, le=100000, description="返回的事件数上限")
+
+
+class RuleBacktestEvent(BaseModel):
+    event: str = Field(..., description="事件类型（fire/resolve）")
+    timestamp: datetime = Field(..., description="事件时间")
+    labels: Optional[Dict[str, Any]] = Field(None, description="序列标签")
+
+
+class RuleBacktestResult(BaseModel):
+    samples: int = Field(..., description="回放的样本数")
+    series: int = Field(..., description="匹配的序列数")
+    fire_count: int = Field(..., description="触发次数")
+    resolve_count: int = Field(..., description="恢复次数")
+    firing_at_end: int = Field(..., description="回测结束时仍在触发的序列数")
+    events: List[RuleBacktestEvent] = Field(default_factory=list, description="触发与恢复事件")
+    truncated: bool = Field(default=False, description="事件是否超过上限被截断")
+    elapsed_ms: float = Field(..., description="回测耗时（毫秒）")
+
+
 # Response schemas
 class AlertRuleListResponse(BaseModel):
     total: int
@@ -268,3 +410,13 @@ class NotificationChannelListResponse(BaseModel):
 class AlertActionListResponse(BaseModel):
     total: int
     items: List[AlertAction]
+
+
+class InhibitionRuleListResponse(BaseModel):
+    total: int
+    items: List[InhibitionRule]
+
+
+class MaintenanceWindowListResponse(BaseModel):
+    total: int
+    items: List[MaintenanceWindow]
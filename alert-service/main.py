@@ -1,12 +1,21 @@
+import logging
+
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import Dict
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.core.eval_pool import evaluation_pool
+from app.core.notifier import notification_dispatcher
+from app.core.rule_sync import rule_changes
+from app.core.scheduler import start_scheduler, stop_scheduler
+from app.db.partitioning import ensure_partitions
+from app.db.session import SessionLocal, get_db
 from app.api.v1.endpoints import alert
 
+logger = logging.getLogger(__name__)
+
 # 创建FastAPI应用
 app = FastAPI(
     title="OneMonitor Alert Service",
@@ -34,6 +43,37 @@ app.include_router(
 )
 
 
+# 规则调度器
+@app.on_event("startup")
+def on_startup():
+    # 分区表需要在数据写入前建好后续月份的分区
+    db = SessionLocal()
+    try:
+        ensure_partitions(db, settings.ALERT_PARTITION_PREMAKE_MONTHS)
+    except Exception as e:
+        logger.error(f"Failed to create alert partitions: {e}")
+    finally:
+        db.close()
+    
+    # 订阅其他副本的规则变更
+    rule_changes.start()
+    
+    if settings.ALERT_NOTIFY_ENABLED:
+        notification_dispatcher.start()
+    
+    if settings.ALERT_SCHEDULER_ENABLED:
+        start_scheduler()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_scheduler()
+    rule_changes.stop()
+    evaluation_pool.shutdown()
+    # 调度器停止后不再有新告警，投递完剩余通知
+    notification_dispatcher.stop()
+
+
 # 健康检查端点
 @app.get("/health", response_model=Dict[str, str])
 def health_check(db: Session = Depends(get_db)):
@@ -0,0 +1,131 @@
+import os
+import sys
+
+# 测试使用本地 SQLite 与不可达的 Redis（Redis 失败在服务中按降级处理）
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/alert-service-test.db")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import Column, Integer, Table, create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.alert_state import firing_alerts
+from app.core.expression import rate_states
+from app.core.notifier import notification_dispatcher
+from app.core.pending_state import pending_states
+from app.core.rule_index import rule_index
+from app.core.sample_store import latest_samples
+from app.db.session import Base
+from app.models import alert as models  # noqa: F401  注册模型
+
+# 告警服务与 cmdb-service 共库，测试库里补一张只有主键的 cis 表供外键引用
+if "cis" not in Base.metadata.tables:
+    Table("cis", Base.metadata, Column("id", Integer, primary_key=True), Column("ci_type_id", Integer))
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'alerts.db'}")
+
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    """每个用例使用干净的进程级状态"""
+    rule_index.invalidate()
+    firing_alerts.invalidate()
+    pending_states._states.clear()
+    pending_states._restored = set(range(pending_states.shard_count))
+    rate_states._states.clear()
+    latest_samples._samples.clear()
+    latest_samples._labels.clear()
+    yield
+
+
+@pytest.fixture
+def notified(monkeypatch):
+    """记录交给通知分发器的告警"""
+    sent = []
+
+    def notify(alerts):
+        sent.extend(alerts)
+        return len(alerts)
+
+    monkeypatch.setattr(notification_dispatcher, "notify", notify)
+    return sent
+
+
+class FakeRedis:
+    """只实现共享样本与状态检查点用到的命令"""
+
+    def __init__(self):
+        self.strings = {}
+        self.hashes = {}
+        self.reads = []
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def type(self, key):
+        if key in self.strings:
+            return "string"
+        return "hash" if key in self.hashes else "none"
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def set(self, key, value):
+        self.strings[key] = value
+
+    def delete(self, key):
+        self.strings.pop(key, None)
+        self.hashes.pop(key, None)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def expire(self, key, seconds):
+        return True
+
+    def hgetall(self, key):
+        self.reads.append(key)
+        return dict(self.hashes.get(key, {}))
+
+    def hmget(self, key, fields):
+        self.reads.append(key)
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """用内存实现替换共享样本与状态检查点使用的 Redis"""
+    redis = FakeRedis()
+    monkeypatch.setattr("app.core.sample_store.get_redis", lambda: redis)
+    monkeypatch.setattr("app.core.pending_state.get_redis", lambda: redis)
+    return redis
@@ -0,0 +1,209 @@
+from app.core.alert_engine import AlertEngine
+from app.core.alert_state import firing_alerts
+from app.core.series import SeriesBatch
+from app.crud import crud_alert
+from app.models.alert import Alert, AlertRule, AlertRuleType, AlertSeverity, AlertStatus
+
+
+def make_rule(db, **values):
+    fields = dict(
+        name="cpu", rule_type=AlertRuleType.METRIC, severity=AlertSeverity.WARNING,
+        condition={"metric_name": "cpu"}, threshold=80, comparison_operator=">", duration=0
+    )
+    fields.update(values)
+    rule = AlertRule(**fields)
+    db.add(rule)
+    db.commit()
+    return rule
+
+
+def cpu_samples(*values):
+    return [
+        {"metric_name": "cpu", "labels": {"host": host}, "value": value}
+        for host, value in zip("abcdef", values)
+    ]
+
+
+def firing_count(db):
+    return db.query(Alert).filter(Alert.status == AlertStatus.FIRING).count()
+
+
+def test_batch_evaluation_creates_and_notifies_each_series(db, notified):
+    make_rule(db)
+
+    stats = AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", cpu_samples(90, 95, 10))
+
+    assert stats["triggered_alerts"] == 2
+    assert firing_count(db) == 2
+    assert sorted(alert["labels"]["host"] for alert in notified) == ["a", "b"]
+
+
+def test_batch_evaluation_does_not_renotify_firing_series(db, notified):
+    make_rule(db)
+    engine = AlertEngine(db, batch_mode=True)
+    engine.evaluate_all_rules("metric", cpu_samples(90, 95))
+
+    stats = engine.evaluate_all_rules("metric", cpu_samples(91, 96, 97))
+
+    assert stats["triggered_alerts"] == 1
+    assert firing_count(db) == 3
+    assert len(notified) == 3
+
+
+def test_alert_created_by_another_replica_is_not_notified(db, notified):
+    make_rule(db)
+    AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", cpu_samples(90))
+    # 本副本的触发状态表尚未看到其他副本写入的告警
+    firing_alerts.load([])
+    notified.clear()
+
+    stats = AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", cpu_samples(90))
+
+    assert stats["triggered_alerts"] == 0
+    assert notified == []
+    assert firing_count(db) == 1
+
+
+def test_batch_evaluation_resolves_recovered_series(db, notified):
+    make_rule(db)
+    engine = AlertEngine(db, batch_mode=True)
+    engine.evaluate_all_rules("metric", cpu_samples(90, 95))
+
+    engine.evaluate_all_rules("metric", cpu_samples(10, 95))
+
+    firing = db.query(Alert).filter(Alert.status == AlertStatus.FIRING).all()
+    assert [alert.labels["host"] for alert in firing] == ["b"]
+
+
+def test_trigger_alert_notifies_only_new_alerts(db, notified):
+    rule = make_rule(db)
+    engine = AlertEngine(db)
+
+    first = engine.trigger_alert(rule, rule.severity, "metric", fingerprint="fp-a")
+    firing_alerts.load([])
+    again = engine.trigger_alert(rule, rule.severity, "metric", fingerprint="fp-a")
+
+    assert first.id == again.id
+    assert len(notified) == 1
+    assert crud_alert.get_firing_alert_ids(db) == [(rule.id, first.id, "fp-a")]
+
+
+class FakeClock:
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def make_rate_rule(db):
+    return make_rule(
+        db, name="reqs", rule_type=AlertRuleType.CUSTOM,
+        condition={"expression": "rate(reqs) > 1"}, threshold=0
+    )
+
+
+def reqs_samples(value):
+    return [{"metric_name": "reqs", "labels": {"host": "a"}, "value": value}]
+
+
+def test_rate_only_custom_rule_fires_on_series_path(db, notified, monkeypatch):
+    make_rate_rule(db)
+    clock = FakeClock()
+    monkeypatch.setattr("app.core.expression.time.time", clock)
+    engine = AlertEngine(db, batch_mode=True)
+
+    first = engine.evaluate_all_rules("metric", reqs_samples(0))
+    clock.now += 10
+    second = engine.evaluate_all_rules("metric", reqs_samples(100))
+
+    assert first["evaluated_rules"] == 1 and first["triggered_alerts"] == 0
+    assert second["triggered_alerts"] == 1
+    assert second["total_rules"] >= second["evaluated_rules"]
+    assert firing_count(db) == 1
+
+
+def test_rate_only_custom_rule_fires_on_scheduler_path(db, notified, monkeypatch):
+    rule = make_rate_rule(db)
+    clock = FakeClock()
+    monkeypatch.setattr("app.core.expression.time.time", clock)
+    engine = AlertEngine(db, batch_mode=True)
+    engine.ensure_rule_index()
+
+    engine.evaluate_scheduled_rules([rule.id], SeriesBatch(reqs_samples(0)))
+    clock.now += 10
+    stats = engine.evaluate_scheduled_rules([rule.id], SeriesBatch(reqs_samples(100)))
+
+    assert stats["triggered_alerts"] == 1
+
+
+def test_custom_rule_partial_payload_does_not_resolve(db, notified):
+    make_rule(
+        db, name="ratio", rule_type=AlertRuleType.CUSTOM,
+        condition={"expression": "errors / requests > 0.5"}, threshold=0
+    )
+    engine = AlertEngine(db, batch_mode=True)
+    engine.evaluate_all_rules("metric", {"errors": 8, "requests": 10})
+
+    engine.evaluate_all_rules("metric", {"errors": 1})
+
+    assert firing_count(db) == 1
+
+
+def test_total_rules_counts_every_evaluated_rule_type(db, notified):
+    make_rule(db)
+    make_rule(
+        db, name="ratio", rule_type=AlertRuleType.CUSTOM,
+        condition={"expression": "cpu > 50"}, threshold=0
+    )
+
+    stats = AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", {"cpu": 90})
+
+    assert stats["evaluated_rules"] == 2
+    assert stats["total_rules"] == 2
+
+
+def test_custom_rule_evaluates_each_series_separately(db, notified):
+    make_rule(
+        db, name="ratio", rule_type=AlertRuleType.CUSTOM,
+        condition={"expression": "errors / requests > 0.5"}, threshold=0
+    )
+    samples = [
+        {"metric_name": "errors", "labels": {"host": "a"}, "value": 8},
+        {"metric_name": "requests", "labels": {"host": "a"}, "value": 10},
+        {"metric_name": "errors", "labels": {"host": "b"}, "value": 1},
+        {"metric_name": "requests", "labels": {"host": "b"}, "value": 10},
+    ]
+
+    stats = AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", samples)
+
+    assert stats["triggered_alerts"] == 1
+    assert [alert["labels"]["host"] for alert in notified] == ["a"]
+
+
+def test_duration_keeps_series_pending_until_elapsed(db, notified, monkeypatch):
+    make_rule(db, duration=60)
+    clock = FakeClock()
+    monkeypatch.setattr("app.core.pending_state.time.time", clock)
+    engine = AlertEngine(db, batch_mode=True)
+
+    engine.evaluate_all_rules("metric", cpu_samples(90))
+    clock.now += 30
+    engine.evaluate_all_rules("metric", cpu_samples(90))
+    assert firing_count(db) == 0
+
+    clock.now += 30
+    engine.evaluate_all_rules("metric", cpu_samples(90))
+    assert firing_count(db) == 1
+    assert len(notified) == 1
+
+
+def test_scheduled_rules_read_latest_ingested_samples(db, notified):
+    rule = make_rule(db)
+    engine = AlertEngine(db, batch_mode=True)
+    engine.ingest_samples(SeriesBatch(cpu_samples(90, 10)))
+
+    stats = engine.evaluate_scheduled_rules([rule.id])
+
+    assert stats["triggered_alerts"] == 1
+    assert [alert["labels"]["host"] for alert in notified] == ["a"]
@@ -0,0 +1,37 @@
+from app.core.anomaly import AnomalyDetector, AnomalySpec
+
+
+def detector(max_series=2, idle_ttl=60):
+    return AnomalyDetector(AnomalySpec.from_condition({"warmup": 1}), max_series, idle_ttl)
+
+
+def test_idle_series_are_evicted_for_new_series():
+    states = detector()
+    states.update(["a", "b"], [1.0, 2.0], now=0)
+    states.update(["b"], [2.0], now=100)
+
+    result = states.update(["c"], [3.0], now=100)
+
+    assert [position for position, _, _ in result] == [0]
+    assert sorted(states._rows) == ["b", "c"]
+    assert states.evicted == 1
+    assert states.overflow == 0
+
+
+def test_reused_row_starts_from_a_clean_state():
+    states = detector(max_series=1)
+    for now in range(5):
+        states.update(["a"], [100.0], now=now)
+
+    (_, expected, _), = states.update(["b"], [1.0], now=1000)
+
+    assert expected == 1.0
+
+
+def test_new_series_overflow_when_no_row_is_idle():
+    states = detector()
+    states.update(["a", "b"], [1.0, 2.0], now=0)
+
+    assert states.update(["c", "a"], [3.0, 1.0], now=10) != []
+    assert sorted(states._rows) == ["a", "b"]
+    assert states.overflow == 1
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.backtest import backtest_rule, compile_draft_rule
+
+
+def draft(**values):
+    fields = dict(
+        name="cpu", rule_type="metric", severity="warning",
+        condition={"metric_name": "cpu"}, threshold=80, comparison_operator=">", duration=0
+    )
+    fields.update(values)
+    return compile_draft_rule(fields)
+
+
+def rows(*samples):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        (start + timedelta(seconds=offset), ci_id, "cpu", value, {"host": f"h{ci_id}"})
+        for offset, ci_id, value in samples
+    ]
+
+
+def test_backtest_fires_per_series():
+    result = backtest_rule(draft(), [rows((0, 1, 90), (0, 2, 95), (60, 1, 10))])
+
+    assert result["series"] == 2
+    assert result["fire_count"] == 2
+    assert result["resolve_count"] == 1
+
+
+def test_backtest_ignores_other_cis():
+    result = backtest_rule(draft(ci_id=1), [rows((0, 1, 50), (0, 2, 95), (60, 2, 99))])
+
+    assert result["series"] == 1
+    assert result["fire_count"] == 0
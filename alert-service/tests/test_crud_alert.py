@@ -0,0 +1,76 @@
+from app.crud import crud_alert
+from app.core.series import alert_fingerprint
+from app.models.alert import Alert, AlertRule, AlertRuleType, AlertSeverity, AlertStatus
+
+
+def make_rule(db):
+    rule = AlertRule(
+        name="cpu", rule_type=AlertRuleType.METRIC, severity=AlertSeverity.WARNING,
+        condition={"metric_name": "cpu"}, threshold=80, comparison_operator=">", duration=0
+    )
+    db.add(rule)
+    db.commit()
+    return rule
+
+
+def alert_values(rule, series_fp):
+    return {
+        "alert_rule_id": rule.id,
+        "title": "[WARNING] cpu",
+        "message": "告警规则 cpu 被触发",
+        "source": "metric",
+        "severity": AlertSeverity.WARNING,
+        "fingerprint": alert_fingerprint(rule.id, series_fp),
+    }
+
+
+def test_bulk_write_alerts_inserts_several_rows(db):
+    rule = make_rule(db)
+    new_alerts = [alert_values(rule, fp) for fp in ("a", "b", "c")]
+
+    written = crud_alert.bulk_write_alerts(db, new_alerts, [])
+
+    assert len(written) == 3
+    assert db.query(Alert).filter(Alert.status == AlertStatus.FIRING).count() == 3
+
+
+def test_bulk_write_alerts_is_idempotent_per_fingerprint(db):
+    rule = make_rule(db)
+    crud_alert.bulk_write_alerts(db, [alert_values(rule, fp) for fp in ("a", "b")], [])
+
+    written = crud_alert.bulk_write_alerts(db, [alert_values(rule, fp) for fp in ("a", "b", "c")], [])
+
+    assert len(written) == 3
+    assert db.query(Alert).count() == 3
+
+
+def test_bulk_write_alerts_resolves_by_id(db):
+    rule = make_rule(db)
+    written = crud_alert.bulk_write_alerts(db, [alert_values(rule, fp) for fp in ("a", "b")], [])
+
+    crud_alert.bulk_write_alerts(db, [], [written[0][0]])
+
+    assert db.query(Alert).filter(Alert.status == AlertStatus.FIRING).count() == 1
+
+
+def test_bulk_write_alerts_reports_inserted_rows(db):
+    rule = make_rule(db)
+    crud_alert.bulk_write_alerts(db, [alert_values(rule, "a")], [])
+
+    written = crud_alert.bulk_write_alerts(db, [alert_values(rule, fp) for fp in ("a", "b")], [])
+
+    inserted = {fingerprint: flag for _, _, fingerprint, flag in written}
+    assert inserted == {
+        alert_fingerprint(rule.id, "a"): False,
+        alert_fingerprint(rule.id, "b"): True,
+    }
+
+
+def test_upsert_alert_reports_inserted(db):
+    rule = make_rule(db)
+
+    first, first_inserted = crud_alert.upsert_alert(db, alert_values(rule, "a"))
+    again, again_inserted = crud_alert.upsert_alert(db, alert_values(rule, "a"))
+
+    assert first_inserted and not again_inserted
+    assert first.id == again.id
@@ -0,0 +1,50 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from app.core.eval_pool import EvaluationPool
+
+
+class Rule:
+    def __init__(self, metric_name, threshold, comparison_operator=">"):
+        self.metric_name = metric_name
+        self.threshold = threshold
+        self.comparison_operator = comparison_operator
+
+
+@pytest.fixture
+def pool():
+    pool = EvaluationPool(max_workers=2, min_rows=1)
+    yield pool
+    pool.shutdown()
+
+
+def hits(pool, metric_names, values):
+    rules, rule_idx, row_idx = pool.evaluate(metric_names, np.array(values, dtype=np.float64))
+    return sorted((rules[r].threshold, row) for r, row in zip(rule_idx.tolist(), row_idx.tolist()))
+
+
+def test_rule_changes_reuse_the_worker_processes(pool):
+    pool.ensure(1, [Rule("cpu", 80), Rule("mem", 50)])
+    executor = pool._executor
+    assert hits(pool, ["cpu", "mem"], [[90, 10], [10, 60], [85, 70]]) == [(50, 1), (50, 2), (80, 0), (80, 2)]
+
+    pool.ensure(2, [Rule("cpu", 88)])
+
+    assert pool._executor is executor
+    assert hits(pool, ["cpu", "mem"], [[90, 10], [10, 60], [85, 70]]) == [(88, 0)]
+
+
+def test_retired_rules_stay_available_to_running_evaluations(pool):
+    pool.ensure(1, [Rule("cpu", 80)])
+    running = pool._block
+    running.refs += 1
+
+    pool.ensure(2, [Rule("cpu", 90)])
+
+    assert running.retired
+    shared_memory.SharedMemory(name=running.shm.name).close()
+    assert hits(pool, ["cpu"], [[99], [85]]) == [(90, 0)]
+    running.refs -= 1
+    running.release()
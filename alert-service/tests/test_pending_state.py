@@ -0,0 +1,65 @@
+import json
+import time
+
+from app.core.pending_state import PendingStateTracker, RuleState
+from app.core.sharding import shard_of
+
+SHARDS = 8
+NOW = time.time()
+
+
+def rules_in_distinct_shards():
+    first = 1
+    second = next(rule_id for rule_id in range(2, 100) if shard_of(rule_id, SHARDS) != shard_of(first, SHARDS))
+    return first, second
+
+
+def tracker(owned):
+    return PendingStateTracker("alert:pending_state", shard_count=SHARDS, owned_shards=lambda: owned)
+
+
+def test_checkpoint_writes_one_field_per_owned_shard(fake_redis):
+    first, second = rules_in_distinct_shards()
+    owned = {shard_of(first, SHARDS)}
+    states = tracker(owned)
+    states._restored = set(owned)
+    states.observe(first, True, 60, "a", now=NOW)
+    states.observe(second, True, 60, "b", now=NOW)
+
+    assert states.checkpoint(force=True)
+
+    saved = fake_redis.hashes["alert:pending_state"]
+    assert list(saved) == [str(shard_of(first, SHARDS))]
+    assert list(json.loads(saved[str(shard_of(first, SHARDS))])) == [f"{first}|a"]
+
+
+def test_restore_only_owned_shards_and_takeovers(fake_redis):
+    first, second = rules_in_distinct_shards()
+    writer = tracker(set(range(SHARDS)))
+    writer._restored = set(range(SHARDS))
+    writer.observe(first, True, 60, "a", now=NOW)
+    writer.observe(second, True, 60, "b", now=NOW)
+    writer.checkpoint(force=True)
+
+    owned = {shard_of(second, SHARDS)}
+    reader = tracker(owned)
+    assert reader.restore() == 1
+    assert reader.get(first, "a") is None
+    assert reader.get(second, "b").state == RuleState.PENDING
+
+    owned.add(shard_of(first, SHARDS))
+    assert reader.restore() == 1
+    assert reader.get(first, "a").active_since == NOW
+
+    owned.discard(shard_of(second, SHARDS))
+    reader.restore()
+    assert reader.get(second, "b") is None
+
+
+def test_restore_reads_legacy_single_key_checkpoint(fake_redis):
+    fake_redis.set("alert:pending_state", json.dumps({"1|a": ["firing", 10, 20, 30]}))
+    states = tracker(set(range(SHARDS)))
+
+    assert states.restore() == 1
+    assert states.get(1, "a").fired_at == 20
+    assert fake_redis.type("alert:pending_state") == "none"
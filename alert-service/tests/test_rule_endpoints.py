@@ -0,0 +1,36 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import alert
+from app.db.session import get_db
+
+from tests.test_alert_engine import make_rule
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(alert.router, prefix="/api/v1/alerts")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def test_update_validates_condition_against_new_rule_type(client, db):
+    rule = make_rule(db)
+
+    response = client.put(f"/api/v1/alerts/rules/{rule.id}", json={"rule_type": "custom"})
+
+    assert response.status_code == 400
+    assert "自定义规则表达式无效" in response.json()["detail"]
+
+
+def test_update_validates_condition_against_current_rule_type(client, db):
+    rule = make_rule(db)
+
+    response = client.put(f"/api/v1/alerts/rules/{rule.id}", json={
+        "condition": {"metric_name": "cpu", "function": "median_over_time"}
+    })
+
+    assert response.status_code == 400
+    assert "窗口函数配置无效" in response.json()["detail"]
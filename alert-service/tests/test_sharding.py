@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from app.core.alert_engine import AlertEngine
+from app.core.config import settings
+from app.core.sample_store import LatestSampleStore
+from app.core.series import SeriesBatch
+from app.core.sharding import shard_coordinator, shard_of
+from app.db.session import Base
+from app.models.alert import Alert, AlertStatus
+
+from tests.test_alert_engine import cpu_samples, make_rule
+
+
+@pytest.fixture
+def sharded(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "ALERT_SHARDING_ENABLED", True)
+
+    def own(*rules):
+        valid_until = time.monotonic() + 60
+        monkeypatch.setattr(shard_coordinator, "_owned", {
+            shard_of(rule.id, shard_coordinator.shard_count): valid_until for rule in rules
+        })
+    return own
+
+
+def firing_rule_ids(db):
+    return {
+        alert.alert_rule_id
+        for alert in db.query(Alert).filter(Alert.status == AlertStatus.FIRING)
+    }
+
+
+def distinct_shard_rules(db):
+    owned = make_rule(db, name="owned")
+    other = make_rule(db, name="other")
+    while shard_of(other.id, shard_coordinator.shard_count) == shard_of(owned.id, shard_coordinator.shard_count):
+        other = make_rule(db, name="other")
+    return owned, other
+
+
+def test_evaluate_all_rules_skips_rules_of_other_shards(db, notified, sharded):
+    owned, other = distinct_shard_rules(db)
+    sharded(owned)
+
+    AlertEngine(db, batch_mode=True).evaluate_all_rules("metric", cpu_samples(90))
+
+    assert firing_rule_ids(db) == {owned.id}
+
+
+def test_ingest_fleet_skips_rules_of_other_shards(db, notified, sharded):
+    owned, other = distinct_shard_rules(db)
+    sharded(owned)
+    db.execute(Base.metadata.tables["cis"].insert(), [{"id": 1}, {"id": 2}])
+
+    AlertEngine(db, batch_mode=True).ingest_fleet([1, 2], ["cpu"], [[90], [95]])
+
+    assert firing_rule_ids(db) == {owned.id}
+
+
+def test_refresh_reads_only_requested_metrics(fake_redis):
+    publisher, reader = LatestSampleStore(), LatestSampleStore(refresh_interval=0)
+    publisher.publish(SeriesBatch(cpu_samples(90, 95) + [
+        {"metric_name": "mem", "labels": {"host": "a"}, "value": 50}
+    ]))
+
+    merged = reader.refresh(["cpu"])
+
+    assert fake_redis.reads == ["alert:samples:cpu"]
+    assert sorted(value for _, _, value in merged.series("cpu")) == [90, 95]
+    assert merged.series("mem") == []
+    assert reader.refresh(["cpu"]) is None